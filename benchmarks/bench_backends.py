@@ -0,0 +1,90 @@
+"""推理后端基准：在固定的参考音频上测量各后端、各模型大小的实时率(RTF)和峰值内存
+
+每个组合在独立的子进程中运行，峰值内存互不影响。
+用法: python benchmarks/bench_backends.py --clip 参考视频.mp4 [--backends whisper whisper-int8] [--models base small]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from common import peak_rss_mb
+
+
+def run_single(backend_name, model_size, clip, threads, interop_threads):
+    """在当前进程中运行一个组合，返回测量结果"""
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.audio import decode_audio
+    from core.backends import create_backend
+    from core.pipeline import DEFAULT_DECODE_OPTIONS
+
+    audio, stats = decode_audio(clip)
+    backend = create_backend(backend_name, model_size, intra_op_threads=threads,
+                             inter_op_threads=interop_threads)
+    load_start = time.perf_counter()
+    model = backend.load()
+    load_seconds = time.perf_counter() - load_start
+
+    transcribe_start = time.perf_counter()
+    result = model.transcribe(audio, verbose=None, **DEFAULT_DECODE_OPTIONS)
+    transcribe_seconds = time.perf_counter() - transcribe_start
+    return {
+        "backend": backend_name,
+        "model": model_size,
+        "audio_seconds": stats["duration"],
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "rtf": transcribe_seconds / stats["duration"],
+        "peak_rss_mb": peak_rss_mb(),
+        "segments": len(result["segments"]),
+    }
+
+
+def main():
+    from core.backends import BACKENDS, available_backends
+
+    parser = argparse.ArgumentParser(description="推理后端基准")
+    parser.add_argument("--clip", required=True, help="参考音视频文件")
+    parser.add_argument("--backends", nargs="+", default=None, choices=sorted(BACKENDS))
+    parser.add_argument("--models", nargs="+", default=["base", "small"])
+    parser.add_argument("--threads", type=int, help="算子内线程数")
+    parser.add_argument("--interop-threads", type=int, help="算子间线程数")
+    parser.add_argument("--output", help="把结果以JSON格式写入文件")
+    parser.add_argument("--single", nargs=2, metavar=("BACKEND", "MODEL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single[0], args.single[1], args.clip,
+                                    args.threads, args.interop_threads)))
+        return
+
+    backends = args.backends or available_backends()
+    results = []
+    for backend_name in backends:
+        for model_size in args.models:
+            command = [sys.executable, os.path.abspath(__file__), "--clip", args.clip,
+                       "--single", backend_name, model_size]
+            if args.threads:
+                command += ["--threads", str(args.threads)]
+            if args.interop_threads:
+                command += ["--interop-threads", str(args.interop_threads)]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(f"{backend_name}/{model_size} 运行失败:\n{process.stderr.strip()}")
+                continue
+            results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    print(f"{'后端':<16}{'模型':<8}{'加载(s)':>10}{'识别(s)':>10}{'RTF':>8}{'峰值内存(MB)':>14}")
+    for r in results:
+        print(f"{r['backend']:<16}{r['model']:<8}{r['load_seconds']:>10.1f}{r['transcribe_seconds']:>10.1f}"
+              f"{r['rtf']:>8.3f}{r['peak_rss_mb']:>14.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""批量识别基准：在多个短视频上比较逐个文件识别与多文件窗口批量识别的总吞吐量（音频秒/墙钟秒）
+
+两种方式使用同一个已加载的模型，音频预先解码，只测量识别本身：
+
+    python benchmarks/bench_batching.py --files 16 --model base
+    python benchmarks/bench_batching.py --files 16 --model base --batch-sizes 4 8 16
+"""
+import os
+import json
+import argparse
+
+from common import StageTimer, environment_info, make_synthetic_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量识别基准")
+    parser.add_argument("--files", type=int, default=16, help="短视频数量")
+    parser.add_argument("--min-seconds", type=int, default=10, help="最短的视频时长，其余依次加1秒")
+    parser.add_argument("--model", default="base", help="Whisper模型大小")
+    parser.add_argument("--backend", default="whisper", help="推理后端")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[8], help="批量识别每批的窗口数")
+    parser.add_argument("--output", help="把结果以JSON格式写入文件")
+    args = parser.parse_args()
+
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.pipeline import SubtitlePipeline
+
+    pipeline = SubtitlePipeline(args.model, use_cache=False, parallel=False, backend=args.backend,
+                                stream_decode=False)
+    extracted = [pipeline.extract(make_synthetic_video(args.min_seconds + i)) for i in range(args.files)]
+    audio_seconds = sum(item.duration for item in extracted)
+    # 先加载模型，不计入识别耗时
+    pipeline.load_model()
+
+    runs = []
+    with StageTimer("sequential") as timer:
+        for item in extracted:
+            pipeline.transcribe(item)
+    runs.append({"mode": "sequential", "batch_size": 1, **timer.result})
+    for batch_size in args.batch_sizes:
+        with StageTimer("batched") as timer:
+            pipeline.transcribe_batch(extracted, batch_size)
+        runs.append({"mode": "batched", "batch_size": batch_size, **timer.result})
+
+    print(f"\n{args.files} 个文件，音频共 {audio_seconds:.0f}秒，模型 {args.model} ({args.backend})")
+    print(f"{'方式':<12}{'每批窗口':>10}{'耗时(s)':>10}{'音频秒/秒':>12}{'CPU利用率':>12}{'加速比':>8}")
+    baseline = runs[0]["wall_seconds"]
+    for run in runs:
+        run["throughput"] = audio_seconds / run["wall_seconds"]
+        print(f"{run['mode']:<12}{run['batch_size']:>10}{run['wall_seconds']:>10.1f}{run['throughput']:>12.2f}"
+              f"{run['cpu_utilization']:>12.2f}{baseline / run['wall_seconds']:>8.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"environment": environment_info(), "audio_seconds": audio_seconds, "runs": runs},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
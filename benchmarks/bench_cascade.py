@@ -0,0 +1,61 @@
+"""级联识别基准：比较只用大模型识别与草稿模型+低置信度区间重新识别的耗时和文字一致程度
+
+两种方式使用同一段预先解码的音频，模型预先加载，只测量识别本身；
+输出实测加速比、级联识别自身报告的估计加速比和重新识别的比例。参考音频最好是真实语音：
+
+    python benchmarks/bench_cascade.py --clip 参考视频.mp4 --draft small --model large
+"""
+import os
+import json
+import difflib
+import argparse
+
+from common import StageTimer, environment_info, make_synthetic_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description="级联识别基准")
+    parser.add_argument("--clip", help="参考音视频文件（默认使用合成测试视频）")
+    parser.add_argument("--duration", type=float, default=120, help="未指定--clip时合成测试视频的时长（秒）")
+    parser.add_argument("--draft", default="small", help="草稿模型大小")
+    parser.add_argument("--model", default="large", help="重新识别低置信度区间的模型大小")
+    parser.add_argument("--backend", default="whisper", help="推理后端")
+    parser.add_argument("--output", help="把结果以JSON格式写入文件")
+    args = parser.parse_args()
+
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.audio import decode_audio
+    from core.cascade import format_cascade_stats, transcribe_cascade
+    from core.pipeline import DEFAULT_DECODE_OPTIONS, SubtitlePipeline
+
+    clip = args.clip or make_synthetic_video(args.duration)
+    audio, decode_stats = decode_audio(clip)
+    pipeline = SubtitlePipeline(args.model, use_cache=False, parallel=False, backend=args.backend)
+    # 先加载两个模型，不计入识别耗时
+    final_model = pipeline.load_model()
+    draft_model = pipeline.load_model(args.draft)
+
+    with StageTimer("final") as final_timer:
+        reference = final_model.transcribe(audio, verbose=None, **DEFAULT_DECODE_OPTIONS)
+    with StageTimer("cascade") as cascade_timer:
+        result, stats = transcribe_cascade(draft_model, lambda: final_model, audio, DEFAULT_DECODE_OPTIONS)
+
+    similarity = difflib.SequenceMatcher(None, reference["text"], result["text"]).ratio()
+    speedup = final_timer.result["wall_seconds"] / cascade_timer.result["wall_seconds"]
+    print(f"\n音频 {decode_stats['duration']:.0f}秒，草稿模型 {args.draft}，大模型 {args.model} ({args.backend})")
+    print(format_cascade_stats(stats, args.draft, args.model))
+    print(f"只用 {args.model}: {final_timer.result['wall_seconds']:.1f}秒；"
+          f"级联识别: {cascade_timer.result['wall_seconds']:.1f}秒；实测加速 {speedup:.2f}倍")
+    print(f"与只用 {args.model} 的文字相似度: {similarity * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"environment": environment_info(), "audio_seconds": decode_stats["duration"],
+                       "draft": args.draft, "model": args.model, "final": final_timer.result,
+                       "cascade": cascade_timer.result, "cascade_stats": stats,
+                       "measured_speedup": speedup, "similarity": similarity},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
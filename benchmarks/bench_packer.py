@@ -0,0 +1,130 @@
+"""项目打包基准：在生成的大目录树上比较逐个文件串行复制与单次遍历+线程池复制的吞吐量
+
+    python benchmarks/bench_packer.py --files 100000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from project_packer import ProjectPacker
+
+# 生成的文件类型：前两种会被打包，后两种被排除
+EXTENSIONS = (".py", ".txt", ".pyc", ".bin")
+FILES_PER_DIR = 100
+
+
+def make_tree(root, files, size_kb):
+    """生成测试目录树，返回需要打包的文件数和总字节数"""
+    payload = os.urandom(size_kb * 1024)
+    included = included_bytes = 0
+    for i in range(files):
+        directory = os.path.join(root, "src", f"pkg{i // FILES_PER_DIR // FILES_PER_DIR}", f"mod{i // FILES_PER_DIR}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory, exist_ok=True)
+        extension = EXTENSIONS[i % len(EXTENSIONS)]
+        size = len(payload) * (1 + i % 3) // 3
+        with open(os.path.join(directory, f"file{i}{extension}"), 'wb') as f:
+            f.write(payload[:size])
+        if extension in (".py", ".txt"):
+            included += 1
+            included_bytes += size
+    return included, included_bytes
+
+
+def legacy_collect(packer):
+    """改进前的文件收集：os.walk，每个文件重新计算相对路径并逐个匹配fnmatch模式"""
+    from fnmatch import fnmatch
+
+    def should_include_file(file_path):
+        file_name = os.path.basename(file_path)
+        rel_path = os.path.relpath(file_path, packer.project_dir)
+        for pattern in packer.config["exclude_files"]:
+            if fnmatch(file_name, pattern) or fnmatch(rel_path, pattern):
+                return False
+        for pattern in packer.config["include_files"]:
+            if fnmatch(file_name, pattern) or fnmatch(rel_path, pattern):
+                return True
+        return False
+
+    for root, dirs, files in os.walk(packer.project_dir):
+        dirs[:] = [d for d in dirs if d not in packer.config["exclude_dirs"]]
+        for file in files:
+            src_path = os.path.join(root, file)
+            if should_include_file(src_path):
+                yield src_path, os.path.relpath(src_path, packer.project_dir)
+
+
+def legacy_copy(packer, output_dir):
+    """改进前的实现：收集到的文件逐个串行shutil.copy2"""
+    copied_files = []
+    for src_path, rel_path in legacy_collect(packer):
+        dst_path = os.path.join(output_dir, rel_path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copy2(src_path, dst_path)
+        copied_files.append(rel_path)
+    return copied_files
+
+
+def time_collect(name, collect, expected):
+    start = time.perf_counter()
+    count = sum(1 for _ in collect())
+    elapsed = time.perf_counter() - start
+    assert count == expected, f"{name}收集了 {count} 个文件，应为 {expected} 个"
+    print(f"{name:<10}{count:>10}{elapsed:>10.2f}{count / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="项目打包基准")
+    parser.add_argument("--files", type=int, default=100000, help="生成的文件数（约一半会被打包）")
+    parser.add_argument("--size-kb", type=int, default=4, help="单个文件的最大大小（KB）")
+    parser.add_argument("--workers", type=int, default=0, help="复制线程数，0表示自动")
+    parser.add_argument("--skip-legacy", action="store_true", help="不运行改进前的串行实现")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_packer_")
+    try:
+        project_dir = os.path.join(work_dir, "project")
+        start = time.perf_counter()
+        included, included_bytes = make_tree(project_dir, args.files, args.size_kb)
+        print(f"生成 {args.files} 个文件，耗时 {time.perf_counter() - start:.1f}秒；"
+              f"需打包 {included} 个 ({included_bytes / 1024 / 1024:.1f}MB)")
+
+        packer = ProjectPacker(project_dir)
+        packer.config["copy_workers"] = args.workers
+
+        # 只遍历和匹配，不复制，不受磁盘写入速度影响
+        print(f"{'收集':<10}{'文件数':>10}{'耗时(s)':>10}{'文件/秒':>12}")
+        if not args.skip_legacy:
+            time_collect("os.walk", lambda: legacy_collect(packer), included)
+        time_collect("scandir", packer.iter_project_files, included)
+
+        runs = [("并行复制", packer.copy_project_files)]
+        if not args.skip_legacy:
+            runs.insert(0, ("串行复制", lambda output_dir: legacy_copy(packer, output_dir)))
+
+        print(f"\n{'复制':<10}{'文件数':>10}{'耗时(s)':>10}{'文件/秒':>12}{'MB/秒':>10}")
+        for name, copy in runs:
+            output_dir = os.path.join(work_dir, "out_" + str(len(os.listdir(work_dir))))
+            if hasattr(os, 'sync'):
+                # 先把之前写入的数据刷到磁盘，避免后台回写影响下一次测量
+                os.sync()
+            start = time.perf_counter()
+            copied = copy(output_dir)
+            elapsed = time.perf_counter() - start
+            assert len(copied) == included, f"{name}复制了 {len(copied)} 个文件，应为 {included} 个"
+            print(f"{name:<10}{len(copied):>10}{elapsed:>10.2f}{len(copied) / elapsed:>12.0f}"
+                  f"{included_bytes / 1024 / 1024 / elapsed:>10.1f}")
+            shutil.rmtree(output_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
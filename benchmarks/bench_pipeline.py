@@ -0,0 +1,123 @@
+"""端到端流程基准：在合成测试视频上分别测量音频提取、模型加载、识别、字幕序列化各阶段
+
+测试视频由自带的ffmpeg在本地生成（首次运行时生成并缓存在 benchmarks/fixtures/），可离线运行。
+结果以JSON输出，可与其他提交的结果比较以发现性能回退：
+
+    python benchmarks/bench_pipeline.py --durations 30 120 --model base --output results.json
+    python benchmarks/bench_pipeline.py --durations 30 120 --model base --compare baseline.json
+"""
+import os
+import sys
+import json
+import argparse
+
+from common import StageTimer, environment_info, make_synthetic_video, peak_rss_mb
+
+# 比较时视为回退的耗时增幅
+REGRESSION_THRESHOLD = 0.10
+# 参与比较的指标
+COMPARED_STAGES = ("extract", "model_load", "decode", "serialize")
+
+
+def bench_file(video_path, model_size, backend_name):
+    """对一个视频运行完整流程，返回各阶段的测量结果"""
+    from core.audio import decode_audio
+    from core.backends import create_backend
+    from core.model_cache import get_model_cache
+    from core.pipeline import DEFAULT_DECODE_OPTIONS
+    from core.subtitles import render
+
+    stages = {}
+    with StageTimer("extract") as timer:
+        audio, decode_stats = decode_audio(video_path)
+    stages["extract"] = timer.result
+
+    # 每个文件都测量冷加载
+    get_model_cache().clear()
+    with StageTimer("model_load") as timer:
+        model = create_backend(backend_name, model_size).load()
+    stages["model_load"] = timer.result
+
+    with StageTimer("decode") as timer:
+        result = model.transcribe(audio, verbose=None, **DEFAULT_DECODE_OPTIONS)
+    stages["decode"] = timer.result
+
+    with StageTimer("serialize") as timer:
+        render(result["segments"], "srt")
+    stages["serialize"] = timer.result
+
+    duration = decode_stats["duration"]
+    return {
+        "file": os.path.basename(video_path),
+        "audio_seconds": duration,
+        "segments": len(result["segments"]),
+        "rtf": stages["decode"]["wall_seconds"] / duration,
+        "end_to_end_rtf": sum(stage["wall_seconds"] for stage in stages.values()) / duration,
+        "stages": stages,
+    }
+
+
+def compare(results, baseline):
+    """与基线结果比较，返回发现的回退列表"""
+    baseline_runs = {run["file"]: run for run in baseline["runs"]}
+    regressions = []
+    print(f"\n与基线比较 (基线提交: {baseline['environment'].get('commit')})")
+    print(f"{'文件':<24}{'阶段':<12}{'基线(s)':>10}{'当前(s)':>10}{'变化':>9}")
+    for run in results["runs"]:
+        base = baseline_runs.get(run["file"])
+        if base is None:
+            continue
+        for stage in COMPARED_STAGES:
+            old = base["stages"][stage]["wall_seconds"]
+            new = run["stages"][stage]["wall_seconds"]
+            change = (new - old) / old if old > 0 else 0.0
+            flag = " !" if change > REGRESSION_THRESHOLD else ""
+            print(f"{run['file']:<24}{stage:<12}{old:>10.3f}{new:>10.3f}{change:>+8.0%}{flag}")
+            if flag:
+                regressions.append((run["file"], stage, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流程基准")
+    parser.add_argument("--durations", nargs="+", type=float, default=[30, 120, 600],
+                        help="合成测试视频的时长（秒）")
+    parser.add_argument("--model", default="base", help="Whisper模型大小")
+    parser.add_argument("--backend", default="whisper", help="推理后端")
+    parser.add_argument("--output", help="把结果以JSON格式写入文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果比较，发现回退时以非零状态退出")
+    args = parser.parse_args()
+
+    runs = []
+    for duration in args.durations:
+        video_path = make_synthetic_video(duration)
+        run = bench_file(video_path, args.model, args.backend)
+        runs.append(run)
+        stages = run["stages"]
+        print(f"{run['file']}: 提取 {stages['extract']['wall_seconds']:.2f}s, "
+              f"加载 {stages['model_load']['wall_seconds']:.2f}s, "
+              f"识别 {stages['decode']['wall_seconds']:.2f}s "
+              f"(RTF {run['rtf']:.3f}, CPU利用率 {stages['decode']['cpu_utilization']:.1f}), "
+              f"序列化 {stages['serialize']['wall_seconds'] * 1000:.1f}ms")
+
+    results = {
+        "environment": environment_info(),
+        "config": {"model": args.model, "backend": args.backend},
+        "peak_rss_mb": peak_rss_mb(),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print(f"\n发现 {len(regressions)} 处性能回退（超过 {REGRESSION_THRESHOLD:.0%}）")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
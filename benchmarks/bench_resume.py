@@ -0,0 +1,135 @@
+"""检查点恢复基准：识别中途杀死进程，重新运行后从检查点继续，比较结果与不中断时是否一致
+
+默认用替身模型（每个窗口固定耗时，输出取决于窗口音频和提示词），只验证检查点的记录和恢复；
+结果不一致时以非零状态退出：
+
+    python benchmarks/bench_resume.py --duration 600
+    python benchmarks/bench_resume.py --duration 600 --stream-decode --kill-after 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from common import make_synthetic_video
+
+
+class StubModel:
+    """替身模型：每个窗口等待固定时间后返回前后两个片段，文字由窗口音频的均值和提示词长度决定"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def transcribe(self, audio, verbose=None, initial_prompt=None, **decode_options):
+        import numpy as np
+        time.sleep(self.delay)
+        seconds = len(audio) / 16000
+        level = float(np.abs(audio).mean())
+        prompt_chars = len(initial_prompt or "")
+        return {"segments": [
+            {"start": 0.0, "end": seconds / 2, "text": f"甲{level:.5f}/{prompt_chars}", "tokens": [1]},
+            {"start": seconds / 2, "end": seconds, "text": f"乙{level:.5f}/{prompt_chars}", "tokens": [2]},
+        ]}
+
+
+def run_single(video_path, output_path, delay, stream_decode):
+    """在当前进程中识别一个文件并写入SRT，检查点目录由环境变量 VIDEOTOTXT_JOURNAL_DIR 指定"""
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.pipeline import SubtitlePipeline
+
+    class StubPipeline(SubtitlePipeline):
+        def load_model(self):
+            return StubModel(delay)
+
+    pipeline = StubPipeline(use_cache=False, parallel=False, checkpoint=True, stream_decode=stream_decode,
+                            workspace=os.path.dirname(output_path), on_progress=print)
+    srt_content = pipeline.run(video_path)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(srt_content)
+
+
+def journal_windows(journal_dir):
+    """检查点日志中已提交的窗口数"""
+    count = 0
+    for name in os.listdir(journal_dir) if os.path.isdir(journal_dir) else []:
+        with open(os.path.join(journal_dir, name), 'rb') as f:
+            count += max(0, f.read().count(b"\n") - 1)
+    return count
+
+
+def start(video_path, output_path, journal_dir, args):
+    command = [sys.executable, os.path.abspath(__file__), "--single", video_path, output_path,
+               "--delay", str(args.delay)]
+    if args.stream_decode:
+        command.append("--stream-decode")
+    env = dict(os.environ, VIDEOTOTXT_JOURNAL_DIR=journal_dir)
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def finish(process, name):
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        print(f"{name}运行失败:\n{stderr.strip()}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查点恢复基准")
+    parser.add_argument("--duration", type=float, default=600, help="合成测试视频的时长（秒）")
+    parser.add_argument("--delay", type=float, default=0.2, help="替身模型识别每个窗口的耗时（秒）")
+    parser.add_argument("--kill-after", type=int, default=5, help="提交多少个窗口后杀死进程")
+    parser.add_argument("--stream-decode", action="store_true", help="边解码边识别")
+    parser.add_argument("--single", nargs=2, metavar=("VIDEO", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single[0], args.single[1], args.delay, True if args.stream_decode else False)
+        return
+
+    video_path = make_synthetic_video(args.duration)
+    with tempfile.TemporaryDirectory(prefix="bench_resume_") as work_dir:
+        reference_path = os.path.join(work_dir, "reference.srt")
+        resumed_path = os.path.join(work_dir, "resumed.srt")
+        journal_dir = os.path.join(work_dir, "journals")
+
+        start_time = time.perf_counter()
+        finish(start(video_path, reference_path, os.path.join(work_dir, "reference_journals"), args), "不中断的识别")
+        full_seconds = time.perf_counter() - start_time
+
+        # 等到提交了足够的窗口后杀死进程，模拟崩溃或关机
+        process = start(video_path, resumed_path, journal_dir, args)
+        while journal_windows(journal_dir) < args.kill_after:
+            if process.poll() is not None:
+                finish(process, "被中断的识别")
+                print("识别在杀死进程之前已经结束，请增大 --duration 或减小 --kill-after")
+                sys.exit(1)
+            time.sleep(0.01)
+        process.kill()
+        process.wait()
+        committed = journal_windows(journal_dir)
+
+        start_time = time.perf_counter()
+        finish(start(video_path, resumed_path, journal_dir, args), "恢复后的识别")
+        resumed_seconds = time.perf_counter() - start_time
+
+        with open(reference_path, encoding='utf-8') as f:
+            reference = f.read()
+        with open(resumed_path, encoding='utf-8') as f:
+            resumed = f.read()
+        leftover = os.listdir(journal_dir)
+
+    print(f"不中断识别耗时 {full_seconds:.1f}秒；杀死进程时已提交 {committed} 个窗口，"
+          f"恢复后继续识别耗时 {resumed_seconds:.1f}秒")
+    if resumed != reference:
+        print("恢复后的字幕与不中断时不一致")
+        sys.exit(1)
+    if leftover:
+        print(f"识别完成后检查点日志未被删除: {leftover}")
+        sys.exit(1)
+    print(f"恢复后的字幕与不中断时一致（{reference.count(' --> ')} 条字幕）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""流式解码内存基准：比较不同时长的录音在一次性解码和流式解码下的峰值内存
+
+每个组合在独立的子进程中运行。默认用只返回固定片段的替身模型，只测量音频读取和窗口循环本身的内存；
+流式解码的峰值内存应与音频时长无关，10分钟和3小时的差距超过容差时以非零状态退出：
+
+    python benchmarks/bench_stream_memory.py --durations 600 10800
+    python benchmarks/bench_stream_memory.py --durations 600 10800 --model base
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from common import make_synthetic_video, peak_rss_mb
+
+# 流式解码时不同时长之间允许的峰值内存差（MB）
+FLAT_TOLERANCE_MB = 32
+
+
+class StubModel:
+    """替身模型：每个窗口返回前后两个片段，不做任何推理"""
+
+    def transcribe(self, audio, verbose=None, **decode_options):
+        seconds = len(audio) / 16000
+        return {"segments": [
+            {"start": 0.0, "end": seconds / 2, "text": "甲", "tokens": [1]},
+            {"start": seconds / 2, "end": seconds, "text": "乙", "tokens": [2]},
+        ]}
+
+
+def run_single(mode, video_path, model_size):
+    """在当前进程中识别一个文件，返回峰值内存"""
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.audio import AudioStream, decode_audio
+    from core.streaming import WINDOW_SECONDS, iter_segments
+
+    if model_size:
+        from core.backends import create_backend
+        model = create_backend("whisper", model_size).load()
+    else:
+        model = StubModel()
+    baseline_mb = peak_rss_mb()
+
+    segments = 0
+    if mode == "stream":
+        with AudioStream(video_path, WINDOW_SECONDS) as stream:
+            for segment, _ in iter_segments(model, stream, {}):
+                segments += segment is not None
+    else:
+        audio, _ = decode_audio(video_path)
+        for segment, _ in iter_segments(model, audio, {}):
+            segments += segment is not None
+    return {"mode": mode, "segments": segments, "baseline_mb": baseline_mb, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式解码内存基准")
+    parser.add_argument("--durations", nargs="+", type=float, default=[600, 10800],
+                        help="合成测试视频的时长（秒）")
+    parser.add_argument("--model", help="使用真实的Whisper模型（默认使用替身模型）")
+    parser.add_argument("--output", help="把结果以JSON格式写入文件")
+    parser.add_argument("--single", nargs=2, metavar=("MODE", "VIDEO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single[0], args.single[1], args.model)))
+        return
+
+    results = []
+    for duration in args.durations:
+        video_path = make_synthetic_video(duration)
+        for mode in ("full", "stream"):
+            command = [sys.executable, os.path.abspath(__file__), "--single", mode, video_path]
+            if args.model:
+                command += ["--model", args.model]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(f"{mode}/{duration:.0f}s 运行失败:\n{process.stderr.strip()}")
+                sys.exit(1)
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            result["duration"] = duration
+            results.append(result)
+
+    print(f"{'时长(s)':>10}{'解码方式':>10}{'片段数':>10}{'模型加载后(MB)':>16}{'峰值内存(MB)':>14}")
+    for r in results:
+        print(f"{r['duration']:>10.0f}{r['mode']:>10}{r['segments']:>10}{r['baseline_mb']:>16.0f}{r['peak_rss_mb']:>14.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    stream_peaks = [r["peak_rss_mb"] for r in results if r["mode"] == "stream"]
+    spread = max(stream_peaks) - min(stream_peaks)
+    if spread > FLAT_TOLERANCE_MB:
+        print(f"\n流式解码的峰值内存随时长增长了 {spread:.0f}MB（容差 {FLAT_TOLERANCE_MB}MB）")
+        sys.exit(1)
+    print(f"\n流式解码的峰值内存差 {spread:.0f}MB，在容差 {FLAT_TOLERANCE_MB}MB 以内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""字幕序列化微基准：比较旧的字符串拼接方式与 core/subtitles.py 中流式写入器的单片段耗时
+
+用法: python benchmarks/bench_subtitles.py [--segments 50000]
+"""
+import io
+import time
+import random
+import argparse
+
+import common  # noqa: F401  把src加入导入路径
+from core.subtitles import FORMATS, render, write_segments
+
+
+def make_segments(count, seed=0):
+    """生成确定性的测试片段"""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    for i in range(count):
+        duration = rng.uniform(0.8, 6.0)
+        segments.append({
+            "id": i,
+            "start": t,
+            "end": t + duration,
+            "text": " 这是第%d条测试字幕，用于衡量序列化开销。" % i,
+        })
+        t += duration + rng.uniform(0.0, 0.5)
+    return segments
+
+
+def legacy_format_timestamp(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    msecs = int((seconds - int(seconds)) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{msecs:03d}"
+
+
+def legacy_srt(segments, on_progress):
+    """重构前SubtitleWorker.run中的实现：字符串拼接并对每个片段回调进度"""
+    srt_content = ""
+    total_segments = len(segments)
+    for i, segment in enumerate(segments, 1):
+        start = legacy_format_timestamp(segment["start"])
+        end = legacy_format_timestamp(segment["end"])
+        text = segment["text"].strip()
+        srt_content += f"{i}\n{start} --> {end}\n{text}\n\n"
+        percentage = min(100, int(i / total_segments * 100))
+        on_progress(f"正在处理: {percentage}% (片段 {i}/{total_segments})")
+    return srt_content
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕序列化微基准")
+    parser.add_argument("--segments", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    segments = make_segments(args.segments)
+    callbacks = [0]
+
+    def count_progress(*_):
+        callbacks[0] += 1
+
+    results = []
+    callbacks[0] = 0
+    elapsed = timed(lambda: legacy_srt(segments, count_progress), args.repeat)
+    results.append(("legacy srt (+=)", elapsed, callbacks[0] // args.repeat))
+
+    for fmt in FORMATS:
+        callbacks[0] = 0
+        elapsed = timed(lambda: render(segments, fmt, on_progress=count_progress), args.repeat)
+        results.append((f"render {fmt}", elapsed, callbacks[0] // args.repeat))
+
+    callbacks[0] = 0
+    elapsed = timed(lambda: write_segments(io.StringIO(), segments, "srt"), args.repeat)
+    results.append(("write srt (no progress)", elapsed, 0))
+
+    print(f"片段数: {args.segments}, 每项取 {args.repeat} 次中的最好成绩")
+    print(f"{'方式':<26}{'总耗时(ms)':>12}{'单片段(us)':>12}{'进度回调':>10}")
+    for name, elapsed, progress_calls in results:
+        print(f"{name:<26}{elapsed * 1000:>12.1f}{elapsed / args.segments * 1e6:>12.2f}{progress_calls:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""基准脚本共用的工具函数"""
+import os
+import sys
+import time
+import platform
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux返回KB，macOS返回字节
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+class StageTimer:
+    """测量一个阶段的墙钟时间、CPU时间和CPU利用率"""
+
+    def __init__(self, name):
+        self.name = name
+        self.result = None
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self.result = {
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            # 多线程计算时利用率可以超过1
+            "cpu_utilization": cpu / wall if wall > 0 else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def environment_info():
+    """记录运行环境，便于跨提交比较结果"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 类语音测试音频：基频在150~250Hz之间缓慢变化的谐波音，按4Hz音节节奏调幅，每5秒停顿1秒
+SPEECH_LIKE_EXPR = (
+    "(sin(2*PI*(200+50*sin(2*PI*0.3*t))*t)"
+    "+0.5*sin(4*PI*(200+50*sin(2*PI*0.3*t))*t)"
+    "+0.25*sin(6*PI*(200+50*sin(2*PI*0.3*t))*t))"
+    "*0.3*(0.55+0.45*sin(2*PI*4*t))*gt(mod(t,5),1)"
+)
+
+
+def make_synthetic_video(duration, directory=FIXTURES_DIR, force=False):
+    """用自带的ffmpeg生成确定性的测试视频（低分辨率测试画面 + 类语音音轨），返回文件路径"""
+    from core.audio import get_ffmpeg_exe
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic_{int(duration)}s.mp4")
+    if os.path.exists(path) and not force:
+        return path
+    command = [
+        get_ffmpeg_exe(), '-y', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f"testsrc=size=160x120:rate=5:duration={duration}",
+        '-f', 'lavfi', '-i', f"aevalsrc='{SPEECH_LIKE_EXPR}':s=44100:d={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '96k', '-shortest',
+        '-fflags', '+bitexact', '-map_metadata', '-1',
+        path,
+    ]
+    subprocess.run(command, check=True)
+    return path
@@ -1,117 +1,38 @@
+"""旧版打包入口：把 src、requirements.txt、pip.conf 和 readme.txt 打包到项目目录下的 project_backup_<时间>/
+
+实际的打包由 packer_engine 完成，与 project_packer.py 使用同一套conda查找、文件选择、并发阶段和还原脚本。
+放在 project_packer 文件夹中运行时，打包的是上一级的项目目录。
+"""
 import os
 import sys
-import shutil
-import subprocess
-from datetime import datetime
-
-def get_conda_path():
-    """获取conda可执行文件的路径"""
-    # 从CONDA_PREFIX环境变量获取conda路径
-    conda_prefix = os.environ.get('CONDA_PREFIX')
-    if conda_prefix:
-        conda_root = os.path.dirname(os.path.dirname(conda_prefix))
-        possible_paths = [
-            os.path.join(conda_root, 'Scripts', 'conda.exe'),
-            os.path.join(conda_root, 'condabin', 'conda.bat'),
-            os.path.join(conda_root, 'Library', 'bin', 'conda.bat'),
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                return path
-    
-    # 如果上述方法失败，尝试从默认安装路径查找
-    program_data = os.environ.get('PROGRAMDATA', 'C:\\ProgramData')
-    possible_paths = [
-        os.path.join(program_data, 'Anaconda3', 'Scripts', 'conda.exe'),
-        os.path.join(program_data, 'Miniconda3', 'Scripts', 'conda.exe'),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            return path
-            
-    return None
 
-def export_conda_env(output_dir):
-    """导出conda环境"""
-    env_name = os.path.basename(os.environ.get('CONDA_PREFIX', ''))
-    if not env_name:
-        print("错误：未检测到conda环境")
-        return False
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if os.path.exists(os.path.join(SCRIPT_DIR, 'project_packer.py')):
+    PROJECT_DIR = SCRIPT_DIR
+else:
+    PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
 
-    conda_path = get_conda_path()
-    if not conda_path:
-        print("错误：找不到conda可执行文件")
-        return False
+from project_packer import ProjectPacker
 
-    print(f"使用conda路径: {conda_path}")
-    output_file = os.path.join(output_dir, 'environment.yml')
-    
-    try:
-        # 使用完整路径执行conda命令
-        cmd = f'"{conda_path}" env export -n {env_name} -f "{output_file}"'
-        subprocess.run(cmd, shell=True, check=True)
-        print(f"conda环境已导出到: {output_file}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"导出conda环境失败: {e}")
-        return False
+# 旧版打包的输出位置和文件选择
+LEGACY_CONFIG = {
+    "project_name": "project_backup",
+    "backup_dir": "",
+    "include_files": ["src/*", "requirements.txt", "pip.conf", "readme.txt"],
+    # 不进入之前生成的备份目录
+    "exclude_files": ["__pycache__", "*.pyc", "*.pyo", ".git", "project_backup_*"],
+    "incremental": False,
+    "archive_format": "dir",
+}
 
-def copy_project_files(project_dir, output_dir):
-    """复制项目文件"""
-    # 要复制的文件和目录
-    items_to_copy = ['src', 'requirements.txt', 'pip.conf', 'readme.txt']
-    
-    for item in items_to_copy:
-        src_path = os.path.join(project_dir, item)
-        dst_path = os.path.join(output_dir, item)
-        
-        if os.path.exists(src_path):
-            if os.path.isdir(src_path):
-                shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
-            else:
-                shutil.copy2(src_path, dst_path)
-            print(f"已复制: {item}")
-        else:
-            print(f"警告: 未找到 {item}")
-
-def create_setup_script(output_dir):
-    """创建环境设置脚本"""
-    setup_content = '''@echo off
-echo 正在创建conda环境...
-conda env create -f environment.yml
-echo 正在安装项目依赖...
-pip install -r requirements.txt
-echo 环境设置完成！
-pause
-'''
-    setup_file = os.path.join(output_dir, 'setup.bat')
-    with open(setup_file, 'w', encoding='utf-8') as f:
-        f.write(setup_content)
-    print(f"已创建设置脚本: {setup_file}")
 
 def main():
-    # 获取当前项目目录
-    project_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # 创建打包目录
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_dir = os.path.join(project_dir, 'project_backup_' + timestamp)
-    os.makedirs(output_dir, exist_ok=True)
-    
-    print(f"开始打包项目到: {output_dir}")
-    
-    # 导出conda环境
-    if export_conda_env(output_dir):
-        # 复制项目文件
-        copy_project_files(project_dir, output_dir)
-        # 创建设置脚本
-        create_setup_script(output_dir)
-        print("\n项目打包完成！")
-        print(f"打包文件位置: {output_dir}")
-    else:
+    packer = ProjectPacker(PROJECT_DIR, config=LEGACY_CONFIG)
+    if not packer.pack():
         print("项目打包失败！")
 
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
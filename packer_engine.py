@@ -0,0 +1,241 @@
+"""打包引擎：把一次打包拆成可替换、可计时的阶段，相互独立的阶段并发执行
+
+目录格式的默认流水线：
+    files    遍历项目目录、按模式过滤、复制或哈希后写入对象库，边遍历边处理
+    env      导出conda环境，与files并发
+    vendor   放入离线依赖包（--vendor），与files、env并发
+    scripts  还原工具和setup脚本
+    readme   说明文件，依赖files的文件列表
+压缩包格式下files把项目文件流式写入压缩包，finish在files、env、vendor都完成后写入其余成员。
+
+阶段可以通过 engine.replace(name, func) 替换，或通过 engine.add(Stage(...)) 增加：
+
+    engine = default_engine(packer)
+    engine.add(Stage("lint", run_lint, label="代码检查"))
+    packer.pack(engine)
+"""
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from project_packer import ArchiveWriter, VENDOR_DIR
+
+
+class Stage:
+    """流水线中的一个阶段
+
+    func(context) 执行阶段，返回False或抛出异常表示失败；requires为必须先完成的阶段名。
+    """
+
+    def __init__(self, name, func, requires=(), label=None):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.label = label or name
+
+
+class PackContext:
+    """一次打包的共享状态，各阶段通过它传递结果"""
+
+    def __init__(self, packer, root_name, output_dir, work_dir=None):
+        self.packer = packer
+        self.root_name = root_name
+        self.output_dir = output_dir  # 目录格式为备份目录，压缩包格式为压缩包路径
+        self.work_dir = work_dir  # 压缩包格式下存放环境文件和依赖包的临时目录
+        self.copied_files = []
+        self.writer = None
+        self.manifest = {}
+
+
+class PackEngine:
+    """按依赖关系调度阶段：依赖都已完成的阶段立即提交到线程池，某个阶段失败后不再启动新阶段"""
+
+    def __init__(self, stages=()):
+        self.stages = {}
+        self.timings = {}  # 阶段名 -> (相对开始时间, 耗时)
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage):
+        self.stages[stage.name] = stage
+
+    def replace(self, name, func):
+        """替换已有阶段的执行函数，保留其依赖关系"""
+        stage = self.stages[name]
+        self.stages[name] = Stage(name, func, stage.requires, stage.label)
+
+    def remove(self, name):
+        """移除阶段，并从其他阶段的依赖中去掉"""
+        del self.stages[name]
+        for stage in self.stages.values():
+            stage.requires = tuple(r for r in stage.requires if r != name)
+
+    def _check(self):
+        for stage in self.stages.values():
+            unknown = [r for r in stage.requires if r not in self.stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 依赖不存在的阶段: {', '.join(unknown)}")
+
+    def _run_stage(self, stage, context, start):
+        stage_start = time.perf_counter()
+        try:
+            return stage.func(context) is not False
+        except Exception as e:
+            print(f"{stage.label}失败: {e}")
+            return False
+        finally:
+            self.timings[stage.name] = (stage_start - start, time.perf_counter() - stage_start)
+
+    def run(self, context):
+        """执行所有阶段，全部成功时返回True"""
+        self._check()
+        self.timings = {}
+        pending = dict(self.stages)
+        done = set()
+        failed = None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="stage") as pool:
+            running = {}
+            while pending or running:
+                if failed is None:
+                    for name, stage in list(pending.items()):
+                        if all(r in done for r in stage.requires):
+                            running[pool.submit(self._run_stage, stage, context, start)] = stage
+                            del pending[name]
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    if future.result():
+                        done.add(stage.name)
+                    elif failed is None:
+                        failed = stage.name
+        self.total_seconds = time.perf_counter() - start
+        return failed is None
+
+    def format_timings(self):
+        """各阶段的开始时间和耗时，并发执行的阶段开始时间相近"""
+        lines = ["各阶段耗时:"]
+        for name, (offset, seconds) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            lines.append(f"  {self.stages[name].label:<10} 开始于 +{offset:5.1f}秒  耗时 {seconds:6.1f}秒")
+        lines.append(f"  合计 {self.total_seconds:.1f}秒")
+        return "\n".join(lines)
+
+
+def copy_files_stage(context):
+    packer = context.packer
+    if packer.incremental:
+        context.copied_files = packer.store_project_files(context.output_dir)
+    else:
+        context.copied_files = packer.copy_project_files(context.output_dir)
+    print(f"已复制 {len(context.copied_files)} 个文件")
+
+
+def export_env_stage(context):
+    return context.packer.export_conda_env(context.work_dir or context.output_dir)
+
+
+def vendor_stage(context):
+    base_dir = context.work_dir or context.output_dir
+    context.packer.vendor_dependencies(os.path.join(base_dir, VENDOR_DIR))
+
+
+def scripts_stage(context):
+    context.packer.install_restore_script(context.output_dir)
+    context.packer.create_setup_scripts(context.output_dir)
+    print("已创建环境设置脚本")
+
+
+def readme_stage(context):
+    context.packer.create_readme(context.output_dir, context.copied_files)
+    print("已创建项目说明文件")
+
+
+def archive_files_stage(context):
+    context.copied_files = context.packer.archive_project_files(
+        context.writer, context.root_name, context.manifest)
+
+
+def finish_archive_stage(context):
+    vendor_dir = os.path.join(context.work_dir, VENDOR_DIR)
+    context.packer.finish_archive(context.writer, context.root_name, context.manifest, context.copied_files,
+                                  context.work_dir, vendor_dir if os.path.isdir(vendor_dir) else None)
+
+
+def default_engine(packer):
+    """按打包器的配置（格式、增量、依赖包）组装默认流水线"""
+    vendor = packer.vendor
+    if packer.archive_format == "dir":
+        stages = [
+            Stage("files", copy_files_stage, label="复制文件"),
+            Stage("env", export_env_stage, label="导出环境"),
+            Stage("scripts", scripts_stage, label="还原脚本"),
+            Stage("readme", readme_stage, requires=["files"], label="说明文件"),
+        ]
+    else:
+        stages = [
+            Stage("files", archive_files_stage, label="写入文件"),
+            Stage("env", export_env_stage, label="导出环境"),
+            Stage("finish", finish_archive_stage, requires=["files", "env"] + (["vendor"] if vendor else []),
+                  label="完成压缩包"),
+        ]
+    if vendor:
+        stages.append(Stage("vendor", vendor_stage, label="依赖包"))
+    return PackEngine(stages)
+
+
+def pack_with_engine(packer, engine=None):
+    """执行打包；目录格式失败时删除不完整的备份目录，压缩包先写入.partial文件，成功后再改名"""
+    conda_info, error = packer.get_conda_info()
+    if error:
+        print(error)
+        return False
+    engine = engine or default_engine(packer)
+
+    output_base = os.path.join(packer.project_dir, packer.config["backup_dir"])
+    root_name = f'{packer.config["project_name"]}_{packer.timestamp}'
+    os.makedirs(output_base, exist_ok=True)
+
+    if packer.archive_format == "dir":
+        output_dir = os.path.join(output_base, root_name)
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"开始打包项目到: {output_dir}")
+        ok = engine.run(PackContext(packer, root_name, output_dir))
+        print(engine.format_timings())
+        if not ok:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            print("项目打包失败，已删除不完整的备份目录")
+            return False
+        print("\n项目打包完成！")
+        print(f"打包文件位置: {output_dir}")
+        return True
+
+    archive_path = os.path.join(output_base, f'{root_name}.{packer.archive_format}')
+    partial_path = archive_path + '.partial'
+    print(f"开始打包项目到: {archive_path}")
+    with tempfile.TemporaryDirectory(prefix='packer_work_') as work_dir:
+        context = PackContext(packer, root_name, archive_path, work_dir)
+        context.writer = ArchiveWriter(partial_path, packer.archive_format)
+        try:
+            ok = engine.run(context)
+        finally:
+            try:
+                context.writer.close()
+            except Exception as e:
+                print(f"关闭压缩包失败: {e}")
+                ok = False
+    print(engine.format_timings())
+    if not ok:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        print("项目打包失败")
+        return False
+    os.replace(partial_path, archive_path)
+
+    print(f"已打包 {len(context.copied_files)} 个文件，压缩包大小 {os.path.getsize(archive_path) / 1024 / 1024:.1f}MB")
+    print("\n项目打包完成！")
+    print(f"打包文件位置: {archive_path}")
+    return True
@@ -1,18 +1,204 @@
+import io
 import os
+import re
+import ast
 import sys
+import gzip
+import stat
+import time
 import shutil
+import fnmatch
+import hashlib
+import tarfile
+import zipfile
+import argparse
+import tempfile
+import threading
 import subprocess
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+# 增量备份时计算文件哈希每次读取的字节数
+HASH_CHUNK_BYTES = 1 << 20
+# copy_file_range 每次调用复制的最大字节数
+COPY_CHUNK_BYTES = 1 << 30
+# 每个线程池任务处理的文件数，小文件很多时逐个提交任务的开销会超过复制本身
+FILES_PER_TASK = 64
+# 打包格式：dir为目录，其余为压缩包
+ARCHIVE_FORMATS = ("dir", "tar.zst", "tar.gz", "zip")
+ZSTD_LEVEL = 3
+# conda导出的环境文件，依次为完整环境和只含手动安装包的精简环境
+ENV_FILES = ('environment.yml', 'environment.min.yml')
+DEFAULT_ENV_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'project_packer', 'conda_env')
+# 离线还原所需的依赖包放在备份中的该目录下：wheels/ 为pip的wheel，conda/ 为conda包
+VENDOR_DIR = 'vendor'
+# 还原工具，打包时复制到备份中并命名为restore.py
+RESTORE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'project_restore.py')
+
+
+def compile_patterns(patterns):
+    """把多个glob模式合并为一个正则表达式，匹配规则与fnmatch相同（Windows上不区分大小写）"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(os.path.normcase(p))})' for p in patterns))
+
+
+def copy_file_fast(src, dst):
+    """复制文件内容和元数据（同shutil.copy2）
+
+    Linux上优先使用copy_file_range，数据不经过用户态，在支持的文件系统上还能共享数据块；
+    不支持时回退到shutil.copyfile，它在Linux上使用sendfile，在macOS上使用fcopyfile。
+    copy_file_range在某些文件系统上（如procfs、部分网络文件系统）会提前返回0，
+    复制的字节数与文件大小不符或一个字节也没有复制（大小记为0的伪文件）时同样回退。
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = 0
+                while True:
+                    count = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK_BYTES)
+                    if not count:
+                        break
+                    copied += count
+            if copied and copied == size:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+class HashingReader:
+    """读取文件的同时计算SHA-256，写入压缩包和计算哈希只需读一次文件"""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+
+class ArchiveWriter:
+    """流式写入压缩包，文件内容从磁盘直接读入压缩流，不在磁盘上产生中间副本
+
+    tar.zst 使用 zstandard 库的多线程压缩，未安装时使用 zstd -T0 命令；
+    tar.gz 在有 pigz 时用其多线程压缩，否则使用单线程的gzip；zip 使用单线程的deflate。
+    """
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._raw = open(path, 'wb')
+        self._compressor = None
+        self._process = None
+        self._tar = None
+        self._zip = None
+        try:
+            if fmt == "zip":
+                self._zip = zipfile.ZipFile(self._raw, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+            else:
+                # 'w|' 为流模式，tar数据顺序写入压缩流，不需要回写
+                self._tar = tarfile.open(fileobj=self._open_stream(fmt), mode='w|', format=tarfile.PAX_FORMAT)
+        except Exception:
+            self._raw.close()
+            raise
+
+    def _open_stream(self, fmt):
+        if fmt == "tar.zst":
+            try:
+                import zstandard
+                self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1).stream_writer(self._raw)
+                return self._compressor
+            except ImportError:
+                zstd = shutil.which('zstd')
+                if not zstd:
+                    raise RuntimeError("打包为tar.zst需要安装zstandard（pip install zstandard）或zstd命令")
+                return self._pipe([zstd, '-T0', f'-{ZSTD_LEVEL}', '-q', '-c'])
+        pigz = shutil.which('pigz')
+        if pigz:
+            return self._pipe([pigz, '-c'])
+        self._compressor = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        return self._compressor
+
+    def _pipe(self, command):
+        """由外部命令压缩：tar数据写入其标准输入，压缩结果直接写入文件"""
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=self._raw)
+        return self._process.stdin
+
+    def add_file(self, f, arcname, st):
+        """把已打开的文件写入压缩包，返回内容的SHA-256"""
+        reader = HashingReader(f)
+        if self._tar is not None:
+            info = tarfile.TarInfo(arcname)
+            info.size = st.st_size
+            info.mtime = st.st_mtime
+            info.mode = stat.S_IMODE(st.st_mode)
+            self._tar.addfile(info, reader)
+        else:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(st.st_mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (st.st_mode & 0xFFFF) << 16
+            info.file_size = st.st_size
+            with self._zip.open(info, 'w', force_zip64=st.st_size >= zipfile.ZIP64_LIMIT) as dst:
+                shutil.copyfileobj(reader, dst, HASH_CHUNK_BYTES)
+        return reader.digest.hexdigest()
+
+    def add_bytes(self, arcname, data, mode=0o644):
+        """把生成的内容（如清单、还原脚本）写入压缩包，返回内容的SHA-256"""
+        if self._tar is not None:
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mtime = time.time()
+            info.mode = mode
+            self._tar.addfile(info, io.BytesIO(data))
+        else:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (stat.S_IFREG | mode) << 16
+            self._zip.writestr(info, data)
+        return hashlib.sha256(data).hexdigest()
+
+    def close(self):
+        try:
+            if self._zip is not None:
+                self._zip.close()
+            if self._tar is not None:
+                self._tar.close()
+            if self._compressor is not None:
+                self._compressor.close()
+            if self._process is not None:
+                self._process.stdin.close()
+                if self._process.wait() != 0:
+                    raise RuntimeError(f"压缩命令执行失败，退出码 {self._process.returncode}")
+        finally:
+            self._raw.close()
+
 class ProjectPacker:
-    def __init__(self, project_dir=None):
-        """初始化项目打包器"""
+    def __init__(self, project_dir=None, incremental=None, archive_format=None, vendor=None, config=None):
+        """初始化项目打包器，config中的配置项覆盖packer_config.json"""
         self.project_dir = project_dir or os.path.dirname(os.path.abspath(__file__))
         self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         self.config = self.load_config()
+        if config:
+            self.config.update(config)
         self.conda_executable = self._get_conda_executable()
+        # 增量备份：文件内容只在对象库中保存一份，每次备份只生成清单和硬链接
+        self.incremental = self.config["incremental"] if incremental is None else incremental
+        # 打包格式：目录或流式写入的压缩包
+        self.archive_format = archive_format or self.config["archive_format"]
+        if self.archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的打包格式: {self.archive_format}")
+        # 把pip的wheel和conda包一起放入备份，还原时无需联网
+        self.vendor = self.config["vendor"] if vendor is None else vendor
+        self._exclude_re = compile_patterns(self.config["exclude_files"])
+        self._include_re = compile_patterns(self.config["include_files"])
 
     def _get_conda_executable(self):
         """获取conda可执行文件的路径"""
@@ -30,13 +216,18 @@ class ProjectPacker:
                 conda_path = os.path.join(conda_root, 'condabin', 'conda.bat')
                 if os.path.exists(conda_path):
                     return conda_path
+
+                conda_path = os.path.join(conda_root, 'Library', 'bin', 'conda.bat')
+                if os.path.exists(conda_path):
+                    return conda_path
                 
             # 如果上述方法失败，尝试从默认安装路径查找
+            program_data = os.environ.get('PROGRAMDATA', os.path.join('C:', os.sep, 'ProgramData'))
             possible_paths = [
                 os.path.join(os.environ.get('USERPROFILE', ''), 'Anaconda3', 'Scripts', 'conda.exe'),
                 os.path.join(os.environ.get('USERPROFILE', ''), 'Miniconda3', 'Scripts', 'conda.exe'),
-                os.path.join('C:', os.sep, 'ProgramData', 'Anaconda3', 'Scripts', 'conda.exe'),
-                os.path.join('C:', os.sep, 'ProgramData', 'Miniconda3', 'Scripts', 'conda.exe'),
+                os.path.join(program_data, 'Anaconda3', 'Scripts', 'conda.exe'),
+                os.path.join(program_data, 'Miniconda3', 'Scripts', 'conda.exe'),
             ]
             
             for path in possible_paths:
@@ -55,7 +246,13 @@ class ProjectPacker:
             "exclude_files": ["__pycache__", "*.pyc", "*.pyo", "*.pyd", ".git", ".idea", ".vscode"],
             "include_dirs": ["src", "docs", "tests", "configs"],
             "exclude_dirs": ["venv", "env", "build", "dist", "__pycache__", ".pytest_cache"],
-            "backup_dir": "project_backups"
+            "backup_dir": "project_backups",
+            "incremental": False,
+            "archive_format": "dir",
+            "copy_workers": 0,  # 复制文件的线程数，0表示按CPU核数自动选择
+            "env_cache_dir": DEFAULT_ENV_CACHE_DIR,
+            "conda_timeout": 120,  # conda导出超过该时间（秒）时改为直接读取conda-meta
+            "vendor": False
         }
 
         config_file = os.path.join(self.project_dir, "packer_config.json")
@@ -82,6 +279,7 @@ class ProjectPacker:
 
             return {
                 "env_name": env_name,
+                "env_prefix": os.environ['CONDA_PREFIX'],
                 "python_version": python_version,
                 "platform": sys.platform
             }, None
@@ -89,80 +287,584 @@ class ProjectPacker:
             return None, f"获取conda信息失败: {e}"
 
     def export_conda_env(self, output_dir):
-        """导出conda环境"""
+        """导出conda环境
+
+        环境未变化时直接使用上次的导出结果；否则同时运行完整导出和 --from-history 导出，
+        conda不可用、失败或超时时改为直接读取环境中的conda-meta生成环境文件。
+        """
         conda_info, error = self.get_conda_info()
         if error:
             print(error)
             return False
 
-        try:
-            # 导出完整环境
-            env_file = os.path.join(output_dir, 'environment.yml')
-            subprocess.run([self.conda_executable, 'env', 'export', '-n', conda_info['env_name'], '-f', env_file], 
-                         check=True, shell=True if sys.platform.startswith('win') else False)
-
-            # 创建精简版环境文件
-            env_file_min = os.path.join(output_dir, 'environment.min.yml')
-            subprocess.run([self.conda_executable, 'env', 'export', '-n', conda_info['env_name'], '--from-history', '-f', env_file_min],
-                         check=True, shell=True if sys.platform.startswith('win') else False)
-
-            print(f"conda环境已导出到: {env_file}")
-            print(f"精简环境配置已导出到: {env_file_min}")
+        prefix = conda_info['env_prefix']
+        fingerprint = self.env_fingerprint(prefix)
+        cache_dir = os.path.join(self.config["env_cache_dir"], fingerprint) if fingerprint else None
+        if cache_dir and all(os.path.exists(os.path.join(cache_dir, name)) for name in ENV_FILES):
+            for name in ENV_FILES:
+                shutil.copy2(os.path.join(cache_dir, name), os.path.join(output_dir, name))
+            print(f"conda环境未变化，使用缓存的导出结果: {cache_dir}")
             return True
-        except subprocess.CalledProcessError as e:
-            print(f"导出conda环境失败: {e}")
-            return False
+
+        start_time = time.perf_counter()
+        if self.run_conda_exports(prefix, output_dir):
+            print(f"conda环境已导出到: {os.path.join(output_dir, ENV_FILES[0])}")
+            print(f"精简环境配置已导出到: {os.path.join(output_dir, ENV_FILES[1])}")
+            print(f"conda导出耗时 {time.perf_counter() - start_time:.1f}秒")
+            if cache_dir:
+                self.save_env_cache(cache_dir, output_dir)
+            return True
+
+        print("改为直接读取conda-meta生成环境文件...")
+        try:
+            self.export_from_conda_meta(prefix, conda_info['env_name'], output_dir)
         except Exception as e:
             print(f"导出过程中出现错误: {e}")
             return False
+        print(f"conda环境已根据conda-meta导出到: {output_dir}")
+        return True
+
+    @staticmethod
+    def env_fingerprint(prefix):
+        """计算环境指纹，环境中用conda或pip安装、卸载包后会改变
+
+        conda的包记录在conda-meta中，取其中各文件和history的大小、修改时间；pip安装的包不改动conda-meta，
+        另取site-packages中各 .dist-info/.egg-info 的名称和修改时间（environment.yml 的 pip 部分由此而来）。
+        """
+        meta_dir = os.path.join(prefix, 'conda-meta')
+        try:
+            entries = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                             for entry in os.scandir(meta_dir) if entry.is_file())
+            for site_dir in ProjectPacker.site_packages_dirs(prefix):
+                entries += sorted((os.path.join(site_dir, entry.name), 0, entry.stat().st_mtime_ns)
+                                  for entry in os.scandir(site_dir)
+                                  if entry.name.endswith(('.dist-info', '.egg-info')))
+        except OSError:
+            return None
+        digest = hashlib.sha256(os.path.abspath(prefix).encode('utf-8'))
+        for name, size, mtime_ns in entries:
+            digest.update(f"{name}\0{size}\0{mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def save_env_cache(cache_dir, output_dir):
+        """保存导出结果，先写入临时目录再改名，避免并发打包时读到不完整的缓存"""
+        try:
+            parent = os.path.dirname(cache_dir)
+            os.makedirs(parent, exist_ok=True)
+            temp_dir = tempfile.mkdtemp(dir=parent)
+            for name in ENV_FILES:
+                shutil.copy2(os.path.join(output_dir, name), os.path.join(temp_dir, name))
+            try:
+                os.replace(temp_dir, cache_dir)
+            except OSError:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        except OSError as e:
+            print(f"警告: 无法保存conda导出缓存: {e}")
+
+    def conda_available(self):
+        return os.path.exists(self.conda_executable) or shutil.which(self.conda_executable) is not None
+
+    def run_conda_exports(self, prefix, output_dir):
+        """同时运行完整导出和精简导出，两者都成功时返回True"""
+        if not self.conda_available():
+            print(f"找不到conda可执行文件: {self.conda_executable}")
+            return False
+
+        def export(extra_args, env_file):
+            # 从标准输出读取导出结果：新版conda的 -f 参数按文件名判断格式，不接受 environment.min.yml
+            command = [self.conda_executable, 'env', 'export', '-p', prefix] + extra_args
+            result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8',
+                                    errors='ignore', timeout=self.config["conda_timeout"],
+                                    shell=True if sys.platform.startswith('win') else False)
+            with open(env_file, 'w', encoding='utf-8') as f:
+                f.write(result.stdout)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(export, [], os.path.join(output_dir, ENV_FILES[0])),
+                pool.submit(export, ['--from-history'], os.path.join(output_dir, ENV_FILES[1])),
+            ]
+            ok = True
+            for future in futures:
+                try:
+                    future.result()
+                except subprocess.TimeoutExpired:
+                    print(f"conda导出超过 {self.config['conda_timeout']} 秒")
+                    ok = False
+                except subprocess.CalledProcessError as e:
+                    print(f"导出conda环境失败: {e}\n{(e.stderr or '').strip()}")
+                    ok = False
+                except OSError as e:
+                    print(f"导出conda环境失败: {e}")
+                    ok = False
+        return ok
+
+    @staticmethod
+    def channel_name(channel):
+        """把conda-meta中的频道地址转换为environment.yml中的频道名"""
+        if not channel:
+            return None
+        channel = channel.rstrip('/')
+        parts = channel.split('/')
+        # 去掉平台子目录，如 linux-64、win-64、noarch
+        if parts[-1] == 'noarch' or re.match(r'^(linux|win|osx|zos)-', parts[-1]):
+            parts = parts[:-1]
+        if 'repo.anaconda.com' in channel or parts[-2:-1] == ['pkgs']:
+            return 'defaults'
+        return parts[-1]
+
+    @staticmethod
+    def site_packages_dirs(prefix):
+        """环境中的site-packages目录（Windows为Lib/site-packages，其他平台为lib/pythonX.Y/site-packages）"""
+        site_dirs = [os.path.join(prefix, 'Lib', 'site-packages')]
+        lib_dir = os.path.join(prefix, 'lib')
+        if os.path.isdir(lib_dir):
+            site_dirs += [os.path.join(lib_dir, name, 'site-packages') for name in sorted(os.listdir(lib_dir))
+                          if name.startswith('python')]
+        return [path for path in site_dirs if os.path.isdir(path)]
+
+    @staticmethod
+    def pip_packages(prefix):
+        """环境中由pip安装（不在conda-meta中）的包，返回 ["名称==版本"]"""
+        from importlib import metadata
+        packages = set()
+        for dist in metadata.distributions(path=ProjectPacker.site_packages_dirs(prefix)):
+            installer = (dist.read_text('INSTALLER') or '').strip()
+            if installer == 'pip' and dist.metadata['Name']:
+                packages.add(f"{dist.metadata['Name']}=={dist.version}")
+        return sorted(packages, key=str.lower)
+
+    @staticmethod
+    def history_specs(prefix):
+        """从conda-meta/history中读取用户手动安装的包，与 --from-history 的结果相同"""
+        specs = {}
+        history_file = os.path.join(prefix, 'conda-meta', 'history')
+        if not os.path.exists(history_file):
+            return []
+        with open(history_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                for prefix_text, remove in (('# update specs:', False), ('# remove specs:', True)):
+                    if line.startswith(prefix_text):
+                        try:
+                            items = ast.literal_eval(line[len(prefix_text):].strip())
+                        except (ValueError, SyntaxError):
+                            continue
+                        for spec in items:
+                            name = re.split(r'[\s=<>!\[]', spec.split('::')[-1], 1)[0]
+                            if remove:
+                                specs.pop(name, None)
+                            else:
+                                specs[name] = spec.split('::')[-1]
+        return list(specs.values())
+
+    def export_from_conda_meta(self, prefix, env_name, output_dir):
+        """不调用conda，直接根据conda-meta中的包记录生成environment.yml和environment.min.yml"""
+        meta_dir = os.path.join(prefix, 'conda-meta')
+        packages = []
+        channels = []
+        for name in sorted(os.listdir(meta_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(meta_dir, name), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            packages.append(f"{record['name']}={record['version']}={record['build']}")
+            channel = self.channel_name(record.get('channel'))
+            if channel and channel not in channels:
+                channels.append(channel)
+
+        def write_env(path, dependencies, pip_dependencies=()):
+            lines = [f"name: {env_name}", "channels:"]
+            lines += [f"  - {channel}" for channel in channels]
+            lines.append("dependencies:")
+            lines += [f"  - {dependency}" for dependency in dependencies]
+            if pip_dependencies:
+                lines.append("  - pip:")
+                lines += [f"    - {dependency}" for dependency in pip_dependencies]
+            lines.append(f"prefix: {prefix}")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+
+        write_env(os.path.join(output_dir, ENV_FILES[0]), packages, self.pip_packages(prefix))
+        write_env(os.path.join(output_dir, ENV_FILES[1]), self.history_specs(prefix))
 
     def should_include_file(self, file_path):
         """检查文件是否应该包含在打包中"""
-        from fnmatch import fnmatch
-        
-        file_name = os.path.basename(file_path)
-        rel_path = os.path.relpath(file_path, self.project_dir)
+        return self.match_file(os.path.basename(file_path), os.path.relpath(file_path, self.project_dir))
+
+    def match_file(self, file_name, rel_path):
+        """按文件名或相对路径匹配排除项和包含项，排除项优先"""
+        file_name = os.path.normcase(file_name)
+        rel_path = os.path.normcase(rel_path)
+        if self._exclude_re and (self._exclude_re.match(file_name) or self._exclude_re.match(rel_path)):
+            return False
+        return bool(self._include_re and (self._include_re.match(file_name) or self._include_re.match(rel_path)))
 
-        # 检查排除项
-        for pattern in self.config["exclude_files"]:
-            if fnmatch(file_name, pattern) or fnmatch(rel_path, pattern):
-                return False
+    def iter_project_files(self):
+        """单次遍历项目目录，产出 (源路径, 相对路径, stat结果)
 
-        # 检查包含项
-        for pattern in self.config["include_files"]:
-            if fnmatch(file_name, pattern) or fnmatch(rel_path, pattern):
-                return True
+        使用os.scandir，目录项自带的类型信息省去了对每个文件的额外stat调用，
+        相对路径在遍历时逐级拼接。与os.walk一样不进入指向目录的符号链接。
+        """
+        exclude_dirs = set(self.config["exclude_dirs"])
+        stack = [(self.project_dir, '')]
+        while stack:
+            directory, rel_dir = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"警告: 无法读取目录 {directory}: {e}")
+                continue
+            subdirs = []
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                try:
+                    if entry.is_dir():
+                        # 过滤目录，备份目录本身始终排除
+                        if (not entry.is_symlink() and entry.name not in exclude_dirs
+                                and not (not rel_dir and entry.name == self.config["backup_dir"])):
+                            subdirs.append((entry.path, rel_path))
+                    elif self.match_file(entry.name, rel_path):
+                        yield entry.path, rel_path, entry.stat()
+                except OSError as e:
+                    print(f"警告: 无法读取 {rel_path}: {e}")
+            # 逆序入栈，使遍历顺序与目录项的排序一致
+            stack.extend(reversed(subdirs))
+
+    def copy_workers(self):
+        return self.config["copy_workers"] or min(32, (os.cpu_count() or 1) * 4)
+
+    def run_file_pool(self, func, description):
+        """边遍历边把匹配的文件交给线程池中的func(源路径, 相对路径, stat结果)处理，返回成功的结果列表
+
+        文件按批提交给线程池，单个文件失败时只打印错误，不影响其他文件。
+        """
+        def run_batch(batch):
+            batch_results = []
+            for item in batch:
+                try:
+                    batch_results.append(func(*item))
+                except Exception as e:
+                    print(f"{description}失败 {item[1]}: {e}")
+            return batch_results
 
-        return False
+        workers = self.copy_workers()
+        if workers == 1:
+            return run_batch(self.iter_project_files())
+
+        results = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="packer") as pool:
+            futures = []
+            batch = []
+            for item in self.iter_project_files():
+                batch.append(item)
+                if len(batch) >= FILES_PER_TASK:
+                    futures.append(pool.submit(run_batch, batch))
+                    batch = []
+            if batch:
+                futures.append(pool.submit(run_batch, batch))
+            for future in as_completed(futures):
+                results.extend(future.result())
+        return results
 
     def copy_project_files(self, output_dir):
         """复制项目文件"""
-        def copy_file_with_path(src, dst):
-            dst_dir = os.path.dirname(dst)
-            if not os.path.exists(dst_dir):
-                os.makedirs(dst_dir)
-            shutil.copy2(src, dst)
+        created_dirs = set()
 
-        copied_files = []
-        for root, dirs, files in os.walk(self.project_dir):
-            # 过滤目录
-            dirs[:] = [d for d in dirs if d not in self.config["exclude_dirs"]]
-
-            for file in files:
-                src_path = os.path.join(root, file)
-                if self.should_include_file(src_path):
-                    rel_path = os.path.relpath(src_path, self.project_dir)
-                    dst_path = os.path.join(output_dir, rel_path)
-                    try:
-                        copy_file_with_path(src_path, dst_path)
-                        copied_files.append(rel_path)
-                    except Exception as e:
-                        print(f"复制文件失败 {rel_path}: {e}")
+        def copy_file_with_path(src_path, rel_path, st):
+            dst_path = os.path.join(output_dir, rel_path)
+            dst_dir = os.path.dirname(dst_path)
+            if dst_dir not in created_dirs:
+                os.makedirs(dst_dir, exist_ok=True)
+                created_dirs.add(dst_dir)
+            copy_file_fast(src_path, dst_path)
+            return rel_path
 
-        return copied_files
+        return sorted(self.run_file_pool(copy_file_with_path, "复制文件"))
+
+    def object_store_dir(self):
+        """增量备份的对象库目录，所有备份共用"""
+        return os.path.join(self.project_dir, self.config["backup_dir"], 'objects')
+
+    def load_store_index(self, store_dir):
+        """读取文件索引：相对路径 -> 上次备份时的大小、修改时间和哈希"""
+        index_file = os.path.join(store_dir, 'index.json')
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"警告: 无法读取对象库索引，将重新计算所有文件的哈希: {e}")
+        return {}
+
+    def save_store_index(self, store_dir, index):
+        index_file = os.path.join(store_dir, 'index.json')
+        temp_file = index_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_file, index_file)
+
+    @staticmethod
+    def hash_file(path):
+        """计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def blob_mode(st):
+        """对象的权限：原文件的权限去掉写权限
+
+        对象库中的文件被多个备份硬链接共用，去掉写权限防止通过某个备份修改；
+        权限不同的文件（如可执行脚本）各用一个对象，原权限记录在清单中，还原时恢复。
+        """
+        return (stat.S_IMODE(st.st_mode) | stat.S_IRUSR) & ~0o222
+
+    @staticmethod
+    def blob_path(store_dir, digest, mode):
+        return os.path.join(store_dir, digest[:2], f"{digest[2:]}.{mode:o}")
+
+    def store_file(self, src_path, rel_path, st, store_dir, index):
+        """把文件放入对象库，返回 (哈希, 文件信息, 是否新写入)
+
+        大小和修改时间都与索引中的记录相同时直接使用记录的哈希，不读取文件内容。
+        """
+        mode = self.blob_mode(st)
+        entry = index.get(rel_path)
+        if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and os.path.exists(self.blob_path(store_dir, entry["hash"], mode))):
+            return entry["hash"], st, False
+
+        digest = self.hash_file(src_path)
+        index[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        blob = self.blob_path(store_dir, digest, mode)
+        if os.path.exists(blob):
+            # 内容相同的文件（如改名或复制）只保存一份
+            return digest, st, False
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        # 内容相同的新文件可能同时由多个线程写入，临时文件名需各不相同
+        temp_blob = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+        copy_file_fast(src_path, temp_blob)
+        os.chmod(temp_blob, mode)
+        os.replace(temp_blob, blob)
+        return digest, st, True
+
+    @staticmethod
+    def link_or_copy(blob, dst_path):
+        """在备份目录中创建指向对象的硬链接，不支持硬链接时（如跨磁盘）改为复制"""
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        try:
+            os.link(blob, dst_path)
+            return True
+        except OSError:
+            shutil.copy2(blob, dst_path)
+            return False
+
+    def store_project_files(self, output_dir):
+        """增量备份项目文件：内容写入对象库，备份目录中只有清单和指向对象的硬链接"""
+        store_dir = self.object_store_dir()
+        os.makedirs(store_dir, exist_ok=True)
+        index = self.load_store_index(store_dir)
+
+        def store_and_link(src_path, rel_path, st):
+            digest, st, is_new = self.store_file(src_path, rel_path, st, store_dir, index)
+            blob = self.blob_path(store_dir, digest, self.blob_mode(st))
+            linked = self.link_or_copy(blob, os.path.join(output_dir, rel_path))
+            return rel_path, digest, st, is_new, linked
+
+        manifest = {}
+        stored_files = []
+        new_count = new_bytes = reused_count = copied_count = 0
+        for rel_path, digest, st, is_new, linked in sorted(self.run_file_pool(store_and_link, "备份文件")):
+            if not linked:
+                copied_count += 1
+            manifest[rel_path.replace(os.sep, '/')] = {
+                "hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "mode": stat.S_IMODE(st.st_mode),
+            }
+            stored_files.append(rel_path)
+            if is_new:
+                new_count += 1
+                new_bytes += st.st_size
+            else:
+                reused_count += 1
+
+        self.save_store_index(store_dir, index)
+        with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({"object_store": os.path.relpath(store_dir, output_dir), "algorithm": "sha256",
+                       "files": manifest}, f, ensure_ascii=False, indent=2)
+
+        print(f"增量备份: 新增对象 {new_count} 个 ({new_bytes / 1024 / 1024:.1f}MB)，复用未变化的对象 {reused_count} 个")
+        if copied_count:
+            print(f"警告: {copied_count} 个文件无法创建硬链接，已改为复制")
+        return stored_files
+
+    @staticmethod
+    def conda_pkgs_dirs(prefix):
+        """可能存放conda包原始文件的缓存目录"""
+        dirs = [d for d in os.environ.get('CONDA_PKGS_DIRS', '').split(os.pathsep) if d]
+        root = prefix
+        if os.path.basename(os.path.dirname(prefix)) == 'envs':
+            root = os.path.dirname(os.path.dirname(prefix))
+        dirs += [os.path.join(root, 'pkgs'), os.path.join(os.path.expanduser('~'), '.conda', 'pkgs')]
+        return [d for d in dirs if os.path.isdir(d)]
+
+    @staticmethod
+    def conda_install_order(records):
+        """按依赖关系排序conda-meta记录，被依赖的包排在前面"""
+        by_name = {record['name']: record for record in records}
+        ordered = []
+        visited = set()
+        for root in sorted(by_name):
+            # 用栈代替递归，依赖链很长时也不会超出递归深度
+            stack = [(root, False)]
+            while stack:
+                name, expanded = stack.pop()
+                if expanded:
+                    ordered.append(by_name[name])
+                    continue
+                if name in visited or name not in by_name:
+                    continue
+                visited.add(name)
+                stack.append((name, True))
+                for spec in reversed(by_name[name].get('depends', [])):
+                    stack.append((spec.split()[0], False))
+        return ordered
+
+    def vendor_conda_packages(self, prefix, vendor_dir):
+        """从conda的包缓存中复制环境里每个包的原始文件，返回 (按安装顺序排列的包列表, 是否齐全)"""
+        meta_dir = os.path.join(prefix, 'conda-meta')
+        records = []
+        for entry in os.scandir(meta_dir):
+            if entry.name.endswith('.json'):
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                if record.get('fn') and record.get('md5'):
+                    records.append(record)
+
+        pkgs_dirs = self.conda_pkgs_dirs(prefix)
+        conda_dir = os.path.join(vendor_dir, 'conda')
+        os.makedirs(conda_dir, exist_ok=True)
+
+        def copy_package(record):
+            for pkgs_dir in pkgs_dirs:
+                src_path = os.path.join(pkgs_dir, record['fn'])
+                if os.path.isfile(src_path):
+                    copy_file_fast(src_path, os.path.join(conda_dir, record['fn']))
+                    return True
+            return False
+
+        ordered = self.conda_install_order(records)
+        with ThreadPoolExecutor(max_workers=self.copy_workers(), thread_name_prefix="packer") as pool:
+            found = list(pool.map(copy_package, ordered))
+        missing = [record['fn'] for record, ok in zip(ordered, found) if not ok]
+        if missing:
+            print(f"警告: conda包缓存中缺少 {len(missing)} 个包（可能已被conda clean清理），"
+                  f"还原时conda环境需要联网: {', '.join(missing[:5])}{' ...' if len(missing) > 5 else ''}")
+        packages = [{"name": record['name'], "path": f"{VENDOR_DIR}/conda/{record['fn']}", "md5": record['md5']}
+                    for record, ok in zip(ordered, found) if ok]
+        return packages, not missing
+
+    def build_wheels(self, prefix, wheel_dir):
+        """用环境中的pip为requirements.txt及其依赖生成wheel，只有源码包的依赖也会先构建成wheel"""
+        requirements = os.path.join(self.project_dir, 'requirements.txt')
+        if not os.path.exists(requirements):
+            return True
+        os.makedirs(wheel_dir, exist_ok=True)
+        python = sys.executable
+        if prefix:
+            env_python = os.path.join(prefix, 'python.exe') if sys.platform.startswith('win') \
+                else os.path.join(prefix, 'bin', 'python')
+            if os.path.exists(env_python):
+                python = env_python
+
+        env = dict(os.environ)
+        pip_conf = os.path.join(self.project_dir, 'pip.conf')
+        if os.path.exists(pip_conf):
+            env.setdefault('PIP_CONFIG_FILE', pip_conf)
+        command = [python, '-m', 'pip', 'wheel', '--disable-pip-version-check', '-q',
+                   '-r', requirements, '-w', wheel_dir]
+        result = subprocess.run(command, capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            print(f"警告: 生成wheel失败，还原时pip依赖需要联网: {error[-1] if error else result.returncode}")
+            return False
+        return True
+
+    def vendor_dependencies(self, vendor_dir):
+        """把pip依赖的wheel和环境中的conda包放入备份，并写入带哈希的依赖清单，返回是否完全可以离线还原
+
+        生成wheel和复制conda包同时进行。清单中的路径相对于备份根目录。
+        """
+        conda_info, error = self.get_conda_info()
+        prefix = conda_info['env_prefix'] if conda_info else None
+        os.makedirs(vendor_dir, exist_ok=True)
+
+        def timed(func, *args):
+            start = time.perf_counter()
+            return func(*args), time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="vendor") as pool:
+            wheels_future = pool.submit(timed, self.build_wheels, prefix, os.path.join(vendor_dir, 'wheels'))
+            conda_future = pool.submit(timed, self.vendor_conda_packages, prefix, vendor_dir) if prefix else None
+            wheels_complete, wheels_seconds = wheels_future.result()
+            if conda_future:
+                (packages, conda_complete), conda_seconds = conda_future.result()
+            else:
+                print(error)
+                packages, conda_complete, conda_seconds = [], False, 0.0
+
+        start = time.perf_counter()
+        paths = []
+        for root, _, files in os.walk(vendor_dir):
+            paths += [os.path.join(root, name) for name in files]
+        with ThreadPoolExecutor(max_workers=self.copy_workers(), thread_name_prefix="packer") as pool:
+            digests = list(pool.map(self.hash_file, paths))
+        files = {}
+        total_bytes = 0
+        for path, digest in zip(paths, digests):
+            size = os.path.getsize(path)
+            total_bytes += size
+            rel_path = os.path.relpath(path, os.path.dirname(vendor_dir)).replace(os.sep, '/')
+            files[rel_path] = {"hash": digest, "size": size}
+        hash_seconds = time.perf_counter() - start
+
+        with open(os.path.join(vendor_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                "algorithm": "sha256",
+                "env_name": conda_info['env_name'] if conda_info else None,
+                "platform": sys.platform,
+                "conda_complete": conda_complete,
+                "wheels_complete": wheels_complete,
+                "conda_packages": packages,
+                "files": dict(sorted(files.items())),
+            }, f, ensure_ascii=False, indent=2)
+
+        print(f"已放入依赖包 {len(files)} 个 ({total_bytes / 1024 / 1024:.1f}MB)：生成wheel {wheels_seconds:.1f}秒，"
+              f"复制conda包 {conda_seconds:.1f}秒，计算哈希 {hash_seconds:.1f}秒")
+        return conda_complete and wheels_complete
+
+    def setup_scripts(self):
+        """环境设置脚本：文件名 -> (内容, 是否需要可执行权限)"""
+        if self.vendor:
+            # 由还原工具校验文件并从备份中的依赖包离线创建环境
+            win_script = '''@echo off
+echo 正在从备份中的依赖包还原环境...
+python "%~dp0restore.py" %*
+pause
+'''
+            unix_script = '''#!/bin/bash
+echo "正在从备份中的依赖包还原环境..."
+python "$(dirname "$0")/restore.py" "$@"
+'''
+            return {'setup.bat': (win_script, False), 'setup.sh': (unix_script, True)}
 
-    def create_setup_scripts(self, output_dir):
-        """创建环境设置脚本"""
         # Windows setup script
         win_script = '''@echo off
 echo 正在创建conda环境...
@@ -187,22 +889,41 @@ echo "正在安装项目依赖..."
 pip install -r requirements.txt
 echo "环境设置完成！"
 '''
-        # 创建Windows脚本
-        with open(os.path.join(output_dir, 'setup.bat'), 'w', encoding='utf-8') as f:
-            f.write(win_script)
-
-        # 创建Unix脚本
-        unix_script_path = os.path.join(output_dir, 'setup.sh')
-        with open(unix_script_path, 'w', encoding='utf-8') as f:
-            f.write(unix_script)
-        
-        # 设置Unix脚本权限
-        if not sys.platform.startswith('win'):
-            os.chmod(unix_script_path, 0o755)
+        return {'setup.bat': (win_script, False), 'setup.sh': (unix_script, True)}
 
-    def create_readme(self, output_dir, copied_files):
-        """创建项目说明文件"""
-        readme_content = f'''# {self.config["project_name"]} - 项目备份
+    def create_setup_scripts(self, output_dir):
+        """创建环境设置脚本"""
+        for name, (content, executable) in self.setup_scripts().items():
+            script_path = os.path.join(output_dir, name)
+            with open(script_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            # 设置Unix脚本权限
+            if executable and not sys.platform.startswith('win'):
+                os.chmod(script_path, 0o755)
+
+    @property
+    def writes_manifest(self):
+        """备份中是否有记录项目文件哈希的 manifest.json：增量备份和压缩包格式才有，普通目录格式直接复制文件"""
+        return self.incremental or self.archive_format != 'dir'
+
+    def readme_content(self, copied_files):
+        """项目说明文件的内容，校验说明只在备份中有清单时给出"""
+        verify_note = '，--verify-only 只校验文件' if self.writes_manifest else ''
+        if self.vendor:
+            vendor_note = f'''
+## 离线还原
+- 备份的 vendor 目录中包含conda包和pip的wheel，setup脚本会调用 restore.py 校验文件并离线创建环境
+- 也可以直接运行 python restore.py --name 环境名{verify_note}
+- 依赖包与打包时的平台相同，只能在相同的操作系统和架构上离线还原
+'''
+        elif self.writes_manifest:
+            vendor_note = '''
+## 校验
+- 运行 python restore.py --verify-only 按清单校验文件是否完整
+'''
+        else:
+            vendor_note = ''
+        return f'''# {self.config["project_name"]} - 项目备份
 
 ## 备份信息
 - 备份时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -220,40 +941,87 @@ echo "环境设置完成！"
 ## 注意事项
 - 如果完整环境安装失败，脚本会尝试使用精简配置
 - 建议查看 environment.yml 了解详细的依赖要求
-'''
+{vendor_note}'''
+
+    def create_readme(self, output_dir, copied_files):
+        """创建项目说明文件"""
         with open(os.path.join(output_dir, 'BACKUP_README.md'), 'w', encoding='utf-8') as f:
-            f.write(readme_content)
+            f.write(self.readme_content(copied_files))
 
-    def pack(self):
-        """执行打包操作"""
-        # 创建输出目录
-        output_base = os.path.join(self.project_dir, self.config["backup_dir"])
-        output_dir = os.path.join(output_base, f'{self.config["project_name"]}_{self.timestamp}')
-        os.makedirs(output_dir, exist_ok=True)
+    def archive_project_files(self, writer, root_name, manifest):
+        """把项目文件流式写入压缩包，返回打包的项目文件列表
+
+        每个文件只读取一次，写入压缩流的同时计算哈希并记入manifest。
+        """
+        copied_files = []
+        for src_path, rel_path, st in self.iter_project_files():
+            try:
+                f = open(src_path, 'rb')
+            except OSError as e:
+                print(f"打包文件失败 {rel_path}: {e}")
+                continue
+            name = rel_path.replace(os.sep, '/')
+            with f:
+                digest = writer.add_file(f, f'{root_name}/{name}', st)
+            manifest[name] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            copied_files.append(rel_path)
+        return copied_files
 
-        print(f"开始打包项目到: {output_dir}")
+    def finish_archive(self, writer, root_name, manifest, copied_files, env_dir, vendor_dir=None):
+        """写入环境配置、依赖包、还原脚本和说明文件，清单作为最后一个成员写入"""
+        def add_bytes(name, data, mode=0o644):
+            digest = writer.add_bytes(f'{root_name}/{name}', data, mode)
+            manifest[name] = {"hash": digest, "size": len(data)}
 
-        # 导出conda环境
-        if self.export_conda_env(output_dir):
-            # 复制项目文件
-            copied_files = self.copy_project_files(output_dir)
-            print(f"已复制 {len(copied_files)} 个文件")
+        for name in sorted(os.listdir(env_dir)):
+            if os.path.isdir(os.path.join(env_dir, name)):
+                continue
+            with open(os.path.join(env_dir, name), 'rb') as f:
+                add_bytes(name, f.read())
+        if vendor_dir:
+            for root, _, files in os.walk(vendor_dir):
+                for file_name in sorted(files):
+                    path = os.path.join(root, file_name)
+                    name = os.path.relpath(path, os.path.dirname(vendor_dir)).replace(os.sep, '/')
+                    st = os.stat(path)
+                    with open(path, 'rb') as f:
+                        digest = writer.add_file(f, f'{root_name}/{name}', st)
+                    manifest[name] = {"hash": digest, "size": st.st_size}
+        if os.path.exists(RESTORE_SCRIPT):
+            with open(RESTORE_SCRIPT, 'rb') as f:
+                add_bytes('restore.py', f.read())
+        for name, (content, executable) in self.setup_scripts().items():
+            if name.endswith('.bat'):
+                content = content.replace('\n', '\r\n')
+            add_bytes(name, content.encode('utf-8'), 0o755 if executable else 0o644)
+        add_bytes('BACKUP_README.md', self.readme_content(copied_files).encode('utf-8'))
 
-            # 创建设置脚本
-            self.create_setup_scripts(output_dir)
-            print("已创建环境设置脚本")
+        writer.add_bytes(f'{root_name}/manifest.json', json.dumps(
+            {"algorithm": "sha256", "files": manifest}, ensure_ascii=False, indent=2).encode('utf-8'))
 
-            # 创建说明文件
-            self.create_readme(output_dir, copied_files)
-            print("已创建项目说明文件")
+    def install_restore_script(self, output_dir):
+        """把还原工具复制到备份中"""
+        if os.path.exists(RESTORE_SCRIPT):
+            shutil.copy2(RESTORE_SCRIPT, os.path.join(output_dir, 'restore.py'))
 
-            print(f"\n项目打包完成！")
-            print(f"打包文件位置: {output_dir}")
-            return True
-        return False
+    def pack(self, engine=None):
+        """执行打包操作，由packer_engine按阶段完成，可传入替换或增加了阶段的引擎"""
+        from packer_engine import pack_with_engine
+        return pack_with_engine(self, engine)
 
 def main():
-    packer = ProjectPacker()
+    parser = argparse.ArgumentParser(description="打包项目文件和conda环境")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="增量备份：未变化的文件不再复制，只在对象库中保存一份")
+    parser.add_argument("--format", choices=ARCHIVE_FORMATS, default=None,
+                        help="打包格式：dir为目录，其余格式把文件直接流式写入压缩包")
+    parser.add_argument("--vendor", action="store_true", default=None,
+                        help="把pip的wheel和conda包放入备份，还原时无需联网")
+    args = parser.parse_args()
+    if args.incremental and args.format not in (None, "dir"):
+        parser.error("--incremental 只能用于目录格式")
+
+    packer = ProjectPacker(incremental=args.incremental, archive_format=args.format, vendor=args.vendor)
     packer.pack()
 
 if __name__ == '__main__':
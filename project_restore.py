@@ -0,0 +1,249 @@
+"""还原 project_packer.py 生成的项目备份
+
+打包时会把本文件复制到备份目录中，命名为 restore.py。在备份目录中运行：
+
+    python restore.py                 # 校验文件并创建环境，备份中带有依赖包时完全离线
+    python restore.py --name myenv    # 指定环境名
+    python restore.py --verify-only   # 只校验文件，没有清单（普通目录格式的备份）时以非零状态退出
+
+依次执行：按清单并行校验文件哈希，恢复增量备份中文件的原权限，用备份中的conda包离线创建环境，用备份中的wheel离线安装pip依赖，
+最后输出各阶段耗时。备份中没有依赖包（打包时未使用 --vendor）时改为在线创建环境。
+"""
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+# 计算文件哈希每次读取的字节数
+HASH_CHUNK_BYTES = 1 << 20
+VENDOR_DIR = 'vendor'
+VENDOR_MANIFEST = 'vendor/manifest.json'
+
+
+class PhaseTimer:
+    """记录各阶段耗时，结束时统一输出"""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        print(f"\n== {name} ==")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        print("\n各阶段耗时:")
+        for name, seconds in self.phases:
+            print(f"  {name:<12}{seconds:>8.1f}秒")
+        print(f"  {'合计':<12}{sum(seconds for _, seconds in self.phases):>8.1f}秒")
+
+
+def hash_file(path, algorithm='sha256'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_files(backup_dir, workers):
+    """按备份中的清单并行校验文件，返回 (校验的文件数, 出错的文件列表)"""
+    expected = {}
+    for manifest_name in ('manifest.json', VENDOR_MANIFEST):
+        manifest_path = os.path.join(backup_dir, manifest_name)
+        if os.path.exists(manifest_path):
+            manifest = load_json(manifest_path)
+            algorithm = manifest.get("algorithm", "sha256")
+            for name, info in manifest["files"].items():
+                expected[name] = (algorithm, info["hash"])
+
+    def check(item):
+        name, (algorithm, digest) = item
+        path = os.path.join(backup_dir, *name.split('/'))
+        try:
+            actual = hash_file(path, algorithm)
+        except OSError as e:
+            return f"{name}: 无法读取 ({e})"
+        if actual != digest:
+            return f"{name}: 哈希不一致"
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        problems = [problem for problem in pool.map(check, sorted(expected.items())) if problem]
+    return len(expected), problems
+
+
+def restore_modes(backup_dir):
+    """恢复增量备份中文件的原权限，返回恢复的文件数
+
+    增量备份中的文件是指向对象库的只读硬链接，先复制为独立的文件再修改权限，不影响对象库和其他备份。
+    """
+    manifest_path = os.path.join(backup_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return 0
+    restored = 0
+    for name, info in load_json(manifest_path)["files"].items():
+        if "mode" not in info:
+            continue
+        path = os.path.join(backup_dir, *name.split('/'))
+        st = os.stat(path)
+        if stat.S_IMODE(st.st_mode) == info["mode"] and st.st_nlink == 1:
+            continue
+        temp_path = path + '.restore.tmp'
+        shutil.copy2(path, temp_path)
+        os.chmod(temp_path, info["mode"])
+        os.replace(temp_path, path)
+        restored += 1
+    return restored
+
+
+def find_conda():
+    """conda可执行文件，找不到时返回None"""
+    conda = os.environ.get('CONDA_EXE') or shutil.which('conda')
+    if not conda and sys.platform.startswith('win'):
+        conda = shutil.which('conda.bat')
+    return conda
+
+
+def run(command, **kwargs):
+    """运行命令并实时输出，失败时抛出 subprocess.CalledProcessError"""
+    print("> " + " ".join(str(part) for part in command))
+    subprocess.run(command, check=True, shell=sys.platform.startswith('win'), **kwargs)
+
+
+def read_env_name(env_file):
+    """environment.yml 中的环境名"""
+    with open(env_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('name:'):
+                return line.split(':', 1)[1].strip()
+    return None
+
+
+def write_explicit_file(backup_dir, vendor, path):
+    """生成conda显式安装列表，包地址指向备份中的本地文件"""
+    lines = ['@EXPLICIT']
+    for package in vendor["conda_packages"]:
+        local_path = Path(backup_dir, *package["path"].split('/')).resolve()
+        lines.append(f'{local_path.as_uri()}#{package["md5"]}')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def create_conda_env(conda, backup_dir, env_name, vendor):
+    """创建conda环境：备份中有全部conda包时离线安装，否则按环境文件在线安装"""
+    if vendor and vendor.get("conda_complete"):
+        with tempfile.TemporaryDirectory(prefix='restore_') as temp_dir:
+            explicit_file = os.path.join(temp_dir, 'explicit.txt')
+            write_explicit_file(backup_dir, vendor, explicit_file)
+            # 包已在本地，conda自行并行解压和链接，不访问任何频道
+            run([conda, 'create', '-y', '-n', env_name, '--offline', '--file', explicit_file])
+        return
+
+    if vendor:
+        print("备份中缺少部分conda包，改为按环境文件在线创建环境")
+    try:
+        run([conda, 'env', 'create', '-n', env_name, '-f', os.path.join(backup_dir, 'environment.yml')])
+    except subprocess.CalledProcessError:
+        print("尝试使用精简配置创建环境...")
+        run([conda, 'env', 'create', '-n', env_name, '-f', os.path.join(backup_dir, 'environment.min.yml')])
+
+
+def install_pip_packages(conda, backup_dir, env_name, vendor):
+    """在新环境中安装requirements.txt，备份中有wheel时只从本地安装"""
+    requirements = os.path.join(backup_dir, 'requirements.txt')
+    if not os.path.exists(requirements):
+        print("备份中没有requirements.txt，跳过")
+        return
+    command = [conda, 'run', '--no-capture-output', '-n', env_name, 'python', '-m', 'pip', 'install',
+               '--disable-pip-version-check', '-r', requirements]
+    if vendor and vendor.get("wheels_complete"):
+        command += ['--no-index', '--find-links', os.path.join(backup_dir, VENDOR_DIR, 'wheels')]
+    elif vendor:
+        print("备份中缺少部分wheel，将从网络下载缺少的包")
+        command += ['--find-links', os.path.join(backup_dir, VENDOR_DIR, 'wheels')]
+    run(command)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="还原项目备份：校验文件并创建conda环境")
+    parser.add_argument("backup_dir", nargs="?", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="备份目录，默认为本文件所在目录")
+    parser.add_argument("--name", help="环境名，默认使用environment.yml中的名称")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="校验文件的线程数")
+    parser.add_argument("--skip-verify", action="store_true", help="不校验文件哈希")
+    parser.add_argument("--verify-only", action="store_true", help="只校验文件，不创建环境；备份中没有清单时失败")
+    args = parser.parse_args()
+
+    backup_dir = os.path.abspath(args.backup_dir)
+    # 普通目录格式的备份直接复制文件，不计算哈希，没有项目文件的清单
+    has_manifest = os.path.exists(os.path.join(backup_dir, 'manifest.json'))
+    vendor_manifest = os.path.join(backup_dir, VENDOR_MANIFEST)
+    vendor = load_json(vendor_manifest) if os.path.exists(vendor_manifest) else None
+    timer = PhaseTimer()
+
+    try:
+        if not args.skip_verify:
+            with timer.phase("校验文件"):
+                count, problems = verify_files(backup_dir, args.workers)
+                for problem in problems:
+                    print(f"  {problem}")
+                if problems:
+                    print(f"{len(problems)}/{count} 个文件校验失败，备份可能已损坏")
+                    return 1
+                if count:
+                    print(f"{count} 个文件校验通过")
+                if not has_manifest:
+                    print("警告: 备份中没有 manifest.json，项目文件未经校验"
+                          "（只有增量备份和压缩包格式记录文件哈希，普通目录格式的备份无法校验）")
+        if args.verify_only:
+            return 0 if has_manifest else 1
+        with timer.phase("恢复文件权限"):
+            print(f"{restore_modes(backup_dir)} 个文件已恢复原权限")
+
+        conda = find_conda()
+        if not conda:
+            print("找不到conda，请先安装Anaconda或Miniconda")
+            return 1
+        env_name = args.name or (vendor or {}).get("env_name") or read_env_name(
+            os.path.join(backup_dir, 'environment.yml'))
+        if not env_name:
+            print("无法确定环境名，请使用 --name 指定")
+            return 1
+
+        with timer.phase("创建conda环境"):
+            create_conda_env(conda, backup_dir, env_name, vendor)
+        with timer.phase("安装pip依赖"):
+            install_pip_packages(conda, backup_dir, env_name, vendor)
+        print(f"\n环境 {env_name} 已创建，使用 conda activate {env_name} 激活")
+        return 0
+    except subprocess.CalledProcessError as e:
+        print(f"命令执行失败 (退出码 {e.returncode})")
+        return 1
+    finally:
+        timer.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
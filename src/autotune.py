@@ -0,0 +1,127 @@
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+
+import sys
+import time
+import argparse
+import unicodedata
+
+from core.audio import decode_audio
+from core.backends import BACKENDS, create_backend
+from core.pipeline import BASE_DECODE_OPTIONS, VIDEO_EXTENSIONS
+from core.presets import PRESETS, PRESET_NAMES, PRESETS_FILE, preset_decode_options, save_tuned
+
+# 参考集中除视频外支持的音频格式
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a', '.ogg')
+
+
+def normalize_text(text):
+    """计算字错误率前去掉空白和标点，统一大小写"""
+    return "".join(char for char in unicodedata.normalize("NFKC", text).lower()
+                   if not unicodedata.category(char).startswith(("P", "Z", "C", "S")))
+
+
+def edit_distance(hypothesis, reference):
+    """字符级编辑距离"""
+    if len(hypothesis) < len(reference):
+        hypothesis, reference = reference, hypothesis
+    previous = list(range(len(reference) + 1))
+    for i, char in enumerate(hypothesis, 1):
+        current = [i]
+        for j, ref_char in enumerate(reference, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != ref_char)))
+        previous = current
+    return previous[-1]
+
+
+def load_reference_set(directory):
+    """参考集：音视频文件与同名的 .txt 参考文本放在同一目录，返回 [(名称, 音频, 时长, 参考文本)]"""
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        if not name.lower().endswith(VIDEO_EXTENSIONS + AUDIO_EXTENSIONS) or not os.path.exists(transcript_path):
+            continue
+        with open(transcript_path, encoding='utf-8') as f:
+            reference = normalize_text(f.read())
+        audio, stats = decode_audio(path)
+        clips.append((name, audio, stats["duration"], reference))
+    return clips
+
+
+def measure(model, clips, preset):
+    """用一个预设识别整个参考集，返回字错误率和实时率（识别耗时/音频时长）"""
+    options = preset_decode_options(preset, BASE_DECODE_OPTIONS)
+    errors = characters = 0
+    transcribe_seconds = audio_seconds = 0.0
+    for name, audio, duration, reference in clips:
+        start = time.perf_counter()
+        result = model.transcribe(audio, verbose=None, **options)
+        transcribe_seconds += time.perf_counter() - start
+        audio_seconds += duration
+        errors += edit_distance(normalize_text(result["text"]), reference)
+        characters += len(reference)
+    return {
+        "preset": preset,
+        "cer": errors / characters if characters else 0.0,
+        "rtf": transcribe_seconds / audio_seconds if audio_seconds else 0.0,
+        "transcribe_seconds": transcribe_seconds,
+    }
+
+
+def choose_preset(runs, tolerance, max_rtf=None):
+    """在字错误率不超过最低值+tolerance的预设中选实时率最低的；设置max_rtf时先排除更慢的预设"""
+    candidates = [run for run in runs if max_rtf is None or run["rtf"] <= max_rtf] or runs
+    best_cer = min(run["cer"] for run in candidates)
+    acceptable = [run for run in candidates if run["cer"] <= best_cer + tolerance]
+    return min(acceptable, key=lambda run: run["rtf"])["preset"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在本机参考集上测量各识别参数预设的字错误率和实时率，为每个模型选择默认预设")
+    parser.add_argument("reference", help="参考集目录：音视频文件和同名的 .txt 参考文本")
+    parser.add_argument("--models", nargs="+", default=["base", "small", "medium", "large"],
+                        choices=["base", "small", "medium", "large"], help="要调优的模型")
+    parser.add_argument("--presets", nargs="+", default=list(PRESET_NAMES), choices=PRESET_NAMES,
+                        help="参与比较的预设")
+    parser.add_argument("--backend", default="whisper", choices=sorted(BACKENDS), help="推理后端")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="允许比最准确的预设高出的字错误率（默认0.01，即1个百分点）")
+    parser.add_argument("--max-rtf", type=float, help="实时率上限，超过的预设不作为默认预设（均超过时忽略此限制）")
+    parser.add_argument("--dry-run", action="store_true", help="只打印结果，不写入调优结果文件")
+    args = parser.parse_args(argv)
+
+    clips = load_reference_set(args.reference)
+    if not clips:
+        print(f"参考集 {args.reference} 中没有带同名 .txt 参考文本的音视频文件")
+        return 1
+    audio_seconds = sum(duration for _, _, duration, _ in clips)
+    print(f"参考集: {len(clips)} 个文件，音频共 {audio_seconds:.0f}秒")
+
+    defaults = {}
+    measurements = []
+    for model_size in args.models:
+        backend = create_backend(args.backend, model_size)
+        load_start = time.perf_counter()
+        model = backend.load()
+        print(f"\n{model_size} ({args.backend}) 加载耗时 {time.perf_counter() - load_start:.1f}秒")
+        runs = []
+        for preset in args.presets:
+            run = measure(model, clips, preset)
+            run["model"] = model_size
+            runs.append(run)
+            print(f"  {preset:<10} 字错误率 {run['cer'] * 100:6.2f}%  实时率 {run['rtf']:.3f}")
+        defaults[model_size] = choose_preset(runs, args.tolerance, args.max_rtf)
+        print(f"  默认预设: {defaults[model_size]} ({PRESETS[defaults[model_size]]['label']})")
+        measurements.extend(runs)
+
+    if args.dry_run:
+        return 0
+    save_tuned(defaults, measurements, PRESETS_FILE)
+    print(f"\n已写入 {PRESETS_FILE}（可通过环境变量 VIDEOTOTXT_PRESETS_FILE 调整），"
+          f"之后未指定预设的任务按模型使用这些默认预设，运行中的常驻服务也会读取新的结果")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+
+import sys
+import glob
+import queue
+import argparse
+import threading
+import time
+
+from core.backends import BACKENDS
+from core.job_queue import JobQueue, PENDING, DONE, FAILED
+from core.pipeline import SubtitlePipeline, VIDEO_EXTENSIONS
+from core.presets import PRESET_NAMES
+from core.subtitles import FORMATS, write_file
+from core.telemetry import JsonLinesSink, Tracer, default_sinks
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'videototxt', 'batch_queue.json')
+
+
+def collect_videos(inputs):
+    """展开目录和通配符，返回去重后的视频文件列表"""
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                for file in sorted(files):
+                    if file.lower().endswith(VIDEO_EXTENSIONS):
+                        videos.append(os.path.join(root, file))
+        elif glob.has_magic(item):
+            videos.extend(path for path in sorted(glob.glob(item, recursive=True))
+                          if path.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(item):
+            videos.append(item)
+        else:
+            print(f"警告: 未找到 {item}")
+
+    seen = set()
+    unique = []
+    for video in videos:
+        video = os.path.abspath(video)
+        if video not in seen:
+            seen.add(video)
+            unique.append(video)
+    return unique
+
+
+def subtitle_path_for(video_path, fmt="srt"):
+    """字幕文件与视频同目录同名"""
+    return os.path.splitext(video_path)[0] + "." + fmt
+
+
+def write_subtitles_atomic(path, segments):
+    """先写入临时文件再替换，避免中断时留下不完整的字幕"""
+    temp_path = path + ".tmp"
+    write_file(temp_path, segments, fmt=path.rsplit('.', 1)[-1])
+    os.replace(temp_path, path)
+
+
+def finish_job(job_queue, pipeline, job, extracted, result, start_time):
+    """写入字幕并把任务标记为完成"""
+    name = os.path.basename(job["video_path"])
+    with pipeline.tracer.span("format", video=name, segments=len(result["segments"])):
+        write_subtitles_atomic(job["output_path"], result["segments"])
+    pipeline.remove_partial(job["video_path"])
+    job_queue.mark_done(job)
+    print(f"[完成] {name} -> {job['output_path']} "
+          f"(音频 {extracted.duration:.0f}秒, 识别耗时 {time.perf_counter() - start_time:.1f}秒)")
+
+
+def next_group(extracted_queue, batch_size):
+    """从提取队列中取出最多batch_size个文件，队列结束时返回的列表末尾为None"""
+    group = []
+    while len(group) < batch_size:
+        item = extracted_queue.get()
+        group.append(item)
+        if item is None:
+            break
+    return group
+
+
+def run_queue(job_queue, pipeline, batch_size=1):
+    """处理队列中的所有待处理任务
+
+    音频提取在后台线程中进行，与当前文件的识别重叠执行：
+    模型识别当前文件时，ffmpeg已经在解码下一个文件。
+    batch_size大于1时每次取出多个已提取的文件，把它们的窗口合并为批次一起识别。
+    """
+    extracted_queue = queue.Queue(maxsize=batch_size)
+
+    def extract_stage():
+        while True:
+            job = job_queue.next_pending()
+            if job is None:
+                break
+            try:
+                extracted_queue.put((job, pipeline.extract(job["video_path"]), None))
+            except Exception as e:
+                extracted_queue.put((job, None, e))
+        extracted_queue.put(None)
+
+    extractor = threading.Thread(target=extract_stage, name="extract-stage", daemon=True)
+    extractor.start()
+
+    if batch_size > 1:
+        run_batched(job_queue, pipeline, extracted_queue, batch_size)
+        extractor.join()
+        return
+
+    while True:
+        item = extracted_queue.get()
+        if item is None:
+            break
+        job, extracted, error = item
+        name = os.path.basename(job["video_path"])
+        if error is not None:
+            print(f"[失败] {name}: {error}")
+            job_queue.mark_failed(job, error)
+            continue
+        try:
+            start_time = time.perf_counter()
+            result = pipeline.transcribe(extracted)
+            finish_job(job_queue, pipeline, job, extracted, result, start_time)
+        except Exception as e:
+            print(f"[失败] {name}: {e}")
+            job_queue.mark_failed(job, e)
+    extractor.join()
+
+
+def run_batched(job_queue, pipeline, extracted_queue, batch_size):
+    """每次取出最多batch_size个已提取的文件批量识别，结果按文件分别写入字幕"""
+    while True:
+        group = next_group(extracted_queue, batch_size)
+        ended = group[-1] is None
+        jobs = []
+        for job, extracted, error in (item for item in group if item is not None):
+            if error is not None:
+                print(f"[失败] {os.path.basename(job['video_path'])}: {error}")
+                job_queue.mark_failed(job, error)
+            else:
+                jobs.append((job, extracted))
+        if jobs:
+            start_time = time.perf_counter()
+            try:
+                results = pipeline.transcribe_batch([extracted for _, extracted in jobs], batch_size)
+            except Exception as e:
+                results = [e] * len(jobs)
+            for (job, extracted), result in zip(jobs, results):
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    finish_job(job_queue, pipeline, job, extracted, result, start_time)
+                except Exception as e:
+                    print(f"[失败] {os.path.basename(job['video_path'])}: {e}")
+                    job_queue.mark_failed(job, e)
+        if ended:
+            break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量提取视频字幕（无界面）")
+    parser.add_argument("inputs", nargs="*", help="视频文件、目录或通配符，如 videos/ 或 \"videos/**/*.mp4\"")
+    parser.add_argument("--model", default="medium", choices=["base", "small", "medium", "large"],
+                        help="Whisper模型大小")
+    parser.add_argument("--format", default="srt", choices=FORMATS, help="字幕格式")
+    parser.add_argument("--vad", action="store_true", help="跳过静音和音乐片段")
+    parser.add_argument("--backend", default="whisper", choices=sorted(BACKENDS), help="推理后端")
+    parser.add_argument("--preset", choices=PRESET_NAMES,
+                        help="识别参数预设：fast/balanced/accurate（默认使用该模型的默认预设，见 autotune.py）")
+    parser.add_argument("--threads", type=int, help="算子内线程数")
+    parser.add_argument("--interop-threads", type=int, help="算子间线程数")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="任务队列文件路径")
+    parser.add_argument("--overwrite", action="store_true", help="已存在字幕文件时重新生成")
+    parser.add_argument("--retry-failed", action="store_true", help="重新执行之前失败的任务")
+    parser.add_argument("--stream-decode", action="store_true",
+                        help="边解码边识别，内存占用与音频时长无关（默认仅对超长录音启用，启用--vad或--draft-model时无效）")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="不记录检查点（默认逐窗口识别时记录，中断后重新运行会从最后完成的窗口继续）")
+    parser.add_argument("--draft-model", choices=["base", "small", "medium"],
+                        help="级联识别：先用该模型识别全部音频，低置信度的区间再由 --model 重新识别，输出重新识别的比例和估计加速比")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="批量识别：每次把多个文件的音频窗口合并为一个批次送入模型（默认1，逐个文件识别）；"
+                             "批量识别不做温度回退也不以上文为提示词，结果可能与逐个识别不同，两者分开缓存")
+    parser.add_argument("--trace", help="把各阶段耗时、计数器和内存采样（每个阶段结束、逐窗口识别的每个窗口、"
+                                        "批处理开始和结束时）以JSON Lines格式追加写入该文件")
+    args = parser.parse_args(argv)
+
+    job_queue = JobQueue(args.queue)
+    if args.retry_failed:
+        job_queue.retry_failed()
+
+    added = 0
+    for video in collect_videos(args.inputs):
+        output_path = subtitle_path_for(video, args.format)
+        if os.path.exists(output_path) and not args.overwrite:
+            continue
+        added += job_queue.add(video, output_path, overwrite=args.overwrite)
+
+    counts = job_queue.counts()
+    print(f"任务队列: {args.queue}")
+    print(f"新增或重新加入 {added} 个任务，待处理 {counts[PENDING]} 个，已完成 {counts[DONE]} 个，失败 {counts[FAILED]} 个")
+
+    sinks = default_sinks()
+    if args.trace:
+        sinks.append(JsonLinesSink(args.trace))
+    tracer = Tracer(sinks)
+    pipeline = SubtitlePipeline(args.model, use_vad=args.vad, on_progress=print,
+                                backend=args.backend, intra_op_threads=args.threads,
+                                inter_op_threads=args.interop_threads, tracer=tracer,
+                                stream_decode=True if args.stream_decode else None,
+                                checkpoint=False if args.no_checkpoint else None,
+                                draft_model=args.draft_model, preset=args.preset)
+    tracer.sample_memory("start")
+    start_time = time.perf_counter()
+    run_queue(job_queue, pipeline, max(1, args.batch_size))
+    elapsed = time.perf_counter() - start_time
+    tracer.sample_memory("end")
+
+    counts = job_queue.counts()
+    print(f"\n批处理结束: 已完成 {counts[DONE]} 个，失败 {counts[FAILED]} 个")
+    if tracer.stage_seconds:
+        print(f"各阶段耗时: {tracer.format_summary()}")
+    audio_seconds = tracer.counters.get("audio_seconds", 0)
+    if audio_seconds and elapsed > 0:
+        print(f"总吞吐量: 音频 {audio_seconds:.0f}秒 / 耗时 {elapsed:.1f}秒 = {audio_seconds / elapsed:.1f} 音频秒/秒")
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import argparse
+
+from core.daemon import DEFAULT_HOST, DEFAULT_PORT
+from core.presets import PRESET_NAMES
+from core.remote import DAEMON_ENV, DaemonError, RemoteScheduler
+from core.scheduler import DONE, STATUS_LABELS, TRANSCRIBING
+from core.subtitles import FORMATS, format_srt_block
+
+
+def print_metrics(scheduler):
+    metrics = scheduler.metrics()
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把视频交给常驻识别服务，实时打印识别出的字幕并写入字幕文件")
+    parser.add_argument("videos", nargs="*", help="视频文件")
+    parser.add_argument("--server", default=os.environ.get(DAEMON_ENV, f"{DEFAULT_HOST}:{DEFAULT_PORT}"),
+                        help=f"识别服务地址（默认读取环境变量 {DAEMON_ENV}）")
+    parser.add_argument("--model", default="medium", choices=["base", "small", "medium", "large"],
+                        help="Whisper模型大小")
+    parser.add_argument("--format", default="srt", choices=FORMATS, help="字幕格式")
+    parser.add_argument("--vad", action="store_true", help="跳过静音和音乐片段")
+    parser.add_argument("--draft-model", choices=["base", "small", "medium"],
+                        help="级联识别：先用该模型识别全部音频，低置信度的区间再由 --model 重新识别")
+    parser.add_argument("--backend", default="whisper", help="推理后端")
+    parser.add_argument("--preset", choices=PRESET_NAMES,
+                        help="识别参数预设（默认使用服务端该模型的默认预设）")
+    parser.add_argument("--quiet", action="store_true", help="不打印识别出的字幕")
+    parser.add_argument("--metrics", action="store_true", help="打印服务的队列深度、延迟和模型缓存统计")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        try:
+            print_metrics(RemoteScheduler(args.server))
+        except DaemonError as e:
+            print(e)
+            return 1
+        if not args.videos:
+            return 0
+    if not args.videos:
+        parser.error("请指定视频文件")
+
+    single = len(args.videos) == 1
+
+    def on_event(job, event, payload):
+        prefix = "" if single else f"[{job.name}] "
+        if event == "status":
+            if payload == TRANSCRIBING:
+                print(f"{prefix}开始识别，排队 {job.started_at - job.submitted_at:.2f}秒")
+            else:
+                print(f"{prefix}{STATUS_LABELS[payload]}" + (f": {job.error}" if job.error else ""))
+        elif event == "progress":
+            print(f"{prefix}{payload}")
+        elif event == "segment" and not args.quiet:
+            index, segment = payload
+            print(prefix + format_srt_block(index, segment), end="")
+
+    scheduler = RemoteScheduler(args.server, on_event=on_event)
+    jobs = []
+    try:
+        for video in args.videos:
+            jobs.append(scheduler.submit(video, args.model, args.vad, args.backend, args.draft_model, args.preset))
+        for job in jobs:
+            job.finished.wait()
+    except DaemonError as e:
+        print(e)
+        return 1
+    except KeyboardInterrupt:
+        print("\n正在取消任务...")
+        scheduler.shutdown()
+        return 1
+
+    failed = 0
+    for job in jobs:
+        if job.status != DONE:
+            failed += 1
+            continue
+        output_path = os.path.splitext(job.video_path)[0] + "." + args.format
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(job.subtitles(args.format))
+        first_segment = (f"，首个片段 {job.first_segment_at - job.submitted_at:.2f}秒"
+                         if job.first_segment_at else "")
+        print(f"已写入 {output_path} ({len(job.segments)} 条字幕{first_segment}，"
+              f"总耗时 {job.finished_at - job.submitted_at:.1f}秒)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
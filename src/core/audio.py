@@ -0,0 +1,212 @@
+import os
+import re
+import shutil
+import subprocess
+import time
+
+import numpy as np
+
+# Whisper要求的采样率
+SAMPLE_RATE = 16000
+# 每次从ffmpeg管道读取的字节数
+READ_CHUNK_BYTES = 1 << 20
+# 解码后的PCM超过该大小（MB）时改为流式解码，可通过环境变量 VIDEOTOTXT_STREAM_DECODE_MB 调整
+STREAM_DECODE_MIN_MB = int(os.environ.get('VIDEOTOTXT_STREAM_DECODE_MB', '256'))
+
+
+def get_ffmpeg_exe():
+    """获取ffmpeg可执行文件路径，优先使用imageio-ffmpeg自带的版本"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def build_decode_command(path, sample_rate=SAMPLE_RATE):
+    """构造把音轨解码为单声道float32 PCM并输出到stdout的ffmpeg命令"""
+    return [
+        get_ffmpeg_exe(),
+        '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-threads', '0',
+        '-i', path,
+        '-vn', '-sn', '-dn',
+        '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ac', '1', '-ar', str(sample_rate),
+        '-',
+    ]
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """通过ffmpeg管道一次性把视频音轨解码为16kHz float32数组，不产生临时文件
+
+    返回 (pcm, stats)，stats中包含音频时长、解码耗时和缓冲区大小。
+    """
+    start_time = time.perf_counter()
+    process = subprocess.Popen(build_decode_command(path, sample_rate),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # 读入可写的bytearray，避免frombuffer得到只读数组再被复制一次
+    buffer = bytearray()
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            buffer += chunk
+        stderr = process.stderr.read()
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"音频解码失败: {stderr.decode('utf-8', errors='ignore').strip()}")
+
+    usable = len(buffer) - len(buffer) % 4
+    pcm = np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+    if pcm.size == 0:
+        raise RuntimeError("视频中没有可用的音轨")
+
+    stats = {
+        "duration": pcm.size / sample_rate,
+        "elapsed": time.perf_counter() - start_time,
+        "nbytes": pcm.nbytes,
+    }
+    return pcm, stats
+
+
+def probe_duration(path):
+    """从ffmpeg的输出中读取媒体时长（秒），无法获取时返回None"""
+    process = subprocess.run([get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', path],
+                             capture_output=True, text=True, encoding='utf-8', errors='ignore')
+    match = re.search(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)', process.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def should_stream_decode(duration, sample_rate=SAMPLE_RATE, min_mb=STREAM_DECODE_MIN_MB):
+    """一次性解码后的PCM是否超过流式解码的阈值"""
+    return duration is not None and duration * sample_rate * 4 > min_mb * 1024 * 1024
+
+
+class ArraySource:
+    """把已解码的PCM数组包装为与AudioStream相同的读取接口"""
+
+    def __init__(self, pcm):
+        self.pcm = pcm
+
+    def fill(self, end):
+        return min(end, len(self.pcm))
+
+    def view(self, start, end):
+        return self.pcm[start:end]
+
+    def release(self, sample):
+        pass
+
+    def at_end(self, end):
+        return end >= len(self.pcm)
+
+
+class AudioStream:
+    """通过ffmpeg管道按块读取PCM，只在固定大小的缓冲区中保留尚未识别的音频
+
+    缓冲区在创建时一次性分配，ffmpeg的输出直接读入其中；调用方识别完一段音频后调用release，
+    剩余的采样点移到缓冲区开头继续复用，峰值内存只取决于窗口长度，与音频总时长无关。
+    采样点位置都以音频开头为起点计算。
+    """
+
+    def __init__(self, path, window_seconds, sample_rate=SAMPLE_RATE, block_bytes=READ_CHUNK_BYTES):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.block_bytes = block_bytes
+        self.capacity = int(window_seconds * sample_rate) + block_bytes // 4 + 1
+        self.buffer = np.empty(self.capacity, dtype=np.float32)
+        self._raw = self.buffer.view(np.uint8)
+        self._bytes = memoryview(self._raw)
+        self.start = 0      # 缓冲区第一个采样点在音频中的位置
+        self._nbytes = 0    # 缓冲区中已读入的字节数
+        self._release_to = 0  # 此位置之前的音频已不再需要
+        self.finished = False
+        self.process = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        self.process = subprocess.Popen(build_decode_command(self.path, self.sample_rate),
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def close(self):
+        """停止ffmpeg进程，提前结束（如任务取消）时不再读取剩余的音频"""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.stderr.close()
+        self.process.wait()
+        self.process = None
+
+    @property
+    def end(self):
+        """已读入的最后一个采样点之后的位置"""
+        return self.start + self._nbytes // 4
+
+    def fill(self, end):
+        """读入音频直到位置end或音频结束，返回实际可用的结束位置"""
+        if end - max(self.start, self._release_to) > self.capacity - self.block_bytes // 4:
+            raise ValueError("请求的音频超出了流式解码缓冲区的大小")
+        while not self.finished and self.end < end:
+            limit = min(len(self._bytes), self._nbytes + self.block_bytes)
+            count = self.process.stdout.readinto(self._bytes[self._nbytes:limit])
+            if not count:
+                self._finish()
+                break
+            self._nbytes += count
+            # 从中间位置开始识别时，边读边丢弃之前的音频
+            self._compact()
+        return min(end, self.end)
+
+    def _finish(self):
+        self.finished = True
+        stderr = self.process.stderr.read()
+        self.process.wait()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"音频解码失败: {stderr.decode('utf-8', errors='ignore').strip()}")
+        if self.end == 0:
+            raise RuntimeError("视频中没有可用的音轨")
+
+    def view(self, start, end):
+        """缓冲区中[start, end)的音频，在下一次release之前有效"""
+        return self.buffer[start - self.start:end - self.start]
+
+    def release(self, sample):
+        """丢弃位置sample之前的音频，把剩余部分移到缓冲区开头"""
+        self._release_to = max(self._release_to, sample)
+        self._compact()
+
+    def _compact(self):
+        drop = min(self._release_to, self.end) - self.start
+        if drop <= 0:
+            return
+        keep = self._nbytes - drop * 4
+        # NumPy的切片赋值能正确处理重叠的区域
+        self._raw[:keep] = self._raw[drop * 4:self._nbytes]
+        self._nbytes = keep
+        self.start += drop
+
+    def at_end(self, end):
+        return self.finished and end >= self.end
+
+
+def format_decode_stats(stats):
+    """格式化音频提取阶段的耗时和内存占用"""
+    return (f"音频提取完成: 时长 {stats['duration']:.1f}秒, 耗时 {stats['elapsed']:.2f}秒, "
+            f"占用内存 {stats['nbytes'] / 1024 / 1024:.1f}MB")
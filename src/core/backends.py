@@ -0,0 +1,170 @@
+import threading
+import importlib.util
+
+from core.model_cache import get_model_cache, default_device
+
+# faster-whisper 识别参数中与 Whisper 同名且含义相同的参数
+FASTER_WHISPER_OPTIONS = ("language", "task", "initial_prompt", "best_of", "beam_size",
+                          "patience", "temperature", "condition_on_previous_text",
+                          "compression_ratio_threshold", "no_speech_threshold")
+
+
+def apply_thread_settings(intra_op_threads=None, inter_op_threads=None):
+    """设置torch的算子内/算子间线程数
+
+    算子间线程数只能在torch开始并行计算前设置一次，之后的设置会被忽略。
+    """
+    if not intra_op_threads and not inter_op_threads:
+        return
+    import torch
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"警告: 无法设置算子间线程数: {e}")
+
+
+class InferenceBackend:
+    """推理后端接口
+
+    load() 返回的对象需提供与 Whisper 模型相同的
+    transcribe(audio, verbose=None, **decode_options) 方法，返回包含 segments 的结果。
+    """
+    name = None
+    dtype = None
+
+    def __init__(self, model_size, device=None, intra_op_threads=None, inter_op_threads=None,
+                 replica=0):
+        self.model_size = model_size
+        self.device = device or default_device()
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.replica = replica
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def cache_args(self):
+        return dict(device=self.device, dtype=self.dtype, replica=self.replica)
+
+    def is_loaded(self):
+        return get_model_cache().contains(self.model_size, **self.cache_args())
+
+    def load(self):
+        """从进程级模型缓存获取模型"""
+        apply_thread_settings(self.intra_op_threads, self.inter_op_threads)
+        return get_model_cache().get(self.model_size, **self.cache_args())
+
+    def prewarm(self):
+        """在后台线程中预加载模型，返回该线程"""
+        def _warm():
+            try:
+                self.load()
+            except Exception as e:
+                print(f"预加载{self.model_size}模型失败: {e}")
+
+        thread = threading.Thread(target=_warm, name=f"prewarm-{self.name}-{self.model_size}", daemon=True)
+        thread.start()
+        return thread
+
+
+class WhisperBackend(InferenceBackend):
+    """OpenAI Whisper 的 PyTorch 实现"""
+    name = "whisper"
+
+
+class QuantizedWhisperBackend(InferenceBackend):
+    """对Whisper模型的线性层做动态int8量化，仅支持CPU"""
+    name = "whisper-int8"
+    dtype = "int8"
+
+    def __init__(self, model_size, device=None, **kwargs):
+        super().__init__(model_size, device="cpu", **kwargs)
+
+
+class FasterWhisperBackend(InferenceBackend):
+    """CTranslate2 实现的 faster-whisper（需另行安装 faster-whisper）"""
+    name = "faster-whisper"
+
+    @property
+    def dtype(self):
+        return "ct2-float16" if self.device == "cuda" else "ct2-int8"
+
+    @classmethod
+    def is_available(cls):
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def load(self):
+        def loader(model_size, device, dtype, replica):
+            return FasterWhisperModel(model_size, device, compute_type=dtype[len("ct2-"):],
+                                      cpu_threads=self.intra_op_threads or 0,
+                                      num_workers=self.inter_op_threads or 1)
+        return get_model_cache().get(self.model_size, loader=loader, **self.cache_args())
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    QuantizedWhisperBackend.name: QuantizedWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def available_backends():
+    """当前环境中可用的后端名称"""
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def create_backend(name, model_size, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {name}")
+    backend = BACKENDS[name]
+    if not backend.is_available():
+        raise RuntimeError(f"推理后端 {name} 不可用，请先安装相应的依赖")
+    return backend(model_size, **kwargs)
+
+
+def quantize_whisper_model(model):
+    """对Whisper模型的线性层做动态int8量化"""
+    import torch
+    import whisper.model
+    # Whisper的Linear子类在前向时转换权重精度，量化前还原为nn.Linear才能被替换
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class FasterWhisperModel:
+    """把 faster-whisper 模型包装为与 Whisper 模型相同的 transcribe 接口"""
+
+    def __init__(self, model_size, device, compute_type, cpu_threads=0, num_workers=1):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                                  cpu_threads=cpu_threads, num_workers=num_workers)
+
+    def transcribe(self, audio, verbose=None, **decode_options):
+        options = {key: value for key, value in decode_options.items()
+                   if key in FASTER_WHISPER_OPTIONS and value is not None}
+        segments, info = self.model.transcribe(audio, **options)
+        result_segments = []
+        for i, segment in enumerate(segments):
+            result_segments.append({
+                "id": i,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+            "language": info.language,
+        }
@@ -0,0 +1,200 @@
+import numpy as np
+
+from core.audio import SAMPLE_RATE
+from core.engine import frame_energy, stitch_segments
+from core.streaming import WINDOW_SECONDS
+
+# 每次送入模型的窗口数
+BATCH_SIZE = 8
+# 批量识别的窗口规划：负责区间约24秒（在前后4秒内找静音切分），两侧各重叠1秒
+BATCH_CHUNK_SECONDS = 24
+BATCH_SEARCH_SECONDS = 4
+BATCH_OVERLAP_SECONDS = 1
+# Whisper时间戳token的精度（秒）
+TIME_PRECISION = 0.02
+# 与 whisper.transcribe 相同的静音判断阈值
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+def plan_batch_windows(pcm, sample_rate=SAMPLE_RATE):
+    """把音频划分为在低能量处切分的重叠窗口，每个窗口（含重叠）不超过Whisper的30秒输入
+
+    返回值与 engine.plan_windows 相同：[(窗口起点, 窗口终点, 负责区间起点, 负责区间终点)]。
+    """
+    if len(pcm) == 0:
+        return []
+    overlap = int(BATCH_OVERLAP_SECONDS * sample_rate)
+    max_own = int(WINDOW_SECONDS * sample_rate) - 2 * overlap
+    energy, frame_length = frame_energy(pcm, sample_rate)
+    cuts = [0]
+    while len(pcm) - cuts[-1] > max_own:
+        # 在目标切分点附近找能量最低的帧，且负责区间不超过上限
+        lo = (cuts[-1] + int((BATCH_CHUNK_SECONDS - BATCH_SEARCH_SECONDS) * sample_rate)) // frame_length
+        hi = (cuts[-1] + max_own) // frame_length
+        cuts.append((lo + int(np.argmin(energy[lo:hi]))) * frame_length)
+    cuts.append(len(pcm))
+    return [(max(0, own_start - overlap), min(len(pcm), own_end + overlap), own_start, own_end)
+            for own_start, own_end in zip(cuts[:-1], cuts[1:])]
+
+
+class SequentialDecoder:
+    """不支持批量解码的模型（如faster-whisper）逐个窗口调用transcribe"""
+    batched = False
+
+    def __init__(self, model, decode_options):
+        self.model = model
+        self.decode_options = dict(decode_options)
+        self.language = self.decode_options.get("language")
+
+    def decode(self, windows):
+        return [self.model.transcribe(window, verbose=None, **self.decode_options)["segments"]
+                for window in windows]
+
+
+class WhisperBatchDecoder:
+    """把多个窗口的梅尔频谱拼成一个批次，编码器只做一次前向，解码器同时解码所有窗口
+
+    与逐窗口识别相比不做温度回退，也不把上一个窗口的文字作为提示词，所有窗口共用 initial_prompt。
+    """
+    batched = True
+
+    def __init__(self, model, decode_options):
+        import dataclasses
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        self.model = model
+        options = dict(decode_options)
+        self.language = options.get("language")
+        self.no_speech_threshold = options.get("no_speech_threshold", NO_SPEECH_THRESHOLD)
+        self.logprob_threshold = options.get("logprob_threshold", LOGPROB_THRESHOLD)
+
+        temperature = options.get("temperature", 0.0)
+        if isinstance(temperature, (list, tuple)):
+            temperature = temperature[0]
+        fields = {field.name for field in dataclasses.fields(whisper.DecodingOptions)}
+        kwargs = {key: value for key, value in options.items() if key in fields and value is not None}
+        kwargs["temperature"] = temperature
+        if temperature == 0:
+            # best_of 只用于采样解码
+            kwargs.pop("best_of", None)
+        kwargs["prompt"] = options.get("initial_prompt")
+        kwargs["without_timestamps"] = False
+        kwargs.setdefault("fp16", model.device.type != "cpu")
+        self.options = whisper.DecodingOptions(**kwargs)
+
+        self.n_mels = getattr(model.dims, "n_mels", 80)
+        tokenizer_kwargs = {"num_languages": model.num_languages} if hasattr(model, "num_languages") else {}
+        self.tokenizer = get_tokenizer(model.is_multilingual, language=self.language,
+                                       task=options.get("task", "transcribe"), **tokenizer_kwargs)
+
+    def mel(self, window):
+        from whisper.audio import log_mel_spectrogram, pad_or_trim
+        # 旧版whisper的log_mel_spectrogram没有n_mels参数
+        mel_kwargs = {"n_mels": self.n_mels} if self.n_mels != 80 else {}
+        return log_mel_spectrogram(pad_or_trim(window), **mel_kwargs)
+
+    def decode(self, windows):
+        """识别一批窗口，返回每个窗口的片段列表，时间戳相对于窗口起点"""
+        import torch
+        mel = torch.stack([self.mel(window) for window in windows]).to(self.model.device)
+        results = self.model.decode(mel, self.options)
+        return [self.split_segments(result, len(window) / SAMPLE_RATE)
+                for result, window in zip(results, windows)]
+
+    def split_segments(self, result, duration):
+        """按时间戳token把一个窗口的解码结果拆分为片段"""
+        if result.no_speech_prob > self.no_speech_threshold and result.avg_logprob < self.logprob_threshold:
+            return []
+        timestamp_begin = self.tokenizer.timestamp_begin
+        segments = []
+        start = None
+        text_tokens = []
+
+        def close(end):
+            text = self.tokenizer.decode(text_tokens)
+            if text.strip():
+                segments.append({
+                    "seek": 0,
+                    "start": min(start or 0.0, duration),
+                    "end": min(end, duration),
+                    "text": text,
+                    "tokens": list(text_tokens),
+                    "temperature": result.temperature,
+                    "avg_logprob": result.avg_logprob,
+                    "compression_ratio": result.compression_ratio,
+                    "no_speech_prob": result.no_speech_prob,
+                })
+
+        for token in result.tokens:
+            if token >= timestamp_begin:
+                time = (token - timestamp_begin) * TIME_PRECISION
+                if text_tokens:
+                    close(time)
+                    text_tokens = []
+                    start = None
+                else:
+                    start = time
+            else:
+                text_tokens.append(token)
+        if text_tokens:
+            # 没有结束时间戳的片段延续到窗口末尾
+            close(duration)
+        return segments
+
+
+def create_decoder(model, decode_options):
+    """Whisper模型使用批量解码，其他模型逐个窗口识别"""
+    if hasattr(model, "dims") and hasattr(model, "decode"):
+        return WhisperBatchDecoder(model, decode_options)
+    return SequentialDecoder(model, decode_options)
+
+
+def transcribe_batched(decoder, audios, batch_size=BATCH_SIZE, on_done=None, on_batch=None,
+                       check_cancelled=None, sample_rate=SAMPLE_RATE):
+    """批量识别多个音频，所有文件的窗口依次装入批次，一个批次可以包含多个文件的窗口
+
+    audios 为 [(key, PCM数组)]。某个文件的窗口全部识别完后，结果立即拼接并通过 on_done(key, result) 返回，
+    时间戳已换算到该文件自己的时间轴。on_batch(已完成的窗口数, 窗口总数) 在每个批次完成后调用。
+    返回 {key: result}，结果结构与 model.transcribe 相同。
+    """
+    plans = []
+    items = []
+    for plan_index, (key, pcm) in enumerate(audios):
+        windows = plan_batch_windows(pcm, sample_rate)
+        plans.append((key, pcm, windows, [None] * len(windows)))
+        items.extend((plan_index, window_index) for window_index in range(len(windows)))
+
+    results = {}
+    remaining = [len(windows) for _, _, windows, _ in plans]
+
+    def finish(plan_index):
+        key, _, windows, window_results = plans[plan_index]
+        result = stitch_segments(windows, window_results, sample_rate)
+        result["language"] = result["language"] or decoder.language
+        results[key] = result
+        if on_done:
+            on_done(key, result)
+
+    for plan_index, count in enumerate(remaining):
+        if count == 0:
+            finish(plan_index)
+
+    for batch_start in range(0, len(items), batch_size):
+        if check_cancelled:
+            check_cancelled()
+        batch = items[batch_start:batch_start + batch_size]
+        windows = []
+        for plan_index, window_index in batch:
+            _, pcm, file_windows, _ = plans[plan_index]
+            start, end, _, _ = file_windows[window_index]
+            windows.append(np.ascontiguousarray(pcm[start:end], dtype=np.float32))
+        for (plan_index, window_index), segments in zip(batch, decoder.decode(windows)):
+            plans[plan_index][3][window_index] = {"segments": segments, "language": decoder.language}
+            remaining[plan_index] -= 1
+            if remaining[plan_index] == 0:
+                finish(plan_index)
+        if on_batch:
+            on_batch(batch_start + len(batch), len(items))
+    return results
@@ -0,0 +1,164 @@
+import time
+
+from core.audio import SAMPLE_RATE
+
+# 级联识别的低置信度阈值：比whisper温度回退的阈值（-1.0 / 2.4 / 0.6）更严格，
+# 草稿模型勉强通过但不够可靠的片段也交给大模型重新识别
+LOGPROB_THRESHOLD = -0.6
+COMPRESSION_RATIO_THRESHOLD = 2.2
+NO_SPEECH_THRESHOLD = 0.5
+# 间隔小于该值（秒）的低置信度片段合并为一个区间，连同中间的片段一起重新识别
+MERGE_GAP_SECONDS = 1.0
+# 区间短于该值（秒）时向两侧扩展到相邻片段，过短的音频大模型也识别不准
+MIN_SPAN_SECONDS = 2.0
+# 重新识别时作为提示词的上文的最大字符数
+PROMPT_CHARS = 200
+
+
+def is_low_confidence(segment, logprob_threshold=LOGPROB_THRESHOLD,
+                      compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+                      no_speech_threshold=NO_SPEECH_THRESHOLD):
+    """片段的平均对数概率过低、压缩比过高（重复）或很可能是静音时的幻觉，视为低置信度"""
+    return (segment.get("avg_logprob", 0.0) < logprob_threshold
+            or segment.get("compression_ratio", 0.0) > compression_ratio_threshold
+            or segment.get("no_speech_prob", 0.0) > no_speech_threshold)
+
+
+def plan_spans(segments, flags, merge_gap=MERGE_GAP_SECONDS, min_span=MIN_SPAN_SECONDS):
+    """把低置信度片段合并为需要重新识别的区间，返回 [(首个片段序号, 末个片段序号)]，区间互不重叠"""
+    spans = []
+    for index, flagged in enumerate(flags):
+        if not flagged:
+            continue
+        if spans and segments[index]["start"] - segments[spans[-1][1]]["end"] <= merge_gap:
+            spans[-1][1] = index
+        else:
+            spans.append([index, index])
+
+    for span in spans:
+        first, last = span
+        # 向时间上更近的相邻片段扩展，直到区间足够长或两侧都没有片段
+        while segments[last]["end"] - segments[first]["start"] < min_span:
+            prev_gap = segments[first]["start"] - segments[first - 1]["end"] if first > 0 else None
+            next_gap = segments[last + 1]["start"] - segments[last]["end"] if last + 1 < len(segments) else None
+            if prev_gap is None and next_gap is None:
+                break
+            if next_gap is None or (prev_gap is not None and prev_gap <= next_gap):
+                first -= 1
+            else:
+                last += 1
+        span[0], span[1] = first, last
+
+    merged = []
+    for first, last in spans:
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def shift_segments(segments, offset, limit):
+    """把区间内识别出的片段换算到整段音频的时间轴，并截断到区间终点"""
+    shifted = []
+    for segment in segments:
+        start = segment["start"] + offset
+        if start >= limit:
+            continue
+        segment = dict(segment)
+        segment["start"] = start
+        segment["end"] = min(segment["end"] + offset, limit)
+        shifted.append(segment)
+    return shifted
+
+
+def transcribe_cascade(draft_model, load_final_model, audio, decode_options, on_progress=None,
+                       check_cancelled=None, sample_rate=SAMPLE_RATE):
+    """级联识别：草稿模型识别全部音频，低置信度的区间再由大模型重新识别并替换
+
+    load_final_model() 在需要重新识别时才调用。返回 (结果, 统计)，结果结构与 model.transcribe 相同；
+    统计中的 speedup 按大模型在重新识别区间上的实际速度外推到整段音频，与只用大模型的耗时相比。
+    """
+    on_progress = on_progress or (lambda message: None)
+    audio_seconds = len(audio) / sample_rate
+
+    on_progress("级联识别: 草稿模型识别全部音频...")
+    start = time.perf_counter()
+    draft = draft_model.transcribe(audio, verbose=None, **decode_options)
+    draft_seconds = time.perf_counter() - start
+
+    segments = draft["segments"]
+    flags = [is_low_confidence(segment) for segment in segments]
+    spans = plan_spans(segments, flags)
+    stats = {
+        "audio_seconds": audio_seconds,
+        "draft_seconds": draft_seconds,
+        "segments": len(segments),
+        "low_confidence_segments": sum(flags),
+        "spans": len(spans),
+        "redecoded_segments": sum(last - first + 1 for first, last in spans),
+        "redecoded_audio_seconds": sum(segments[last]["end"] - segments[first]["start"] for first, last in spans),
+        "redecode_seconds": 0.0,
+    }
+    if not spans:
+        on_progress("级联识别: 没有低置信度片段，无需重新识别")
+        return draft, finish_stats(stats)
+
+    final_model = load_final_model()
+    output = []
+    next_index = 0
+    for span_number, (first, last) in enumerate(spans, 1):
+        if check_cancelled:
+            check_cancelled()
+        on_progress(f"级联识别: 重新识别低置信度区间 {span_number}/{len(spans)}")
+        output.extend(segments[next_index:first])
+        span_start = segments[first]["start"]
+        span_end = segments[last]["end"]
+        options = dict(decode_options)
+        # 上文（已确定的文字）作为提示词，使重新识别的区间与前文衔接
+        prompt = "".join(segment["text"] for segment in output)[-PROMPT_CHARS:]
+        if prompt and options.get("condition_on_previous_text", True):
+            options["initial_prompt"] = prompt
+        clip = audio[int(span_start * sample_rate):int(span_end * sample_rate)]
+        start = time.perf_counter()
+        result = final_model.transcribe(clip, verbose=None, **options)
+        stats["redecode_seconds"] += time.perf_counter() - start
+        output.extend(shift_segments(result["segments"], span_start, span_end))
+        next_index = last + 1
+    output.extend(segments[next_index:])
+
+    for index, segment in enumerate(output):
+        if "id" in segment:
+            segment["id"] = index
+    result = {
+        "text": "".join(segment["text"] for segment in output),
+        "segments": output,
+        "language": draft.get("language"),
+    }
+    return result, finish_stats(stats)
+
+
+def finish_stats(stats):
+    """计算重新识别的比例和相对只用大模型的估计加速比"""
+    audio_seconds = stats["audio_seconds"]
+    stats["fraction"] = stats["redecoded_audio_seconds"] / audio_seconds if audio_seconds else 0.0
+    stats["total_seconds"] = stats["draft_seconds"] + stats["redecode_seconds"]
+    stats["estimated_final_seconds"] = None
+    stats["speedup"] = None
+    if stats["redecoded_audio_seconds"] > 0 and stats["total_seconds"] > 0:
+        final_rate = stats["redecode_seconds"] / stats["redecoded_audio_seconds"]
+        stats["estimated_final_seconds"] = final_rate * audio_seconds
+        stats["speedup"] = stats["estimated_final_seconds"] / stats["total_seconds"]
+    return stats
+
+
+def format_cascade_stats(stats, draft_model, final_model):
+    """格式化级联识别的统计信息"""
+    text = (f"级联识别: {draft_model} 识别全部音频 {stats['draft_seconds']:.1f}秒，"
+            f"{stats['low_confidence_segments']}/{stats['segments']} 个片段置信度低，"
+            f"{final_model} 重新识别 {stats['spans']} 个区间（音频的 {stats['fraction'] * 100:.1f}%）"
+            f"{stats['redecode_seconds']:.1f}秒")
+    if stats["speedup"] is not None:
+        text += (f"；只用 {final_model} 估计需 {stats['estimated_final_seconds']:.1f}秒，"
+                 f"加速 {stats['speedup']:.2f}倍")
+    return text
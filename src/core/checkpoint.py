@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+# 检查点日志目录，可通过环境变量调整
+DEFAULT_JOURNAL_DIR = os.environ.get(
+    'VIDEOTOTXT_JOURNAL_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'videototxt', 'journals'))
+# 音频超过该时长（秒）时，即使不需要逐窗口产出片段也改为逐窗口识别并记录检查点
+CHECKPOINT_MIN_SECONDS = float(os.environ.get('VIDEOTOTXT_CHECKPOINT_MIN_SECONDS', '600'))
+JOURNAL_VERSION = 1
+
+
+def journal_key(video_path, model_size, decode_options, extra=None):
+    """由视频文件（路径、大小、修改时间）和识别参数生成日志键，视频或参数变化后不会误用旧的进度"""
+    st = os.stat(video_path)
+    params = {
+        "video": os.path.abspath(video_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "model": model_size,
+        "options": decode_options,
+        "extra": extra,
+    }
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+
+class CheckpointJournal:
+    """逐窗口识别的进度日志，进程崩溃或被关闭后可从最后一个完成的窗口继续
+
+    JSON Lines文件：第一行为元信息，之后每识别完一个窗口追加一行，包含该窗口的片段、
+    下一个窗口的起点（采样点）和作为下一个窗口提示词的上文。每行写入后立即fsync，
+    进程在任何时刻被杀死最多丢失正在识别的那个窗口；末尾写了一半的行在读取时被忽略并截掉。
+    """
+
+    def __init__(self, key, journal_dir=DEFAULT_JOURNAL_DIR):
+        self.path = os.path.join(journal_dir, key + ".jsonl")
+        self._file = None
+        self._valid_bytes = 0  # 日志中完整记录的字节数
+
+    def load(self):
+        """读取已提交的进度，返回 (片段列表, 下一个窗口的起点, 提示词)，没有可用的进度时返回None"""
+        self._valid_bytes = 0
+        try:
+            with open(self.path, 'rb') as f:
+                header_line = f.readline()
+                header = json.loads(header_line)
+                if header.get("version") != JOURNAL_VERSION:
+                    return None
+                valid_bytes = len(header_line)
+                segments = []
+                seek = None
+                prompt = None
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程在写入这一行时被中断
+                        break
+                    segments.extend(record["segments"])
+                    seek = record["seek"]
+                    prompt = record["prompt"]
+                    valid_bytes += len(line)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"警告: 无法读取检查点 {self.path}: {e}")
+            return None
+        self._valid_bytes = valid_bytes
+        if seek is None:
+            return None
+        return segments, seek, prompt
+
+    def open(self, resume, video_path=None):
+        """开始写入日志；resume为True时接在load()读到的完整记录之后，否则重新开始"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume and self._valid_bytes:
+            self._file = open(self.path, 'r+b')
+            self._file.truncate(self._valid_bytes)
+            self._file.seek(self._valid_bytes)
+            return
+        self._file = open(self.path, 'wb')
+        self._write({"version": JOURNAL_VERSION, "video": video_path,
+                     "created": datetime.now().isoformat(timespec='seconds')})
+
+    def commit(self, seek, prompt, segments):
+        """记录一个已识别完的窗口"""
+        self._write({"seek": seek, "prompt": prompt, "segments": segments})
+
+    def _write(self, record):
+        self._file.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """识别完成后删除日志"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
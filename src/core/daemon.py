@@ -0,0 +1,317 @@
+import os
+import hmac
+import json
+import time
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from core.backends import BACKENDS
+from core.model_cache import get_model_cache
+from core.presets import PRESETS
+from core.scheduler import JobScheduler, FINAL_STATUSES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 服务中保留的已结束任务数，超出后丢弃最早结束的任务及其事件
+MAX_FINISHED_JOBS = 200
+# 事件流在没有新事件时发送心跳的间隔（秒），用于发现已断开的客户端
+HEARTBEAT_SECONDS = 15
+# 访问令牌文件，只有当前用户可读写：服务启动时生成新令牌，客户端读取后放在 Authorization 请求头中，
+# 本机的其他用户无法提交任务或读取识别结果。可通过环境变量调整
+TOKEN_FILE = os.environ.get(
+    'VIDEOTOTXT_DAEMON_TOKEN_FILE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'videototxt', 'daemon.token'))
+
+
+def create_token(path=TOKEN_FILE):
+    """生成新的访问令牌，写入只有当前用户可读写的文件"""
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+    # 创建时即设置权限，写入令牌前其他用户无法打开该文件
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, path)
+    return token
+
+
+def read_token(path=TOKEN_FILE):
+    """读取访问令牌，文件不存在或无法读取时返回None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def json_default(value):
+    """numpy标量等无法直接序列化的值"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def encode_json(data):
+    return json.dumps(data, ensure_ascii=False, default=json_default).encode("utf-8")
+
+
+def backend_error(name):
+    """检查请求中的推理后端，未知或未安装时返回错误信息"""
+    if name not in BACKENDS:
+        return f"未知的推理后端: {name}（可用: {', '.join(sorted(BACKENDS))}）"
+    if not BACKENDS[name].is_available():
+        return f"推理后端 {name} 不可用，请先在服务端安装相应的依赖"
+    return None
+
+
+def job_info(job):
+    return {
+        "id": job.id,
+        "video_path": job.video_path,
+        "model_size": job.model_size,
+        "use_vad": job.use_vad,
+        "backend": job.backend,
+        "draft_model": job.draft_model,
+        "preset": job.preset,
+        "status": job.status,
+        "percent": job.percent,
+        "message": job.message,
+        "error": job.error,
+        "segments": len(job.segments),
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class TranscriptionDaemon:
+    """常驻识别服务：持有调度器和已加载的模型，记录每个任务的事件供客户端按序读取
+
+    事件与 JobScheduler 的 on_event 一一对应，记录为 {"event": ..., "payload": ...}，
+    结束状态的事件附带 error。客户端可以从任意序号开始读取，断开后重新连接不会丢失事件。
+    """
+
+    def __init__(self, transcribe_slots=None, batch_size=1, extract_workers=None):
+        kwargs = {"extract_workers": extract_workers} if extract_workers else {}
+        self.scheduler = JobScheduler(on_event=self._on_event, transcribe_slots=transcribe_slots,
+                                      batch_size=batch_size, **kwargs)
+        self.started_at = time.time()
+        self._events = {}  # 任务ID -> 事件列表
+        self._changed = threading.Condition()
+
+    def _on_event(self, job, event, payload):
+        record = {"event": event, "payload": payload}
+        if event == "status" and payload in FINAL_STATUSES:
+            record["error"] = job.error
+        with self._changed:
+            self._events.setdefault(job.id, []).append(record)
+            self._changed.notify_all()
+
+    def preload(self, model_sizes, backend="whisper"):
+        """启动时为每个识别槽位加载模型副本，之后的任务无需等待模型加载"""
+        from core.backends import create_backend
+        for model_size in model_sizes:
+            self.scheduler.ensure_slots(model_size)
+            for replica in range(self.scheduler.transcribe_slots):
+                start = time.perf_counter()
+                create_backend(backend, model_size, replica=replica).load()
+                print(f"已加载模型 {model_size} ({backend}) 副本 {replica}，耗时 {time.perf_counter() - start:.1f}秒")
+
+    def submit(self, video_path, model_size, use_vad=False, backend="whisper", draft_model=None, preset=None):
+        self._forget_finished()
+        return self.scheduler.submit(video_path, model_size, use_vad, backend, draft_model, preset)
+
+    def _forget_finished(self):
+        finished = sorted((job for job in list(self.scheduler.jobs.values()) if job.finished_at),
+                          key=lambda job: job.finished_at)
+        with self._changed:
+            for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                self.scheduler.jobs.pop(job.id, None)
+                self._events.pop(job.id, None)
+
+    def wait_events(self, job_id, since, timeout):
+        """返回任务从序号since开始的事件；暂无新事件时最多等待timeout秒"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self._events.get(job_id, ())) > since, timeout)
+            return list(self._events.get(job_id, ())[since:])
+
+    def metrics(self):
+        metrics = self.scheduler.metrics()
+        cache_stats = get_model_cache().stats()
+        metrics["models"] = {
+            "cached": [list(key) for key in cache_stats["cached"]],
+            "memory_mb": cache_stats["memory_mb"],
+            "hits": cache_stats["hits"],
+            "misses": cache_stats["misses"],
+            "evictions": cache_stats["evictions"],
+        }
+        metrics["uptime"] = time.time() - self.started_at
+        return metrics
+
+    def shutdown(self):
+        self.scheduler.shutdown()
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """HTTP接口，所有请求都须带有 Authorization: Bearer <令牌>：
+
+        GET    /health                 服务状态
+        GET    /metrics                队列深度、延迟、合并识别和模型缓存统计
+        GET    /jobs                   所有任务
+        POST   /jobs                   提交任务 {"video_path", "model_size", "use_vad", "backend", "draft_model", "preset"}
+        GET    /jobs/<id>              任务状态
+        GET    /jobs/<id>/events       任务事件流（JSON Lines），任务结束后关闭，?since=N 从第N个事件开始
+        DELETE /jobs/<id>              取消任务
+        POST   /prewarm                后台预加载模型 {"model_size", "backend"}
+    """
+    server_version = "VideoToTxtDaemon/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def authorized(self):
+        """检查访问令牌，不正确时返回401"""
+        expected = f"Bearer {self.server.token}".encode("utf-8")
+        if hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"), expected):
+            return True
+        self.send_json({"error": "缺少访问令牌或令牌不正确"}, 401)
+        return False
+
+    def send_json(self, data, status=200):
+        body = encode_json(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def route(self):
+        """解析路径，返回 (路径各段, 查询参数, 任务)"""
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        job = None
+        if len(parts) >= 2 and parts[0] == "jobs":
+            try:
+                job = self.service.scheduler.jobs.get(int(parts[1]))
+            except ValueError:
+                pass
+        return parts, parse_qs(url.query), job
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parts, query, job = self.route()
+        if parts == ["health"]:
+            self.send_json({"status": "ok", "uptime": time.time() - self.service.started_at})
+        elif parts == ["metrics"]:
+            self.send_json(self.service.metrics())
+        elif parts == ["jobs"]:
+            self.send_json([job_info(job) for job in list(self.service.scheduler.jobs.values())])
+        elif job is None:
+            self.send_json({"error": "任务不存在"}, 404)
+        elif len(parts) == 2:
+            self.send_json(job_info(job))
+        elif parts[2:] == ["events"]:
+            self.stream_events(job, int(query.get("since", ["0"])[0]))
+        else:
+            self.send_json({"error": "未知的路径"}, 404)
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        parts, _, _ = self.route()
+        try:
+            request = self.read_json()
+        except ValueError:
+            self.send_json({"error": "请求内容不是有效的JSON"}, 400)
+            return
+        if parts == ["jobs"]:
+            video_path = request.get("video_path")
+            if not video_path:
+                self.send_json({"error": "缺少 video_path"}, 400)
+                return
+            if request.get("preset") and request["preset"] not in PRESETS:
+                self.send_json({"error": f"未知的预设: {request['preset']}"}, 400)
+                return
+            backend = request.get("backend", "whisper")
+            error = backend_error(backend)
+            if error:
+                self.send_json({"error": error}, 400)
+                return
+            job = self.service.submit(video_path, request.get("model_size", "medium"),
+                                      bool(request.get("use_vad")), backend,
+                                      request.get("draft_model"), request.get("preset"))
+            self.send_json(job_info(job), 201)
+        elif parts == ["prewarm"]:
+            backend = request.get("backend", "whisper")
+            error = backend_error(backend)
+            if error:
+                self.send_json({"error": error}, 400)
+                return
+            started = self.service.scheduler.prewarm(request.get("model_size", "medium"), backend)
+            self.send_json({"started": started})
+        else:
+            self.send_json({"error": "未知的路径"}, 404)
+
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        parts, _, job = self.route()
+        if job is None or len(parts) != 2:
+            self.send_json({"error": "任务不存在"}, 404)
+            return
+        self.service.scheduler.cancel(job.id)
+        self.send_json(job_info(job))
+
+    def stream_events(self, job, since):
+        """逐行发送任务事件，直到发送了结束状态"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                events = self.service.wait_events(job.id, since, HEARTBEAT_SECONDS)
+                if not events:
+                    if job.id not in self.service.scheduler.jobs:
+                        return
+                    self.wfile.write(b'{"event": "heartbeat"}\n')
+                for record in events:
+                    self.wfile.write(encode_json(record) + b"\n")
+                self.wfile.flush()
+                since += len(events)
+                if any(record["event"] == "status" and record["payload"] in FINAL_STATUSES
+                       for record in events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已断开，任务继续执行，重新连接时可以从断开处继续读取
+            pass
+
+
+class DaemonServer(ThreadingHTTPServer):
+    """每个请求一个线程，事件流长时间占用连接不影响其他请求"""
+    daemon_threads = True
+
+    def __init__(self, service, token, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+        super().__init__((host, port), DaemonRequestHandler)
+        self.service = service
+        self.token = token
+        self.verbose = verbose
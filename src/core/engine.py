@@ -0,0 +1,174 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from core.audio import SAMPLE_RATE
+
+# Whisper梅尔频谱的帧移（采样点），用于换算segment中的seek
+HOP_LENGTH = 160
+
+# 每个CPU模型副本大致占用的内存（MB），用于计算副本数量
+MODEL_MEMORY_MB = {
+    "tiny": 400,
+    "base": 600,
+    "small": 1400,
+    "medium": 3500,
+    "large": 7000,
+}
+
+# 并行转录的默认参数
+CHUNK_SECONDS = 300          # 每个窗口的目标长度
+OVERLAP_SECONDS = 5          # 相邻窗口的重叠长度
+SPLIT_SEARCH_SECONDS = 15    # 在目标切分点前后寻找静音的范围
+MIN_PARALLEL_SECONDS = 2 * CHUNK_SECONDS
+THREADS_PER_WORKER = 2
+
+
+def total_memory_mb():
+    """获取物理内存大小（MB），无法获取时返回None"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_memory_cap_mb():
+    """并行转录可用的内存上限，默认为物理内存的一半"""
+    env_value = os.environ.get('VIDEOTOTXT_ENGINE_MEMORY_MB')
+    if env_value:
+        return int(env_value)
+    total = total_memory_mb()
+    return total // 2 if total else 8192
+
+
+def plan_workers(duration, model_size, device="cpu", memory_cap_mb=None,
+                 threads_per_worker=THREADS_PER_WORKER):
+    """计算并行转录使用的模型副本数量，返回1表示应走顺序转录"""
+    if device != "cpu" or duration < MIN_PARALLEL_SECONDS:
+        return 1
+    memory_cap_mb = memory_cap_mb or default_memory_cap_mb()
+    by_cpu = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    by_memory = max(1, memory_cap_mb // MODEL_MEMORY_MB.get(model_size, MODEL_MEMORY_MB["large"]))
+    by_chunks = max(1, int(np.ceil(duration / CHUNK_SECONDS)))
+    return int(min(by_cpu, by_memory, by_chunks))
+
+
+def frame_energy(pcm, sample_rate=SAMPLE_RATE, frame_seconds=0.02):
+    """按帧计算RMS能量"""
+    frame_length = int(sample_rate * frame_seconds)
+    n_frames = len(pcm) // frame_length
+    frames = pcm[:n_frames * frame_length].reshape(n_frames, frame_length)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1)), frame_length
+
+
+def find_split_points(pcm, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS,
+                      search_seconds=SPLIT_SEARCH_SECONDS):
+    """在每个目标切分点附近寻找能量最低的位置作为切分点（采样点下标）"""
+    energy, frame_length = frame_energy(pcm, sample_rate)
+    frames_per_second = sample_rate / frame_length
+    points = []
+    target = chunk_seconds
+    total_seconds = len(pcm) / sample_rate
+    while target < total_seconds - chunk_seconds / 2:
+        lo = int(max(0, target - search_seconds) * frames_per_second)
+        hi = int(min(total_seconds, target + search_seconds) * frames_per_second)
+        if hi > lo:
+            best = lo + int(np.argmin(energy[lo:hi]))
+            points.append(best * frame_length)
+        else:
+            points.append(int(target * sample_rate))
+        target = points[-1] / sample_rate + chunk_seconds
+    return points
+
+
+def plan_windows(pcm, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS,
+                 overlap_seconds=OVERLAP_SECONDS):
+    """划分带重叠的窗口
+
+    返回 [(窗口起点, 窗口终点, 负责区间起点, 负责区间终点)]，单位均为采样点。
+    拼接时只保留中点落在负责区间内的片段，以此去除重叠部分的重复结果。
+    """
+    cuts = [0] + find_split_points(pcm, sample_rate, chunk_seconds) + [len(pcm)]
+    overlap = int(overlap_seconds * sample_rate)
+    windows = []
+    for own_start, own_end in zip(cuts[:-1], cuts[1:]):
+        windows.append((max(0, own_start - overlap), min(len(pcm), own_end + overlap),
+                        own_start, own_end))
+    return windows
+
+
+_worker_model = None
+_worker_options = None
+
+
+def _init_worker(model_size, backend_name, decode_options, threads):
+    """子进程初始化：限制线程数并加载一份模型副本"""
+    global _worker_model, _worker_options
+    os.environ['KMP_DUPLICATE_LIB_OK'] = 'True'
+    from core.backends import create_backend
+    backend = create_backend(backend_name, model_size, device="cpu", intra_op_threads=threads)
+    _worker_model = backend.load()
+    _worker_options = decode_options
+
+
+def _transcribe_window(index, window_pcm):
+    result = _worker_model.transcribe(window_pcm, verbose=None, fp16=False, **_worker_options)
+    return index, result
+
+
+def stitch_segments(windows, results, sample_rate=SAMPLE_RATE):
+    """把各窗口的识别结果换算到全局时间轴，并去掉重叠部分的重复片段"""
+    segments = []
+    for (start, _, own_start, own_end), result in zip(windows, results):
+        offset = start / sample_rate
+        own_start_sec = own_start / sample_rate
+        own_end_sec = own_end / sample_rate
+        for segment in result["segments"]:
+            global_start = segment["start"] + offset
+            global_end = segment["end"] + offset
+            middle = (global_start + global_end) / 2
+            if not own_start_sec <= middle < own_end_sec:
+                continue
+            if segments and segments[-1]["text"].strip() == segment["text"].strip() \
+                    and global_start < segments[-1]["end"]:
+                continue
+            stitched = dict(segment)
+            stitched["start"] = global_start
+            stitched["end"] = global_end
+            stitched["seek"] = segment.get("seek", 0) + start // HOP_LENGTH
+            segments.append(stitched)
+
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    language = next((r.get("language") for r in results if r.get("language")), None)
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+    }
+
+
+def transcribe_chunked(pcm, model_size, decode_options, workers, backend_name="whisper",
+                       threads_per_worker=THREADS_PER_WORKER, on_progress=None):
+    """把音频切分为重叠窗口，用多个进程中的模型副本并行转录
+
+    返回值与 model.transcribe 的结果结构兼容。
+    """
+    windows = plan_windows(pcm)
+    results = [None] * len(windows)
+    # 使用spawn避免在已初始化torch线程池的进程中fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(model_size, backend_name, decode_options,
+                                       threads_per_worker)) as executor:
+        futures = [executor.submit(_transcribe_window, i, np.ascontiguousarray(pcm[start:end]))
+                   for i, (start, end, _, _) in enumerate(windows)]
+        for done, future in enumerate(as_completed(futures), 1):
+            index, result = future.result()
+            results[index] = result
+            if on_progress:
+                on_progress(done, len(windows))
+    return stitch_segments(windows, results)
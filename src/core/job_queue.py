@@ -0,0 +1,117 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """持久化在磁盘上的任务队列
+
+    每次状态变化都会原子地写回JSON文件。重新打开队列时，上次处于运行中的任务
+    （进程崩溃或被中断）会被放回待处理状态，从而在重启后继续执行。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs = []
+        self.load()
+
+    def load(self):
+        """从磁盘加载队列"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.jobs = json.load(f).get("jobs", [])
+        except Exception as e:
+            print(f"警告: 无法加载任务队列 {self.path}: {e}")
+            self.jobs = []
+        for job in self.jobs:
+            if job["status"] == RUNNING:
+                job["status"] = PENDING
+
+    def save(self):
+        """原子地把队列写回磁盘"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"jobs": self.jobs}, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def add(self, video_path, output_path, overwrite=False):
+        """添加任务，返回是否新增或重新放回待处理状态
+
+        同一视频只保留一个任务。已完成或失败的任务在字幕文件不存在、输出路径改变（如换了格式）
+        或指定overwrite时重新放回待处理状态；尚未完成的任务只更新输出路径。
+        """
+        video_path = os.path.abspath(video_path)
+        output_path = os.path.abspath(output_path)
+        with self._lock:
+            for job in self.jobs:
+                if job["video_path"] != video_path:
+                    continue
+                changed = job["output_path"] != output_path
+                job["output_path"] = output_path
+                if job["status"] in (DONE, FAILED) and (overwrite or changed or not os.path.exists(output_path)):
+                    self._set_status(job, PENDING)
+                    return True
+                if changed:
+                    self.save()
+                return False
+            self.jobs.append({
+                "video_path": video_path,
+                "output_path": output_path,
+                "status": PENDING,
+                "error": None,
+                "updated": datetime.now().isoformat(timespec='seconds'),
+            })
+            self.save()
+            return True
+
+    def next_pending(self):
+        """取出下一个待处理任务并标记为运行中，没有任务时返回None"""
+        with self._lock:
+            for job in self.jobs:
+                if job["status"] == PENDING:
+                    self._set_status(job, RUNNING)
+                    return job
+            return None
+
+    def mark_done(self, job):
+        with self._lock:
+            self._set_status(job, DONE)
+
+    def mark_failed(self, job, error):
+        with self._lock:
+            self._set_status(job, FAILED, str(error))
+
+    def retry_failed(self):
+        """把失败的任务重新放回待处理状态"""
+        with self._lock:
+            for job in self.jobs:
+                if job["status"] == FAILED:
+                    self._set_status(job, PENDING)
+
+    def _set_status(self, job, status, error=None):
+        job["status"] = status
+        job["error"] = error
+        job["updated"] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+
+    def counts(self):
+        """按状态统计任务数量"""
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self.jobs:
+                counts[job["status"]] += 1
+            return counts
@@ -0,0 +1,175 @@
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+
+# 默认内存预算（MB），可通过环境变量 VIDEOTOTXT_MODEL_CACHE_MB 调整
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('VIDEOTOTXT_MODEL_CACHE_MB', '4096'))
+# 是否由用户指定了预算；未指定时并发识别会按需提高预算，指定时改为限制槽位数
+MEMORY_BUDGET_CONFIGURED = 'VIDEOTOTXT_MODEL_CACHE_MB' in os.environ
+
+
+def default_device():
+    """根据当前硬件选择推理设备"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_nbytes(model):
+    """估算模型权重占用的内存字节数，无法统计的模型（如CTranslate2）返回0"""
+    if not hasattr(model, "parameters"):
+        return 0
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelCache:
+    """进程内Whisper模型缓存
+
+    以 (模型大小, 设备, 精度, 副本编号) 为键保存已加载的模型，超出内存预算时按LRU淘汰，
+    同一个模型的并发加载只会真正执行一次。Whisper解码时会在模型上注册kv-cache钩子，
+    同一个模型对象不能被多个线程同时使用，并发识别时每个识别槽位使用各自的副本。
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, loader=None):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._loader = loader or self._load_whisper_model
+        self._models = OrderedDict()  # key -> (model, nbytes)
+        self._loading = {}            # key -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times = {}          # key -> 加载耗时(秒)
+
+    @staticmethod
+    def _load_whisper_model(model_size, device, dtype, replica=0):
+        if dtype.startswith("ct2-"):
+            from core.backends import FasterWhisperModel
+            return FasterWhisperModel(model_size, device, compute_type=dtype[len("ct2-"):])
+        import whisper
+        model = whisper.load_model(model_size, device=device)
+        if dtype == "fp16":
+            model = model.half()
+        elif dtype == "int8":
+            from core.backends import quantize_whisper_model
+            model = quantize_whisper_model(model)
+        return model
+
+    def make_key(self, model_size, device=None, dtype=None, replica=0):
+        """补全默认设备和精度，生成缓存键"""
+        device = device or default_device()
+        dtype = dtype or ("fp16" if device == "cuda" else "fp32")
+        return (model_size, device, dtype, replica)
+
+    def get(self, model_size, device=None, dtype=None, replica=0, loader=None):
+        """获取模型，命中缓存时直接返回，否则加载（可指定加载函数）并放入缓存"""
+        key = self.make_key(model_size, device, dtype, replica)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0]
+                event = self._loading.get(key)
+                if event is None:
+                    # 由当前线程负责加载
+                    event = threading.Event()
+                    self._loading[key] = event
+                    self.misses += 1
+                    break
+            # 其他线程正在加载同一个模型，等待其完成后重新查找
+            event.wait()
+
+        try:
+            start_time = time.perf_counter()
+            model = (loader or self._loader)(*key)
+            self.load_times[key] = time.perf_counter() - start_time
+            with self._lock:
+                self._models[key] = (model, model_nbytes(model))
+                self._models.move_to_end(key)
+                self._evict_locked()
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def contains(self, model_size, device=None, dtype=None, replica=0):
+        """检查模型是否已在缓存中"""
+        key = self.make_key(model_size, device, dtype, replica)
+        with self._lock:
+            return key in self._models
+
+    def ensure_budget(self, memory_mb):
+        """把内存预算提高到至少memory_mb（MB），使并发识别时每个槽位的模型副本都能留在缓存中"""
+        with self._lock:
+            self.memory_budget = max(self.memory_budget, int(memory_mb * 1024 * 1024))
+
+    def memory_usage(self):
+        """当前缓存中模型占用的总字节数"""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._models.values())
+
+    def _evict_locked(self):
+        """淘汰最久未使用的模型，直到满足内存预算（至少保留一个）"""
+        evicted = False
+        total = sum(nbytes for _, nbytes in self._models.values())
+        while total > self.memory_budget and len(self._models) > 1:
+            key, (_, nbytes) = self._models.popitem(last=False)
+            total -= nbytes
+            self.evictions += 1
+            evicted = True
+            print(f"模型缓存超出预算，已淘汰: {key[0]} ({key[1]}, {key[2]})")
+        if evicted:
+            self._release_memory()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._models.clear()
+        self._release_memory()
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "cached": [key for key in self._models],
+                "memory_mb": sum(nbytes for _, nbytes in self._models.values()) / 1024 / 1024,
+                "load_times": dict(self.load_times),
+            }
+
+    def format_stats(self):
+        """格式化缓存统计信息，用于界面显示"""
+        stats = self.stats()
+        return (f"模型缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                f"淘汰 {stats['evictions']} 次, 占用 {stats['memory_mb']:.0f}MB")
+
+
+_model_cache = None
+_model_cache_lock = threading.Lock()
+
+
+def get_model_cache():
+    """获取进程级共享的模型缓存"""
+    global _model_cache
+    with _model_cache_lock:
+        if _model_cache is None:
+            _model_cache = ModelCache()
+        return _model_cache
@@ -0,0 +1,454 @@
+import os
+import time
+from contextlib import ExitStack
+
+from core.audio import (SAMPLE_RATE, AudioStream, decode_audio, format_decode_stats,
+                        probe_duration, should_stream_decode)
+from core.backends import create_backend
+from core.batching import BATCH_SIZE, create_decoder, transcribe_batched
+from core.cascade import format_cascade_stats, transcribe_cascade
+from core.checkpoint import CHECKPOINT_MIN_SECONDS, CheckpointJournal, journal_key
+from core.engine import plan_workers, transcribe_chunked
+from core.model_cache import default_device, get_model_cache
+from core.presets import DEFAULT_PRESET, PRESETS, default_preset, preset_decode_options
+from core.result_cache import ResultCache, get_result_cache, hash_audio
+from core.streaming import WINDOW_SECONDS, iter_segments
+from core.subtitles import format_srt_block, render
+from core.telemetry import Tracer
+from core.vad import apply_vad, format_vad_stats
+
+# 支持的视频格式
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# 与预设无关的识别参数
+BASE_DECODE_OPTIONS = dict(
+    language="zh",  # 指定中文
+    task="transcribe",  # 转录任务
+    initial_prompt="这是一段中文音频。",  # 提示模型使用中文
+)
+# 默认识别参数（balanced预设）
+DEFAULT_DECODE_OPTIONS = preset_decode_options(DEFAULT_PRESET, BASE_DECODE_OPTIONS)
+
+
+def partial_path_for(video_path, workspace=None):
+    """流式识别过程中字幕的临时文件路径"""
+    if workspace:
+        return os.path.join(workspace, os.path.splitext(os.path.basename(video_path))[0] + ".srt.partial")
+    return os.path.splitext(video_path)[0] + ".srt.partial"
+
+
+class JobCancelled(Exception):
+    """任务被用户取消"""
+
+
+class ExtractedAudio:
+    """音频提取阶段的产物
+
+    流式解码时audio为None，音频在识别时才边解码边读取。
+    """
+
+    def __init__(self, video_path, audio, duration, speech_map=None, vad_stats=None, audio_hash=None):
+        self.video_path = video_path
+        self.audio = audio
+        self.duration = duration
+        self.speech_map = speech_map
+        self.vad_stats = vad_stats
+        self.audio_hash = audio_hash
+
+
+class SubtitlePipeline:
+    """与界面无关的字幕提取流程：音频提取 -> 语音识别 -> 生成SRT
+
+    界面的任务调度器和批处理命令共用此流程，不依赖PyQt5。
+    各阶段可以单独调用，便于批处理时把下一个文件的音频提取与当前文件的识别重叠执行。
+    """
+
+    def __init__(self, model_size="medium", use_vad=False, decode_options=None, on_progress=None,
+                 use_cache=True, on_segment=None, on_percent=None, should_cancel=None,
+                 workspace=None, replica=0, parallel=True, backend="whisper",
+                 intra_op_threads=None, inter_op_threads=None, tracer=None, stream_decode=None,
+                 checkpoint=None, draft_model=None, preset=None):
+        self.model_size = model_size
+        # 级联识别的草稿模型：设置后先用它识别全部音频，只有低置信度的区间由 model_size 重新识别
+        self.draft_model = draft_model if draft_model != model_size else None
+        # 最近一次级联识别的统计（重新识别的比例、估计加速比）
+        self.cascade_stats = None
+        self.use_vad = use_vad
+        self.result_cache = get_result_cache() if use_cache else None
+        # 识别参数预设（fast/balanced/accurate），未指定时使用该模型的默认预设；显式传入的decode_options优先
+        self.preset = preset or default_preset(model_size)
+        self.decode_options = dict(decode_options or preset_decode_options(self.preset, BASE_DECODE_OPTIONS))
+        self.verbose = PRESETS[self.preset]["verbose"]
+        self.on_progress = on_progress or (lambda message: None)
+        # 设置了on_segment时启用流式识别：每识别完一个窗口就产出片段
+        self.on_segment = on_segment
+        self.on_percent = on_percent or (lambda percent: None)
+        self.should_cancel = should_cancel or (lambda: False)
+        # 任务独立的临时目录，设置后 .srt.partial 写在其中
+        self.workspace = workspace
+        # 使用的模型副本编号，并发识别时每个槽位各用一个副本
+        self.replica = replica
+        # 是否允许对长视频启用多进程并行识别
+        self.parallel = parallel
+        # 推理后端及其线程设置
+        self.backend = backend
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        # 各阶段的计时、计数器和内存采样
+        self.tracer = tracer or Tracer()
+        # 是否边解码边识别：None时按音频大小自动选择，VAD和级联识别需要完整的音频，启用时总是一次性解码
+        self.stream_decode = stream_decode
+        # 是否记录检查点：None时逐窗口识别的文件总是记录，其他文件超过CHECKPOINT_MIN_SECONDS时改为逐窗口识别并记录
+        self.checkpoint = checkpoint
+
+    def check_cancelled(self):
+        if self.should_cancel():
+            raise JobCancelled("任务已取消")
+
+    def extract(self, video_path):
+        """提取音频，并按需执行VAD"""
+        video = os.path.basename(video_path)
+        if self.stream_decode is not False and not self.use_vad and not self.draft_model:
+            duration = probe_duration(video_path)
+            if self.stream_decode or should_stream_decode(duration):
+                # 长录音不一次性解码，识别时按窗口从ffmpeg读取，内存占用与时长无关；
+                # 识别前无法计算音频哈希，因此不使用结果缓存
+                self.on_progress(f"视频总长度: {int(duration or 0)}秒，识别时流式解码音频")
+                self.tracer.count("audio_seconds", duration or 0, video=video)
+                return ExtractedAudio(video_path, None, duration or 0)
+
+        self.on_progress("正在提取音频...")
+        with self.tracer.span("extract", video=video):
+            # 直接解码为16kHz PCM数组，不再写临时mp3
+            audio, decode_stats = decode_audio(video_path)
+            # 在VAD之前计算哈希，使缓存键只取决于原始音频内容
+            audio_hash = hash_audio(audio) if self.result_cache else None
+        duration = decode_stats["duration"]
+        self.tracer.count("audio_seconds", duration, video=video)
+        self.on_progress(f"视频总长度: {int(duration)}秒")
+        print(format_decode_stats(decode_stats))
+
+        speech_map = vad_stats = None
+        if self.use_vad:
+            # 跳过静音和音乐片段，只把语音区间交给模型
+            self.on_progress("正在检测语音区间...")
+            with self.tracer.span("vad", video=video):
+                audio, speech_map, vad_stats = apply_vad(audio)
+            self.on_progress(format_vad_stats(vad_stats))
+        return ExtractedAudio(video_path, audio, duration, speech_map, vad_stats, audio_hash)
+
+    def cache_key(self, extracted, batched=False):
+        """结果缓存的键；批量识别不做温度回退也不以上文为提示词，结果与逐个识别不同，单独缓存"""
+        extra = {"vad": extracted.speech_map is not None, "backend": self.backend}
+        if self.draft_model:
+            extra["draft"] = self.draft_model
+        if batched:
+            extra["batched"] = True
+        return ResultCache.make_key(extracted.audio_hash, self.model_size, self.decode_options, extra=extra)
+
+    def lookup_cache(self, extracted, batched=False):
+        """在加载模型之前查询结果缓存，未命中时返回None"""
+        if not (self.result_cache and extracted.audio_hash):
+            return None
+        cache_start = time.perf_counter()
+        with self.tracer.span("cache_lookup", video=os.path.basename(extracted.video_path)) as span:
+            result = self.result_cache.get(self.cache_key(extracted, batched))
+            span["hit"] = result is not None
+        if result is not None:
+            self.on_progress(f"命中识别结果缓存，耗时 {(time.perf_counter() - cache_start) * 1000:.0f}毫秒")
+        return result
+
+    def store_result(self, extracted, result, batched=False):
+        """记录计数器并写入结果缓存"""
+        self.count_result(result, os.path.basename(extracted.video_path))
+        if self.result_cache and extracted.audio_hash:
+            self.result_cache.put(self.cache_key(extracted, batched), result)
+
+    def transcribe(self, extracted):
+        """识别音频，返回与 model.transcribe 结构相同的结果"""
+        result = self.lookup_cache(extracted)
+        if result is not None:
+            self.emit_segments(result["segments"])
+            return result
+
+        with self.tracer.span("transcribe", video=os.path.basename(extracted.video_path)) as span:
+            result = self._transcribe_uncached(extracted, span)
+        self.store_result(extracted, result)
+        return result
+
+    def transcribe_batch(self, extracted_list, batch_size=BATCH_SIZE):
+        """批量识别多个文件，返回与输入顺序一致的结果列表
+
+        缓存未命中且音频已在内存中的文件，其窗口（每个不超过30秒）合并为批次送入模型，
+        一次编码器前向同时处理多个文件或同一文件的多个窗口；流式解码的文件仍逐个识别。
+        批量识别的窗口相互独立，不做温度回退，也不以上一个窗口的文字为提示词，
+        结果可能与逐个识别不同，缓存时与逐个识别的结果分开保存。
+        """
+        results = [None] * len(extracted_list)
+        pending = []
+        for index, extracted in enumerate(extracted_list):
+            # 流式解码的文件和级联识别逐个文件识别
+            if extracted.audio is None or self.draft_model:
+                results[index] = self.transcribe(extracted)
+                continue
+            results[index] = self.lookup_cache(extracted, batched=True)
+            if results[index] is None:
+                pending.append(index)
+        if not pending:
+            return results
+
+        model = self.load_model()
+        decoder = create_decoder(model, self.decode_options)
+        audio_seconds = sum(len(extracted_list[index].audio) for index in pending) / SAMPLE_RATE
+        self.on_progress(f"开始批量识别 {len(pending)} 个文件 (音频 {audio_seconds:.0f}秒，每批 {batch_size} 个窗口)...")
+
+        def on_done(index, result):
+            extracted = extracted_list[index]
+            if extracted.speech_map is not None:
+                extracted.speech_map.remap_result(result)
+            self.store_result(extracted, result, batched=True)
+            results[index] = result
+
+        def on_batch(done, total):
+            self.on_progress(f"正在批量识别: 已完成 {done}/{total} 个音频窗口")
+            self.on_percent(int(done / total * 100))
+
+        with self.tracer.span("transcribe", mode="batched" if decoder.batched else "sequential_windows",
+                              files=len(pending), batch_size=batch_size) as span:
+            start = time.perf_counter()
+            transcribe_batched(decoder, [(index, extracted_list[index].audio) for index in pending],
+                               batch_size, on_done=on_done, on_batch=on_batch,
+                               check_cancelled=self.check_cancelled)
+            elapsed = time.perf_counter() - start
+            span["audio_seconds"] = audio_seconds
+        self.on_progress(f"批量识别完成，吞吐量 {audio_seconds / elapsed:.1f} 音频秒/秒")
+        return results
+
+    def count_result(self, result, video):
+        """记录识别产出的片段数和解码的token数"""
+        segments = result["segments"]
+        self.tracer.count("segments", len(segments), video=video)
+        self.tracer.count("tokens", sum(len(segment.get("tokens", ())) for segment in segments), video=video)
+
+    def _transcribe_uncached(self, extracted, span):
+        audio = extracted.audio
+        transcribe_start = time.perf_counter()
+        if audio is None:
+            span["mode"] = "stream_decode"
+            return self.transcribe_streaming(extracted)
+        if self.draft_model:
+            result = self.transcribe_cascade(audio, span)
+            if extracted.speech_map is not None:
+                extracted.speech_map.remap_result(result)
+            self.emit_segments(result["segments"])
+            return result
+        workers = plan_workers(len(audio) / SAMPLE_RATE, self.model_size, default_device()) if self.parallel else 1
+        if workers > 1:
+            # 长视频：切分为重叠窗口，多个模型副本并行识别
+            self.on_progress(f"开始并行识别音频 ({workers}个模型副本)...")
+            span.update(mode="chunked", workers=workers)
+            result = transcribe_chunked(
+                audio, self.model_size, self.decode_options, workers,
+                backend_name=self.backend, on_progress=self._on_chunk_done
+            )
+            if extracted.speech_map is not None:
+                extracted.speech_map.remap_result(result)
+            self.emit_segments(result["segments"])
+        elif self.on_segment or self.wants_checkpoint(extracted):
+            # 流式识别中片段在产出时已映射回原始时间轴
+            span["mode"] = "streaming"
+            result = self.transcribe_streaming(extracted)
+        else:
+            span["mode"] = "sequential"
+            result = self.transcribe_sequential(audio)
+            if extracted.speech_map is not None:
+                extracted.speech_map.remap_result(result)
+
+        if extracted.speech_map is not None:
+            print(format_vad_stats(extracted.vad_stats, time.perf_counter() - transcribe_start))
+        return result
+
+    def _on_chunk_done(self, done, total):
+        self.on_progress(f"正在识别: 已完成 {done}/{total} 个音频窗口")
+        self.on_percent(int(done / total * 100))
+
+    def emit_segments(self, segments):
+        """一次性产出已完成的片段（缓存命中或并行识别时）"""
+        if self.on_segment:
+            for segment in segments:
+                self.on_segment(segment)
+        self.on_percent(100)
+
+    def load_model(self, model_size=None):
+        """通过推理后端从进程级缓存获取模型，默认为 self.model_size"""
+        model_size = model_size or self.model_size
+        self.on_progress(f"正在加载{model_size}模型 ({self.backend})...")
+        backend = create_backend(self.backend, model_size, replica=self.replica,
+                                 intra_op_threads=self.intra_op_threads,
+                                 inter_op_threads=self.inter_op_threads)
+        model_cache = get_model_cache()
+        cached = backend.is_loaded()
+        load_start = time.perf_counter()
+        with self.tracer.span("model_load", model=model_size, backend=self.backend, cached=cached):
+            model = backend.load()
+        if cached:
+            self.on_progress(f"已从缓存获取{model_size}模型")
+        else:
+            self.on_progress(f"{model_size}模型加载完成，耗时 {time.perf_counter() - load_start:.1f}秒")
+        print(model_cache.format_stats())
+        return model
+
+    def transcribe_cascade(self, audio, span):
+        """级联识别：草稿模型识别全部音频，低置信度区间由 model_size 重新识别，报告重新识别的比例和估计加速比"""
+        span["mode"] = "cascade"
+        result, stats = transcribe_cascade(self.load_model(self.draft_model), self.load_model, audio,
+                                           self.decode_options, on_progress=self.on_progress,
+                                           check_cancelled=self.check_cancelled)
+        span.update(draft_model=self.draft_model, redecoded_fraction=stats["fraction"],
+                    estimated_speedup=stats["speedup"])
+        self.tracer.count("redecoded_audio_seconds", stats["redecoded_audio_seconds"])
+        self.cascade_stats = stats
+        message = format_cascade_stats(stats, self.draft_model, self.model_size)
+        print(message)
+        self.on_progress(message)
+        return result
+
+    def transcribe_sequential(self, audio):
+        model = self.load_model()
+        # 识别音频
+        self.on_progress("开始识别音频...")
+        return model.transcribe(
+            audio,
+            verbose=self.verbose,  # 由预设决定是否输出进度或逐条打印片段
+            **self.decode_options
+        )
+
+    def wants_checkpoint(self, extracted):
+        """不需要逐窗口产出片段的文件是否因时长较长而改为逐窗口识别，以便记录检查点"""
+        if self.checkpoint is None:
+            return extracted.duration >= CHECKPOINT_MIN_SECONDS
+        return bool(self.checkpoint)
+
+    def open_journal(self, extracted):
+        """逐窗口识别使用的检查点日志，不记录检查点时返回None"""
+        if self.checkpoint is False:
+            return None
+        try:
+            key = journal_key(extracted.video_path, self.model_size, self.decode_options,
+                              extra={"vad": extracted.speech_map is not None, "backend": self.backend})
+        except OSError:
+            return None
+        return CheckpointJournal(key)
+
+    def transcribe_streaming(self, extracted):
+        """逐窗口识别，片段同时通过on_segment产出并追加写入 .srt.partial 文件
+
+        每识别完一个窗口就把该窗口的片段、下一个窗口的起点和提示词写入检查点日志；
+        存在同一文件和参数的日志时从最后一个完成的窗口继续，之前的片段直接从日志中恢复。
+        """
+        model = self.load_model()
+        audio = extracted.audio
+        speech_map = extracted.speech_map
+        total_seconds = extracted.duration
+        segments = []
+        window_segments = []
+        partial_path = self.partial_path(extracted.video_path)
+        journal = self.open_journal(extracted)
+        resumed = journal.load() if journal else None
+        start_sample, prompt = 0, None
+        if resumed:
+            segments, start_sample, prompt = resumed
+            self.tracer.count("resumed_seconds", start_sample / SAMPLE_RATE,
+                              video=os.path.basename(extracted.video_path))
+            self.on_progress(f"从检查点继续识别: 已完成 {len(segments)} 个片段，"
+                             f"从第 {start_sample / SAMPLE_RATE:.0f} 秒继续")
+        else:
+            self.on_progress("开始识别音频...")
+
+        video = os.path.basename(extracted.video_path)
+
+        def on_window(next_seek, next_prompt):
+            if journal:
+                journal.commit(next_seek, next_prompt, window_segments)
+            window_segments.clear()
+            # 每个窗口结束时采样内存，长录音识别过程中的内存变化也能在追踪记录中看到
+            self.tracer.sample_memory("window", video=video, seek_seconds=next_seek / SAMPLE_RATE)
+
+        with ExitStack() as stack:
+            if audio is None:
+                audio = stack.enter_context(AudioStream(extracted.video_path, WINDOW_SECONDS))
+            partial = stack.enter_context(open(partial_path, 'w', encoding='utf-8'))
+            if journal:
+                journal.open(resume=bool(resumed), video_path=extracted.video_path)
+                stack.callback(journal.close)
+            for index, segment in enumerate(segments, 1):
+                partial.write(format_srt_block(index, segment))
+                if self.on_segment:
+                    self.on_segment(segment)
+            partial.flush()
+            for segment, processed in iter_segments(model, audio, self.decode_options,
+                                                    start_sample=start_sample, prompt=prompt,
+                                                    on_window=on_window):
+                self.check_cancelled()
+                if segment is not None:
+                    if speech_map is not None:
+                        speech_map.remap_segment(segment)
+                    segment["id"] = len(segments)
+                    segments.append(segment)
+                    window_segments.append(segment)
+                    partial.write(format_srt_block(len(segments), segment))
+                    partial.flush()
+                    if self.on_segment:
+                        self.on_segment(segment)
+                # 按已处理的音频时长计算进度
+                if speech_map is not None:
+                    done_seconds = speech_map.to_original(processed / SAMPLE_RATE)
+                else:
+                    done_seconds = processed / SAMPLE_RATE
+                if total_seconds:
+                    done_seconds = min(done_seconds, total_seconds)
+                    self.on_percent(int(done_seconds / total_seconds * 100))
+                    self.on_progress(f"正在识别: {done_seconds:.0f}/{total_seconds:.0f}秒")
+                else:
+                    # 流式解码且未能读取时长时只显示已识别的时长
+                    self.on_progress(f"正在识别: {done_seconds:.0f}秒")
+        if journal:
+            journal.remove()
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": self.decode_options.get("language"),
+        }
+
+    def format_subtitles(self, result, fmt="srt"):
+        """把识别结果格式化为字幕（srt/vtt/json/tsv）"""
+        self.on_progress(f"正在生成{fmt.upper()}格式字幕...")
+        with self.tracer.span("format", format=fmt, segments=len(result["segments"])):
+            content = render(result["segments"], fmt, on_progress=self._on_format_progress)
+        print(f"已生成 {len(result['segments'])} 条字幕")
+        return content
+
+    def _on_format_progress(self, percent, done, total):
+        self.on_progress(f"正在生成字幕: {percent}% (片段 {done}/{total})")
+
+    def format_srt(self, result):
+        """把识别结果格式化为SRT字幕"""
+        return self.format_subtitles(result, "srt")
+
+    def run(self, video_path):
+        """顺序执行完整流程，返回SRT字幕内容"""
+        extracted = self.extract(video_path)
+        result = self.transcribe(extracted)
+        srt_content = self.format_srt(result)
+        self.remove_partial(video_path)
+        self.on_progress("识别完成！")
+        return srt_content
+
+    def partial_path(self, video_path):
+        return partial_path_for(video_path, self.workspace)
+
+    def remove_partial(self, video_path):
+        """识别完成后删除 .srt.partial 临时文件"""
+        partial_path = self.partial_path(video_path)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
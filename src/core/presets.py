@@ -0,0 +1,99 @@
+import os
+import json
+import platform
+
+# 自动调优选出的各模型默认预设，可通过环境变量调整
+PRESETS_FILE = os.environ.get(
+    'VIDEOTOTXT_PRESETS_FILE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'videototxt', 'presets.json'))
+PRESETS_VERSION = 1
+
+# 识别参数预设：options 与 initial_prompt 等基础参数合并后传给 model.transcribe，
+# verbose 控制whisper的输出（None不输出，False显示进度条，True逐条打印片段）
+PRESETS = {
+    # 贪心解码，不做温度回退，不以上文为条件（也避免重复文字导致的反复回退）
+    "fast": {
+        "label": "快速",
+        "options": {"temperature": 0.0, "condition_on_previous_text": False},
+        "verbose": None,
+    },
+    # whisper的默认温度回退链和上文条件，回退时采样5个候选，与此前固定使用的参数相同
+    "balanced": {
+        "label": "均衡",
+        "options": {"best_of": 5},
+        "verbose": None,
+    },
+    # 温度为0时使用束搜索，其余同balanced
+    "accurate": {
+        "label": "准确",
+        "options": {"beam_size": 5, "best_of": 5},
+        "verbose": False,
+    },
+}
+PRESET_NAMES = tuple(PRESETS)
+# 没有调优结果时各模型使用的预设
+DEFAULT_PRESET = "balanced"
+
+
+def preset_decode_options(name, base_options):
+    """基础参数加上预设的识别参数"""
+    options = dict(base_options)
+    options.update(PRESETS[name]["options"])
+    return options
+
+
+def hardware_info():
+    """调优结果只对测量时的硬件有效，记录处理器信息以便识别"""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "system": platform.system(),
+    }
+
+
+def load_tuned(path=PRESETS_FILE):
+    """读取调优结果，文件不存在、已损坏或来自其他硬件时返回None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            tuned = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"警告: 无法读取预设调优结果 {path}: {e}")
+        return None
+    if tuned.get("version") != PRESETS_VERSION or tuned.get("hardware") != hardware_info():
+        return None
+    return tuned
+
+
+def save_tuned(defaults, measurements, path=PRESETS_FILE):
+    """保存各模型的默认预设，保留本次未调优的模型之前的结果"""
+    tuned = load_tuned(path) or {}
+    merged = dict(tuned.get("defaults", {}))
+    merged.update(defaults)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": PRESETS_VERSION, "hardware": hardware_info(), "defaults": merged,
+                   "measurements": measurements}, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+_tuned_defaults = {}
+_tuned_mtime = None
+
+
+def default_preset(model_size):
+    """模型的默认预设：优先使用本机的调优结果，文件更新后（如常驻服务运行期间重新调优）重新读取"""
+    global _tuned_defaults, _tuned_mtime
+    try:
+        mtime = os.stat(PRESETS_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != _tuned_mtime:
+        tuned = load_tuned() if mtime is not None else None
+        _tuned_defaults = tuned["defaults"] if tuned else {}
+        _tuned_mtime = mtime
+    name = _tuned_defaults.get(model_size)
+    return name if name in PRESETS else DEFAULT_PRESET
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+
+from core.daemon import read_token
+from core.scheduler import QUEUED, TRANSCRIBING, FAILED, CANCELLED, FINAL_STATUSES
+from core.subtitles import render
+from core.telemetry import Tracer
+
+# 设置为常驻识别服务的地址（如 127.0.0.1:8765）后，界面把任务交给该服务
+DAEMON_ENV = 'VIDEOTOTXT_DAEMON'
+# 普通请求的超时（秒）；事件流有心跳，读取超时需大于服务端的心跳间隔
+REQUEST_TIMEOUT = 10
+STREAM_TIMEOUT = 60
+
+
+class DaemonError(Exception):
+    """与常驻识别服务通信失败"""
+
+
+class RemoteJob:
+    """常驻服务中任务的本地镜像，属性与 scheduler.Job 相同，由事件流更新；时间戳为客户端收到事件的时间"""
+
+    def __init__(self, info):
+        self.id = info["id"]
+        self.video_path = info["video_path"]
+        self.model_size = info["model_size"]
+        self.use_vad = info["use_vad"]
+        self.backend = info["backend"]
+        self.draft_model = info.get("draft_model")
+        self.preset = info.get("preset")
+        self.status = info["status"]
+        self.percent = info["percent"]
+        self.message = info["message"]
+        self.error = info["error"]
+        self.segments = []
+        self.result = None
+        self.submitted_at = info["submitted_at"]
+        self.started_at = None
+        self.first_segment_at = None
+        self.finished_at = None
+        self.tracer = Tracer(sinks=[], job=self.id)
+        self.finished = threading.Event()
+
+    @property
+    def name(self):
+        return os.path.basename(self.video_path)
+
+    def subtitles(self, fmt="srt"):
+        return render(self.segments, fmt)
+
+
+class RemoteScheduler:
+    """把任务交给常驻识别服务，接口与 JobScheduler 相同
+
+    每个任务由一个后台线程读取服务端的事件流，更新 RemoteJob 后调用 on_event(job, event, payload)，
+    回调在后台线程中执行。连接中断时从已收到的事件序号处重新连接。
+    未指定token时每次请求读取服务启动时写入的令牌文件，服务重启后无需重新创建。
+    """
+
+    def __init__(self, address, on_event=None, token=None):
+        self.base_url = address if "://" in address else f"http://{address}"
+        self.on_event = on_event or (lambda job, event, payload: None)
+        self.token = token
+        self.jobs = {}
+        self._closed = threading.Event()
+
+    @staticmethod
+    def is_available(address, timeout=0.5):
+        """检查服务是否在运行"""
+        try:
+            RemoteScheduler(address).request("GET", "/health", timeout=timeout)
+            return True
+        except DaemonError:
+            return False
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        token = self.token or read_token()
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def request(self, method, path, data=None, timeout=REQUEST_TIMEOUT):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8") if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=self.headers())
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error")
+            except ValueError:
+                message = None
+            raise DaemonError(message or f"HTTP {e.code}")
+        except (OSError, ValueError) as e:
+            raise DaemonError(f"无法连接识别服务 {self.base_url}: {e}")
+
+    def submit(self, video_path, model_size="medium", use_vad=False, backend="whisper", draft_model=None,
+               preset=None):
+        """提交任务，返回RemoteJob；视频路径须能被服务进程访问"""
+        info = self.request("POST", "/jobs", {"video_path": os.path.abspath(video_path),
+                                              "model_size": model_size, "use_vad": use_vad,
+                                              "backend": backend, "draft_model": draft_model,
+                                              "preset": preset})
+        job = RemoteJob(info)
+        self.jobs[job.id] = job
+        self._dispatch(job, "status", QUEUED)
+        threading.Thread(target=self._follow, args=(job,), name=f"daemon-job-{job.id}", daemon=True).start()
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and job.status not in FINAL_STATUSES:
+            try:
+                self.request("DELETE", f"/jobs/{job_id}")
+            except DaemonError as e:
+                print(f"取消任务失败: {e}")
+
+    def prewarm(self, model_size, backend="whisper"):
+        """让服务在后台预加载模型"""
+        try:
+            return self.request("POST", "/prewarm", {"model_size": model_size, "backend": backend})["started"]
+        except DaemonError as e:
+            print(f"预加载模型失败: {e}")
+            return False
+
+    def metrics(self):
+        return self.request("GET", "/metrics")
+
+    def shutdown(self):
+        """取消本客户端提交的未完成任务并停止读取事件流"""
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self._closed.set()
+
+    def _follow(self, job):
+        try:
+            self._read_events(job)
+        finally:
+            if job.status not in FINAL_STATUSES:
+                job.status = CANCELLED
+            job.finished.set()
+
+    def _read_events(self, job):
+        received = 0
+        retries = 0
+        while not self._closed.is_set() and job.status not in FINAL_STATUSES:
+            try:
+                request = urllib.request.Request(f"{self.base_url}/jobs/{job.id}/events?since={received}",
+                                                 headers=self.headers())
+                with urllib.request.urlopen(request, timeout=STREAM_TIMEOUT) as response:
+                    for line in response:
+                        if self._closed.is_set():
+                            return
+                        record = json.loads(line)
+                        if record["event"] == "heartbeat":
+                            continue
+                        received += 1
+                        retries = 0
+                        self._apply(job, record)
+            except (OSError, ValueError) as e:
+                retries += 1
+                if retries > 3:
+                    job.error = f"与识别服务的连接中断: {e}"
+                    self._dispatch(job, "status", FAILED)
+                    return
+                self._closed.wait(retries)
+
+    def _apply(self, job, record):
+        event, payload = record["event"], record["payload"]
+        if event == "progress":
+            job.message = payload
+        elif event == "percent":
+            job.percent = payload
+        elif event == "segment":
+            index, segment = payload
+            job.segments.append(segment)
+            payload = (index, segment)
+        elif event == "trace":
+            job.tracer.ingest(payload)
+        elif event == "status" and payload in FINAL_STATUSES:
+            job.error = record.get("error")
+        self._dispatch(job, event, payload)
+
+    def _dispatch(self, job, event, payload):
+        if event == "status":
+            if job.status in FINAL_STATUSES:
+                return
+            job.status = payload
+            if payload == TRANSCRIBING:
+                job.started_at = time.time()
+            elif payload in FINAL_STATUSES:
+                job.finished_at = time.time()
+        elif event == "segment" and job.first_segment_at is None:
+            job.first_segment_at = time.time()
+        try:
+            self.on_event(job, event, payload)
+        except Exception as e:
+            print(f"任务事件回调出错: {e}")
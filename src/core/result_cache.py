@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+import threading
+
+# 结果缓存目录和容量上限，可通过环境变量调整
+DEFAULT_CACHE_DIR = os.environ.get(
+    'VIDEOTOTXT_RESULT_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'videototxt', 'results'))
+DEFAULT_CACHE_LIMIT_MB = int(os.environ.get('VIDEOTOTXT_RESULT_CACHE_MB', '200'))
+
+# 缓存中保留的片段字段
+SEGMENT_FIELDS = ("id", "start", "end", "text", "avg_logprob", "compression_ratio", "no_speech_prob")
+
+
+def hash_audio(pcm):
+    """计算解码后PCM数据的内容哈希"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(memoryview(pcm).cast('B'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """以内容寻址的识别结果缓存
+
+    键由PCM内容哈希和识别参数组成，每个条目是一个JSON Lines文件：
+    第一行为元信息，其后每行一个片段。读取条目时刷新文件修改时间，
+    写入新条目后按修改时间淘汰最久未使用的条目，使总大小不超过上限。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, limit_mb=DEFAULT_CACHE_LIMIT_MB):
+        self.cache_dir = cache_dir
+        self.limit = limit_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(audio_hash, model_size, decode_options, extra=None):
+        """由音频哈希和影响识别结果的参数生成缓存键
+
+        包含全部识别参数（束搜索、温度回退、是否以上文为条件等），不同预设的结果不会互相命中。
+        """
+        params = {
+            "audio": audio_hash,
+            "model": model_size,
+            "options": decode_options,
+            "extra": extra,
+        }
+        encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".jsonl")
+
+    def get(self, key):
+        """读取缓存的识别结果，未命中时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                segments = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"警告: 结果缓存条目已损坏，已删除: {e}")
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # 刷新LRU顺序
+        except OSError:
+            pass
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": header.get("language"),
+        }
+
+    def put(self, key, result):
+        """写入识别结果，并按容量上限淘汰旧条目"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"language": result.get("language")}, ensure_ascii=False) + "\n")
+            for segment in result["segments"]:
+                compact = {field: segment[field] for field in SEGMENT_FIELDS if field in segment}
+                f.write(json.dumps(compact, ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """淘汰最久未使用的条目，直到总大小不超过上限"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, dirs, files in os.walk(self.cache_dir):
+                for file in files:
+                    if not file.endswith(".jsonl"):
+                        continue
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.limit:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_result_cache = None
+
+
+def get_result_cache():
+    """获取进程级共享的结果缓存"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,434 @@
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import itertools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from core.checkpoint import CHECKPOINT_MIN_SECONDS
+from core.engine import MODEL_MEMORY_MB, default_memory_cap_mb
+from core.model_cache import DEFAULT_MEMORY_BUDGET_MB, MEMORY_BUDGET_CONFIGURED, default_device, get_model_cache
+from core.pipeline import JobCancelled, SubtitlePipeline
+from core.subtitles import render
+from core.telemetry import ListenerSink, Tracer, default_sinks
+
+# 任务状态
+QUEUED = "queued"
+EXTRACTING = "extracting"
+WAITING = "waiting"
+TRANSCRIBING = "transcribing"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+STATUS_LABELS = {
+    QUEUED: "排队中",
+    EXTRACTING: "提取音频",
+    WAITING: "等待识别",
+    TRANSCRIBING: "识别中",
+    DONE: "已完成",
+    FAILED: "失败",
+    CANCELLED: "已取消",
+}
+
+# 音频提取为I/O密集型，允许同时提取的文件数
+EXTRACT_WORKERS = 2
+# 每个识别槽位期望占用的CPU线程数
+THREADS_PER_SLOT = 4
+# 合并识别时，槽位空闲后等待仍在提取音频的任务加入同一批次的最长时间（秒）
+BATCH_WAIT_SECONDS = 0.2
+# 统计延迟分位数时使用的最近完成任务数
+LATENCY_WINDOW = 200
+
+
+def model_memory_mb(model_size):
+    return MODEL_MEMORY_MB.get(model_size, MODEL_MEMORY_MB["large"])
+
+
+def default_transcribe_slots(model_size):
+    """根据CPU核数和内存计算可同时进行的识别任务数
+
+    每个槽位在模型缓存中有自己的副本；用户指定了模型缓存预算时，槽位数不超过预算能容纳的副本数，
+    否则副本会互相淘汰，每个任务都要重新加载模型。
+    """
+    if default_device() != "cpu":
+        return 1
+    by_cpu = max(1, (os.cpu_count() or 1) // THREADS_PER_SLOT)
+    by_memory = max(1, default_memory_cap_mb() // model_memory_mb(model_size))
+    slots = min(by_cpu, by_memory)
+    if MEMORY_BUDGET_CONFIGURED:
+        slots = min(slots, max(1, DEFAULT_MEMORY_BUDGET_MB // model_memory_mb(model_size)))
+    return slots
+
+
+def latency_stats(values):
+    """一组延迟（秒）的数量、平均值、中位数和95分位数"""
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": values[int((len(values) - 1) * 0.5)],
+        "p95": values[int((len(values) - 1) * 0.95)],
+    }
+
+
+class Job:
+    """调度器中的一个字幕提取任务"""
+
+    def __init__(self, job_id, video_path, model_size, use_vad, backend="whisper", draft_model=None,
+                 preset=None):
+        self.id = job_id
+        self.video_path = video_path
+        self.model_size = model_size
+        self.use_vad = use_vad
+        self.backend = backend
+        self.draft_model = draft_model
+        self.preset = preset
+        self.status = QUEUED
+        self.percent = 0
+        self.message = ""
+        self.segments = []
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.tracer = None
+        # 提交、开始识别、产出第一个片段和结束的时间，用于统计排队和响应延迟
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.first_segment_at = None
+        self.finished_at = None
+        # 每个任务使用独立的临时目录
+        self.workspace = tempfile.mkdtemp(prefix="videototxt_job_")
+
+    @property
+    def name(self):
+        return os.path.basename(self.video_path)
+
+    def subtitles(self, fmt="srt"):
+        """渲染已识别的字幕"""
+        segments = self.result["segments"] if self.result else self.segments
+        return render(segments, fmt)
+
+
+class JobScheduler:
+    """并发任务调度器
+
+    音频提取在线程池中并发执行；识别受槽位数限制，每个槽位使用独立的模型副本。
+    已提取但尚未开始识别的音频数量有上限，避免大量解码后的音频堆积在内存中。
+    所有状态变化通过 on_event(job, event, payload) 回调通知，回调在工作线程中执行。
+    event 为 status/progress/percent/segment/trace，segment 的 payload 为 (序号, 片段)，
+    trace 的 payload 为任务追踪器产生的记录（阶段耗时、计数器、内存采样）。
+
+    batch_size 大于1时合并识别：槽位空闲后，把等待识别的多个短音频任务（同一模型和后端）
+    交给 SubtitlePipeline.transcribe_batch 一起识别，多个文件的窗口装入同一批次。
+    合并识别的任务在整批完成后才产出片段，因此界面默认逐个识别，常驻服务中启用。
+    """
+
+    def __init__(self, on_event=None, transcribe_slots=None, extract_workers=EXTRACT_WORKERS,
+                 batch_size=1, batch_wait=BATCH_WAIT_SECONDS):
+        self.on_event = on_event or (lambda job, event, payload: None)
+        self.transcribe_slots = transcribe_slots
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.jobs = {}
+        self.batches = 0  # 合并识别的批次数
+        self.batched_jobs = 0  # 合并识别的任务数
+        self._ids = itertools.count(1)
+        self._extract_pool = ThreadPoolExecutor(max_workers=extract_workers,
+                                                thread_name_prefix="extract")
+        self._transcribe_pool = None
+        self._free_slots = None
+        self._extracted_budget = None
+        self._lock = threading.Lock()
+        self._finish_lock = threading.Lock()
+        # 已提取音频、等待识别的 (任务, 提取结果)，识别线程按顺序取出
+        self._waiting = collections.deque()
+        self._waiting_changed = threading.Condition()
+
+    def ensure_slots(self, model_size, draft_model=None):
+        """创建识别槽位，并使模型缓存能容纳每个槽位的模型副本（级联识别时还有草稿模型）"""
+        with self._lock:
+            if self._transcribe_pool is None:
+                slots = self.transcribe_slots or default_transcribe_slots(model_size)
+                self.transcribe_slots = slots
+                self._transcribe_pool = ThreadPoolExecutor(max_workers=slots,
+                                                           thread_name_prefix="transcribe")
+                self._free_slots = queue.Queue()
+                for slot in range(slots):
+                    self._free_slots.put(slot)
+                # 合并识别时允许同时等待的音频数不少于一个批次的任务数
+                self._extracted_budget = threading.Semaphore(slots + max(1, self.batch_size))
+        if not MEMORY_BUDGET_CONFIGURED:
+            # 预算不足时各槽位的副本互相淘汰，每个任务都要重新加载模型
+            per_slot = model_memory_mb(model_size) + (model_memory_mb(draft_model) if draft_model else 0)
+            get_model_cache().ensure_budget(self.transcribe_slots * per_slot)
+
+    def submit(self, video_path, model_size="medium", use_vad=False, backend="whisper", draft_model=None,
+               preset=None):
+        """提交任务，返回Job；设置draft_model时级联识别，preset为识别参数预设（默认按模型选择）"""
+        self.ensure_slots(model_size, draft_model)
+        job = Job(next(self._ids), video_path, model_size, use_vad, backend, draft_model, preset)
+        job.tracer = Tracer(default_sinks() + [ListenerSink(lambda record: self._emit(job, "trace", record))],
+                            job=job.id)
+        self.jobs[job.id] = job
+        self._emit(job, "status", QUEUED)
+        self._extract_pool.submit(self._run_extract, job)
+        return job
+
+    def prewarm(self, model_size, backend="whisper"):
+        """在后台预加载模型，开始加载时返回True"""
+        from core.backends import create_backend
+        instance = create_backend(backend, model_size)
+        if instance.is_loaded():
+            return False
+        instance.prewarm()
+        return True
+
+    def metrics(self):
+        """队列深度、各状态的任务数、排队和响应延迟以及合并识别的统计"""
+        jobs = list(self.jobs.values())
+        counts = {status: 0 for status in STATUS_LABELS}
+        for job in jobs:
+            counts[job.status] += 1
+        finished = sorted((job for job in jobs if job.status == DONE and job.finished_at),
+                          key=lambda job: job.finished_at)[-LATENCY_WINDOW:]
+        started = [job for job in finished if job.started_at]
+        return {
+            "queue_depth": counts[QUEUED] + counts[EXTRACTING] + counts[WAITING],
+            "running": counts[TRANSCRIBING],
+            "jobs": counts,
+            "slots": self.transcribe_slots,
+            "batch_size": self.batch_size,
+            "latency": {
+                "queue_wait": latency_stats([job.started_at - job.submitted_at for job in started]),
+                "first_segment": latency_stats([job.first_segment_at - job.submitted_at
+                                                for job in finished if job.first_segment_at]),
+                "total": latency_stats([job.finished_at - job.submitted_at for job in finished]),
+            },
+            "batches": {
+                "count": self.batches,
+                "jobs": self.batched_jobs,
+                "mean_size": self.batched_jobs / self.batches if self.batches else None,
+            },
+        }
+
+    def cancel(self, job_id):
+        """取消任务，正在识别的任务会在当前窗口识别完成后停止"""
+        job = self.jobs.get(job_id)
+        if job and job.status not in FINAL_STATUSES:
+            job.cancel_event.set()
+            if job.status in (QUEUED, WAITING):
+                self._finish(job, CANCELLED)
+
+    def shutdown(self):
+        """取消所有任务并停止线程池"""
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self._extract_pool.shutdown(wait=False, cancel_futures=True)
+        if self._transcribe_pool:
+            self._transcribe_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _emit(self, job, event, payload):
+        if event == "status":
+            if job.status in FINAL_STATUSES:
+                return
+            job.status = payload
+            if payload == TRANSCRIBING:
+                job.started_at = time.time()
+        try:
+            self.on_event(job, event, payload)
+        except Exception as e:
+            print(f"任务事件回调出错: {e}")
+
+    def _add_segment(self, job, segment):
+        if job.first_segment_at is None:
+            job.first_segment_at = time.time()
+        job.segments.append(segment)
+        self._emit(job, "segment", (len(job.segments), segment))
+
+    def _make_pipeline(self, job, replica=0):
+        def on_progress(message):
+            job.message = message
+            self._emit(job, "progress", message)
+
+        def on_percent(percent):
+            job.percent = percent
+            self._emit(job, "percent", percent)
+
+        def on_segment(segment):
+            self._add_segment(job, segment)
+
+        return SubtitlePipeline(job.model_size, use_vad=job.use_vad,
+                                on_progress=on_progress, on_percent=on_percent,
+                                on_segment=on_segment,
+                                should_cancel=job.cancel_event.is_set,
+                                workspace=job.workspace, replica=replica,
+                                # 多进程并行识别只在全部完成后产出片段，也无法取消或记录检查点，
+                                # 界面任务总是逐窗口识别，以便实时显示字幕并随时取消
+                                parallel=False, backend=job.backend,
+                                tracer=job.tracer, draft_model=job.draft_model, preset=job.preset)
+
+    def _run_extract(self, job):
+        if job.cancel_event.is_set():
+            return
+        self._extracted_budget.acquire()
+        released = False
+        try:
+            if job.cancel_event.is_set():
+                return
+            self._emit(job, "status", EXTRACTING)
+            extracted = self._make_pipeline(job).extract(job.video_path)
+            if job.cancel_event.is_set():
+                self._finish(job, CANCELLED)
+                return
+            self._emit(job, "status", WAITING)
+            released = True
+            with self._waiting_changed:
+                self._waiting.append((job, extracted))
+                self._waiting_changed.notify_all()
+            self._transcribe_pool.submit(self._run_transcribe)
+        except Exception as e:
+            self._finish(job, FAILED, e)
+        finally:
+            if not released:
+                self._extracted_budget.release()
+
+    def _batchable(self, job, extracted):
+        """音频已在内存中的短文件可以合并识别，长文件逐窗口识别以便产出片段和记录检查点，级联识别逐个文件进行"""
+        return (extracted.audio is not None and extracted.duration < CHECKPOINT_MIN_SECONDS
+                and not job.draft_model)
+
+    def _extracting_count(self):
+        return sum(1 for job in list(self.jobs.values()) if job.status in (QUEUED, EXTRACTING))
+
+    def _take_group(self):
+        """取出下一个等待识别的任务；合并识别时再取出最多 batch_size-1 个可以与之一起识别的任务"""
+        with self._waiting_changed:
+            if not self._waiting:
+                return []
+            group = [self._waiting.popleft()]
+            first_job, first_extracted = group[0]
+            if self.batch_size <= 1 or not self._batchable(first_job, first_extracted):
+                return group
+            deadline = time.monotonic() + self.batch_wait
+            while True:
+                skipped = []
+                while self._waiting and len(group) < self.batch_size:
+                    job, extracted = item = self._waiting.popleft()
+                    if (self._batchable(job, extracted) and job.model_size == first_job.model_size
+                            and job.backend == first_job.backend and job.preset == first_job.preset):
+                        group.append(item)
+                    else:
+                        skipped.append(item)
+                self._waiting.extendleft(reversed(skipped))
+                # 还有任务正在提取音频时稍等片刻，让同时提交的请求进入同一批次
+                remaining = deadline - time.monotonic()
+                if len(group) >= self.batch_size or remaining <= 0 or not self._extracting_count():
+                    return group
+                self._waiting_changed.wait(remaining)
+
+    def _run_transcribe(self):
+        self._extracted_budget.release()
+        slot = self._free_slots.get()
+        try:
+            group = []
+            for job, extracted in self._take_group():
+                if job.cancel_event.is_set():
+                    self._finish(job, CANCELLED)
+                else:
+                    group.append((job, extracted))
+            if len(group) == 1:
+                self._transcribe_one(group[0][0], group[0][1], slot)
+            elif group:
+                self._transcribe_group(group, slot)
+        finally:
+            self._free_slots.put(slot)
+
+    def _transcribe_one(self, job, extracted, slot):
+        try:
+            self._emit(job, "status", TRANSCRIBING)
+            pipeline = self._make_pipeline(job, replica=slot)
+            job.result = pipeline.transcribe(extracted)
+            pipeline.remove_partial(job.video_path)
+            job.percent = 100
+            self._finish(job, DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            import traceback
+            print(f"错误: {job.name}: {e}\n{traceback.format_exc()}")
+            self._finish(job, FAILED, e)
+
+    def _transcribe_group(self, group, slot):
+        """合并识别一组任务，进度和共用阶段的追踪记录转发给组内每个任务，结果分别交回各任务"""
+        jobs = [job for job, _ in group]
+        self.batches += 1
+        self.batched_jobs += len(jobs)
+        for job in jobs:
+            self._emit(job, "status", TRANSCRIBING)
+
+        def on_progress(message):
+            for job in jobs:
+                job.message = message
+                self._emit(job, "progress", message)
+
+        def on_percent(percent):
+            for job in jobs:
+                job.percent = percent
+                self._emit(job, "percent", percent)
+
+        def on_trace(record):
+            for job in jobs:
+                job.tracer.ingest(record)
+
+        first = jobs[0]
+        pipeline = SubtitlePipeline(first.model_size, use_vad=first.use_vad,
+                                    on_progress=on_progress, on_percent=on_percent,
+                                    should_cancel=lambda: all(job.cancel_event.is_set() for job in jobs),
+                                    replica=slot, parallel=False, backend=first.backend,
+                                    tracer=Tracer([ListenerSink(on_trace)]), preset=first.preset)
+        try:
+            results = pipeline.transcribe_batch([extracted for _, extracted in group], self.batch_size)
+        except JobCancelled:
+            for job in jobs:
+                self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            import traceback
+            print(f"错误: 合并识别 {len(jobs)} 个任务: {e}\n{traceback.format_exc()}")
+            for job in jobs:
+                self._finish(job, FAILED, e)
+            return
+        for job, result in zip(jobs, results):
+            if job.cancel_event.is_set():
+                self._finish(job, CANCELLED)
+                continue
+            job.result = result
+            for segment in result["segments"]:
+                self._add_segment(job, segment)
+            job.percent = 100
+            self._finish(job, DONE)
+
+    def _finish(self, job, status, error=None):
+        with self._finish_lock:
+            if job.status in FINAL_STATUSES:
+                return
+            job.status = status
+        job.finished_at = time.time()
+        job.error = str(error) if error else None
+        if status == FAILED and os.listdir(job.workspace):
+            # 失败时保留临时目录，其中的 .srt.partial 包含已识别的字幕
+            print(f"任务 {job.name} 的中间结果保留在: {job.workspace}")
+        else:
+            shutil.rmtree(job.workspace, ignore_errors=True)
+        try:
+            self.on_event(job, "status", status)
+        except Exception as e:
+            print(f"任务事件回调出错: {e}")
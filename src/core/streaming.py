@@ -0,0 +1,62 @@
+from core.audio import SAMPLE_RATE, ArraySource
+
+# 每次送入模型的窗口长度，与Whisper的输入窗口一致
+WINDOW_SECONDS = 30
+# 作为下一个窗口提示词的上文长度（字符）
+PROMPT_CHARS = 200
+
+
+def iter_segments(model, audio, decode_options, window_seconds=WINDOW_SECONDS,
+                  sample_rate=SAMPLE_RATE, start_sample=0, prompt=None, on_window=None):
+    """逐个窗口识别音频，每识别完一个窗口就产出其中的片段
+
+    audio 可以是PCM数组，也可以是边解码边读取的 AudioStream；识别完的音频会被释放，
+    流式解码时内存中只保留当前窗口。产出 (片段, 已处理的音频采样点数)。片段时间戳已换算到全局时间轴；
+    没有识别出片段的窗口产出 (None, 已处理的音频采样点数)，便于调用方更新进度。
+    窗口末尾可能被截断的最后一个片段会被丢弃，下一个窗口从该片段的起点开始重新识别。
+    调用方处理完一个窗口的所有片段后调用 on_window(下一个窗口的起点, 提示词)，把二者作为
+    start_sample 和 prompt 传回即可从该处继续识别，结果与不中断时相同。
+    """
+    window = int(window_seconds * sample_rate)
+    options = dict(decode_options)
+    if prompt is None:
+        prompt = options.pop("initial_prompt", None)
+    else:
+        options.pop("initial_prompt", None)
+
+    source = audio if hasattr(audio, "at_end") else ArraySource(audio)
+    seek = start_sample
+    source.release(seek)
+    while True:
+        end = source.fill(seek + window)
+        if seek >= end:
+            break
+        result = model.transcribe(source.view(seek, end), verbose=None, initial_prompt=prompt, **options)
+        segments = result["segments"]
+        offset = seek / sample_rate
+
+        next_seek = end
+        if not source.at_end(end) and len(segments) > 1:
+            # 最后一个片段可能在窗口边界处被截断，留给下一个窗口
+            cut = segments[-1]
+            cut_sample = seek + int(cut["start"] * sample_rate)
+            if cut_sample > seek:
+                segments = segments[:-1]
+                next_seek = cut_sample
+
+        for segment in segments:
+            segment = dict(segment)
+            segment["start"] += offset
+            segment["end"] += offset
+            yield segment, next_seek
+
+        text = "".join(segment["text"] for segment in segments)
+        # condition_on_previous_text 为False时每个窗口都使用最初的提示词
+        if text and options.get("condition_on_previous_text", True):
+            prompt = text[-PROMPT_CHARS:]
+        if not segments:
+            yield None, next_seek
+        if on_window:
+            on_window(next_seek, prompt)
+        seek = next_seek
+        source.release(seek)
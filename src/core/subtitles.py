@@ -0,0 +1,158 @@
+import io
+import json
+import time
+
+# 支持的字幕格式
+FORMATS = ("srt", "vtt", "json", "tsv")
+
+
+def format_timestamp(seconds, decimal_marker=','):
+    """格式化时间戳为 HH:MM:SS,mmm
+
+    先四舍五入到整毫秒再用整数拆分时分秒（与whisper自带的格式化相同）。之前对小数部分截断，
+    浮点误差会使毫秒少1，如 6137.99 秒输出为 ,989。
+    """
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def format_srt_block(index, segment):
+    """格式化单条SRT字幕"""
+    start = format_timestamp(segment["start"])
+    end = format_timestamp(segment["end"])
+    return f"{index}\n{start} --> {end}\n{segment['text'].strip()}\n\n"
+
+
+class SubtitleWriter:
+    """流式字幕写入器基类
+
+    片段逐条写入文件对象（磁盘文件或io.StringIO），写入文件时不需要先生成完整的字幕字符串。
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def write_header(self):
+        pass
+
+    def write_segment(self, segment):
+        self.count += 1
+        self.fp.write(self.format_segment(self.count, segment))
+
+    def format_segment(self, index, segment):
+        raise NotImplementedError
+
+    def write_footer(self):
+        pass
+
+    def __enter__(self):
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.write_footer()
+
+
+class SRTWriter(SubtitleWriter):
+    def format_segment(self, index, segment):
+        return format_srt_block(index, segment)
+
+
+class VTTWriter(SubtitleWriter):
+    def write_header(self):
+        self.fp.write("WEBVTT\n\n")
+
+    def format_segment(self, index, segment):
+        start = format_timestamp(segment["start"], '.')
+        end = format_timestamp(segment["end"], '.')
+        return f"{start} --> {end}\n{segment['text'].strip()}\n\n"
+
+
+class TSVWriter(SubtitleWriter):
+    def write_header(self):
+        self.fp.write("start\tend\ttext\n")
+
+    def format_segment(self, index, segment):
+        text = segment["text"].strip().replace("\t", " ").replace("\n", " ")
+        return f"{round(segment['start'] * 1000)}\t{round(segment['end'] * 1000)}\t{text}\n"
+
+
+class JSONWriter(SubtitleWriter):
+    """以JSON数组格式逐条写出片段"""
+
+    def write_header(self):
+        self.fp.write("[")
+
+    def format_segment(self, index, segment):
+        item = json.dumps({
+            "id": index,
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "text": segment["text"].strip(),
+        }, ensure_ascii=False)
+        return item if index == 1 else ",\n" + item
+
+    def write_footer(self):
+        self.fp.write("]\n")
+
+
+WRITERS = {
+    "srt": SRTWriter,
+    "vtt": VTTWriter,
+    "json": JSONWriter,
+    "tsv": TSVWriter,
+}
+
+
+class ProgressThrottle:
+    """限制进度回调的频率：百分比变化且距上次回调超过最小间隔时才回调"""
+
+    def __init__(self, callback, total, min_interval=0.1):
+        self.callback = callback
+        self.total = max(total, 1)
+        self.min_interval = min_interval
+        self._last_percent = -1
+        self._last_time = 0.0
+
+    def update(self, done):
+        percent = done * 100 // self.total
+        if percent == self._last_percent:
+            return
+        now = time.perf_counter()
+        if done < self.total and now - self._last_time < self.min_interval:
+            return
+        self._last_percent = percent
+        self._last_time = now
+        self.callback(percent, done, self.total)
+
+
+def write_segments(fp, segments, fmt="srt", on_progress=None):
+    """把片段以指定格式写入文件对象，返回写入的片段数"""
+    if fmt not in WRITERS:
+        raise ValueError(f"不支持的字幕格式: {fmt}")
+    throttle = ProgressThrottle(on_progress, len(segments)) if on_progress else None
+    with WRITERS[fmt](fp) as writer:
+        for segment in segments:
+            writer.write_segment(segment)
+            if throttle:
+                throttle.update(writer.count)
+    return writer.count
+
+
+def render(segments, fmt="srt", on_progress=None):
+    """把片段渲染为字幕字符串"""
+    buffer = io.StringIO()
+    write_segments(buffer, segments, fmt, on_progress)
+    return buffer.getvalue()
+
+
+def write_file(path, segments, fmt=None, on_progress=None):
+    """把片段写入字幕文件，未指定格式时根据扩展名判断"""
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    with open(path, 'w', encoding='utf-8') as f:
+        return write_segments(f, segments, fmt, on_progress)
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# 设置后所有任务的追踪记录都追加写入该JSON Lines文件
+TRACE_FILE_ENV = 'VIDEOTOTXT_TRACE_FILE'
+
+# 各阶段在界面和报告中显示的名称
+STAGE_LABELS = {
+    "extract": "提取音频",
+    "vad": "语音检测",
+    "cache_lookup": "查询缓存",
+    "model_load": "加载模型",
+    "transcribe": "识别",
+    "format": "生成字幕",
+}
+
+
+def current_rss_mb():
+    """当前进程的常驻内存（MB），无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class JsonLinesSink:
+    """把追踪记录逐行追加写入JSON Lines文件，多个线程可共用"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ListenerSink:
+    """把追踪记录交给进程内的回调，例如由界面显示各阶段耗时"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, record):
+        self.callback(record)
+
+    def close(self):
+        pass
+
+
+_shared_sinks = None
+_shared_lock = threading.Lock()
+
+
+def default_sinks():
+    """由环境变量配置的进程级共享输出"""
+    global _shared_sinks
+    with _shared_lock:
+        if _shared_sinks is None:
+            path = os.environ.get(TRACE_FILE_ENV)
+            _shared_sinks = [JsonLinesSink(path)] if path else []
+        return list(_shared_sinks)
+
+
+class Tracer:
+    """结构化的阶段计时、计数器和内存采样
+
+    每条记录都是一个字典，包含 type (span/counter/memory)、时间戳以及构造时传入的公共字段，
+    依次交给各个输出（提供 emit(record) 方法的对象）。没有输出时只在内存中汇总。
+    """
+
+    def __init__(self, sinks=None, **fields):
+        self.sinks = list(default_sinks() if sinks is None else sinks)
+        self.fields = fields
+        self.stage_seconds = {}  # 阶段名 -> 累计耗时(秒)
+        self.counters = {}
+        self.peak_rss_mb = None
+        self._lock = threading.Lock()
+        # 每个线程当前打开的阶段，用于从外层阶段的耗时中扣除嵌套阶段
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def _emit(self, record):
+        record.update(self.fields)
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"追踪记录输出失败: {e}")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """记录一个阶段的耗时，结束时附带内存采样
+
+        阶段可以嵌套（如识别中的模型加载），汇总时外层阶段只计自身耗时，同名阶段的耗时累加。
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # 嵌套阶段的累计耗时
+        start_wall = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self_duration = duration - stack.pop()
+            if stack:
+                stack[-1] += duration
+            rss_mb = current_rss_mb()
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + self_duration
+                self._update_peak(rss_mb)
+            record = {"type": "span", "name": name, "start": start_wall, "duration": duration,
+                      "self_duration": self_duration, "depth": len(stack), "rss_mb": rss_mb}
+            if error:
+                record["error"] = error
+            record.update(attrs)
+            self._emit(record)
+
+    def count(self, name, value=1, **attrs):
+        """累加计数器，如片段数、音频时长、解码的token数"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            total = self.counters[name]
+        record = {"type": "counter", "name": name, "time": time.time(),
+                  "value": value, "total": total}
+        record.update(attrs)
+        self._emit(record)
+
+    def sample_memory(self, label, **attrs):
+        """记录一次内存采样，返回当前常驻内存（MB）"""
+        rss_mb = current_rss_mb()
+        with self._lock:
+            self._update_peak(rss_mb)
+        record = {"type": "memory", "name": label, "time": time.time(), "rss_mb": rss_mb}
+        record.update(attrs)
+        self._emit(record)
+        return rss_mb
+
+    def ingest(self, record):
+        """汇总其他追踪器产生的记录（如合并识别时多个任务共用的阶段、常驻服务发回的记录），并交给本追踪器的输出"""
+        record = dict(record)
+        with self._lock:
+            if record.get("type") == "span":
+                name = record["name"]
+                self.stage_seconds[name] = (self.stage_seconds.get(name, 0.0)
+                                            + record.get("self_duration", record.get("duration", 0.0)))
+            elif record.get("type") == "counter":
+                name = record["name"]
+                self.counters[name] = self.counters.get(name, 0) + record.get("value", 0)
+            self._update_peak(record.get("rss_mb"))
+        self._emit(record)
+
+    def _update_peak(self, rss_mb):
+        if rss_mb is not None and (self.peak_rss_mb is None or rss_mb > self.peak_rss_mb):
+            self.peak_rss_mb = rss_mb
+
+    def summary(self):
+        """各阶段耗时、计数器和峰值内存的汇总"""
+        with self._lock:
+            return {
+                "stages": dict(self.stage_seconds),
+                "counters": dict(self.counters),
+                "peak_rss_mb": self.peak_rss_mb,
+            }
+
+    def format_summary(self):
+        """把汇总格式化为一行文本，如 "提取音频 1.2秒 | 识别 30.5秒 | 峰值内存 900MB" """
+        summary = self.summary()
+        parts = [f"{STAGE_LABELS.get(name, name)} {seconds:.1f}秒"
+                 for name, seconds in summary["stages"].items()]
+        if summary["peak_rss_mb"] is not None:
+            parts.append(f"峰值内存 {summary['peak_rss_mb']:.0f}MB")
+        return " | ".join(parts)
@@ -0,0 +1,151 @@
+import time
+
+import numpy as np
+
+from core.audio import SAMPLE_RATE
+
+# VAD默认参数
+FRAME_SECONDS = 0.03        # 帧长
+ENERGY_MARGIN_DB = 12.0     # 高于噪声底多少dB视为有声
+MIN_ENERGY_DB = -55.0       # 能量阈值下限，避免全程安静的音频把噪声判为语音
+SPEECH_BAND = (300, 3400)   # 语音主要能量所在频带
+MIN_BAND_RATIO = 0.35       # 语音频带能量占比下限
+MAX_FLATNESS = 0.5          # 频谱平坦度上限，过高说明是宽带噪声
+MIN_SPEECH_SECONDS = 0.25   # 短于此长度的语音段视为误检
+MIN_SILENCE_SECONDS = 1.0   # 短于此长度的静音不切分
+PADDING_SECONDS = 0.3       # 每个语音段前后保留的余量
+FFT_BLOCK_FRAMES = 8192     # 分块做FFT，限制内存占用
+
+
+def _frame_features(pcm, sample_rate, frame_length):
+    """逐帧计算能量(dB)、语音频带能量占比和频谱平坦度"""
+    n_frames = len(pcm) // frame_length
+    frames = pcm[:n_frames * frame_length].reshape(n_frames, frame_length)
+    window = np.hanning(frame_length).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, FFT_BLOCK_FRAMES):
+        block = frames[start:start + FFT_BLOCK_FRAMES]
+        rms = np.sqrt(np.mean(np.square(block, dtype=np.float32), axis=1))
+        energy_db[start:start + len(block)] = 20 * np.log10(rms + 1e-10)
+
+        power = np.abs(np.fft.rfft(block * window, axis=1)) ** 2 + 1e-12
+        total = power.sum(axis=1)
+        band_ratio[start:start + len(block)] = power[:, band].sum(axis=1) / total
+        flatness[start:start + len(block)] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, band_ratio, flatness
+
+
+def _mask_to_runs(mask):
+    """把布尔序列转换为 [(起始帧, 结束帧)] 形式的连续区间"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def detect_speech(pcm, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """基于能量和频谱特征检测语音区间，返回 [(起始采样点, 结束采样点)]"""
+    frame_length = int(sample_rate * frame_seconds)
+    if len(pcm) < frame_length:
+        return [(0, len(pcm))] if len(pcm) else []
+
+    energy_db, band_ratio, flatness = _frame_features(pcm, sample_rate, frame_length)
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+    mask = (energy_db > threshold) & (band_ratio > MIN_BAND_RATIO) & (flatness < MAX_FLATNESS)
+
+    # 填平短暂停顿，去掉过短的语音段
+    runs = _mask_to_runs(mask)
+    min_silence = int(MIN_SILENCE_SECONDS / frame_seconds)
+    min_speech = int(MIN_SPEECH_SECONDS / frame_seconds)
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    merged = [(start, end) for start, end in merged if end - start >= min_speech]
+
+    padding = int(PADDING_SECONDS * sample_rate)
+    regions = []
+    for start, end in merged:
+        start = max(0, start * frame_length - padding)
+        end = min(len(pcm), end * frame_length + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+class SpeechMap:
+    """记录压缩后音频与原始时间轴之间的对应关系"""
+
+    def __init__(self, regions, sample_rate=SAMPLE_RATE):
+        self.regions = regions
+        self.sample_rate = sample_rate
+        lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate
+        self.original_starts = np.array([start for start, _ in regions], dtype=np.int64) / sample_rate
+
+    def to_original(self, seconds):
+        """把压缩音频中的时间换算为原始时间"""
+        index = max(0, int(np.searchsorted(self.compact_starts, seconds, side='right')) - 1)
+        return float(self.original_starts[index] + (seconds - self.compact_starts[index]))
+
+    def remap_segment(self, segment):
+        """把单个片段的时间戳映射回原始时间轴"""
+        start = self.to_original(segment["start"])
+        # 结束时间按起始时间所在区间计算，避免片段跨越被跳过的静音
+        end = self.to_original(max(segment["start"], segment["end"] - 1e-3)) + 1e-3
+        segment["start"], segment["end"] = start, max(start, end)
+        return segment
+
+    def remap_result(self, result):
+        """把识别结果中的片段时间戳映射回原始时间轴"""
+        for segment in result["segments"]:
+            self.remap_segment(segment)
+        return result
+
+
+def apply_vad(pcm, sample_rate=SAMPLE_RATE):
+    """执行VAD，返回 (只包含语音的音频, SpeechMap, 统计信息)
+
+    没有检测到语音时返回原始音频，交由模型自行判断。
+    """
+    start_time = time.perf_counter()
+    regions = detect_speech(pcm, sample_rate)
+    if not regions:
+        regions = [(0, len(pcm))]
+    speech = np.concatenate([pcm[start:end] for start, end in regions]) if len(regions) > 1 \
+        else pcm[regions[0][0]:regions[0][1]]
+    stats = {
+        "total_seconds": len(pcm) / sample_rate,
+        "speech_seconds": len(speech) / sample_rate,
+        "skipped_seconds": (len(pcm) - len(speech)) / sample_rate,
+        "regions": len(regions),
+        "elapsed": time.perf_counter() - start_time,
+    }
+    return speech, SpeechMap(regions, sample_rate), stats
+
+
+def estimate_saved_seconds(stats, transcribe_elapsed):
+    """按实际识别速度估算跳过静音节省的时间（扣除VAD本身的耗时）"""
+    if stats["speech_seconds"] <= 0:
+        return 0.0
+    seconds_per_audio_second = transcribe_elapsed / stats["speech_seconds"]
+    return stats["skipped_seconds"] * seconds_per_audio_second - stats["elapsed"]
+
+
+def format_vad_stats(stats, transcribe_elapsed=None):
+    """格式化VAD统计信息"""
+    message = (f"VAD: 跳过 {stats['skipped_seconds']:.1f}秒/{stats['total_seconds']:.1f}秒 "
+               f"({stats['skipped_seconds'] / max(stats['total_seconds'], 1e-9):.0%}), "
+               f"{stats['regions']} 个语音区间, 耗时 {stats['elapsed']:.2f}秒")
+    if transcribe_elapsed is not None:
+        message += f", 约节省 {estimate_saved_seconds(stats, transcribe_elapsed):.1f}秒"
+    return message
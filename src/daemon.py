@@ -0,0 +1,44 @@
+import os
+os.environ['KMP_DUPLICATE_LIB_OK']='True'
+
+import sys
+import argparse
+
+from core.backends import BACKENDS
+from core.daemon import DEFAULT_HOST, DEFAULT_PORT, TOKEN_FILE, DaemonServer, TranscriptionDaemon, create_token
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="常驻识别服务：模型只加载一次，界面和命令行客户端通过本机HTTP提交任务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址（默认只接受本机连接）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--preload", nargs="*", default=["medium"],
+                        choices=["base", "small", "medium", "large"],
+                        help="启动时加载的模型（每个识别槽位一个副本）")
+    parser.add_argument("--backend", default="whisper", choices=sorted(BACKENDS), help="预加载模型使用的推理后端")
+    parser.add_argument("--slots", type=int, help="同时识别的任务数（默认按CPU核数和内存计算）")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="合并识别：同时等待的多个短音频任务的窗口合并为批次送入模型（1表示逐个识别）")
+    parser.add_argument("--verbose", action="store_true", help="打印每个HTTP请求")
+    args = parser.parse_args(argv)
+
+    service = TranscriptionDaemon(transcribe_slots=args.slots, batch_size=max(1, args.batch_size))
+    if args.preload:
+        service.preload(args.preload, args.backend)
+    server = DaemonServer(service, create_token(), args.host, args.port, verbose=args.verbose)
+    print(f"识别服务已启动: http://{args.host}:{args.port} "
+          f"(识别槽位 {service.scheduler.transcribe_slots or '自动'}，每批 {service.scheduler.batch_size} 个窗口)")
+    print(f"界面使用该服务: 设置环境变量 VIDEOTOTXT_DAEMON={args.host}:{args.port}")
+    print(f"访问令牌已写入 {TOKEN_FILE}（只有当前用户可读），客户端自动读取")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止识别服务...")
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
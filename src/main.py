@@ -2,14 +2,51 @@ import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 
 import sys
-from PyQt5.QtWidgets import QApplication
-from ui.main_window import MainWindow
+import threading
+import importlib
+import startup_profile
+
+# 窗口显示后在后台预先导入的重型模块，首次拖入文件时无需再等待
+PREWARM_MODULES = ("numpy", "torch", "whisper")
+
+def prewarm_imports():
+    # 使用常驻识别服务时模型在服务进程中，界面不需要导入torch
+    if os.environ.get('VIDEOTOTXT_DAEMON'):
+        return
+    def _import():
+        for name in PREWARM_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+    threading.Thread(target=_import, name="prewarm-imports", daemon=True).start()
 
 def main():
+    # --profile-startup: 以 -X importtime 重新启动自身，输出各模块导入耗时和首个窗口耗时
+    profile = "--profile-startup" in sys.argv
+    if profile and not startup_profile.is_profile_child():
+        output = None
+        if "--profile-output" in sys.argv:
+            output = sys.argv[sys.argv.index("--profile-output") + 1]
+        sys.exit(startup_profile.run_profile(os.path.abspath(__file__), ["--profile-startup"], output))
+
+    t0 = startup_profile.startup_t0()
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    if profile:
+        # 窗口显示后立即退出，只统计启动耗时
+        def finish_profile():
+            startup_profile.report_first_window(t0)
+            app.quit()
+        QTimer.singleShot(0, finish_profile)
+    else:
+        QTimer.singleShot(0, prewarm_imports)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
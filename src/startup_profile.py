@@ -0,0 +1,88 @@
+"""启动耗时分析：以 -X importtime 重新启动程序，统计各模块导入耗时和首个窗口出现的时间"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+# 子进程中用于传递起始时间和标记分析模式的环境变量
+T0_ENV = 'VIDEOTOTXT_STARTUP_T0'
+CHILD_ENV = 'VIDEOTOTXT_PROFILE_CHILD'
+FIRST_WINDOW_PREFIX = 'FIRST_WINDOW_MS='
+
+
+def is_profile_child():
+    return os.environ.get(CHILD_ENV) == '1'
+
+
+def startup_t0():
+    """程序启动的时间点，由父进程在启动子进程前记录"""
+    return float(os.environ.get(T0_ENV, time.time()))
+
+
+def report_first_window(t0):
+    """子进程在窗口显示后输出首个窗口耗时"""
+    print(f"{FIRST_WINDOW_PREFIX}{(time.time() - t0) * 1000:.1f}", flush=True)
+
+
+def parse_importtime(text):
+    """解析 -X importtime 的输出，返回 [(模块名, 自身耗时us, 累计耗时us, 嵌套深度)]"""
+    records = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def top_level_imports(records):
+    """按顶层模块汇总累计导入耗时，返回按耗时降序排列的 [(模块名, 累计耗时us)]"""
+    min_depth = min((depth for _, _, _, depth in records), default=0)
+    totals = {}
+    for name, _, cumulative_us, depth in records:
+        if depth == min_depth:
+            root = name.split('.')[0]
+            totals[root] = totals.get(root, 0) + cumulative_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def run_profile(script, args, output=None, top=20):
+    """以分析模式重新启动程序并打印报告，返回进程退出码"""
+    env = dict(os.environ)
+    env[T0_ENV] = str(time.time())
+    env[CHILD_ENV] = '1'
+    process = subprocess.run([sys.executable, '-X', 'importtime', script] + list(args),
+                             env=env, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+
+    first_window_ms = None
+    for line in process.stdout.splitlines():
+        if line.startswith(FIRST_WINDOW_PREFIX):
+            first_window_ms = float(line[len(FIRST_WINDOW_PREFIX):])
+    records = parse_importtime(process.stderr)
+    modules = top_level_imports(records)
+    total_import_ms = sum(us for _, us in modules) / 1000
+
+    if first_window_ms is None:
+        print("启动失败，未能显示窗口:")
+        print("\n".join(line for line in process.stderr.splitlines()
+                        if not line.startswith('import time:')))
+        return process.returncode or 1
+
+    print(f"首个窗口耗时: {first_window_ms:.0f}ms (其中模块导入 {total_import_ms:.0f}ms)")
+    print(f"{'模块':<32}{'累计导入(ms)':>14}")
+    for name, us in modules[:top]:
+        print(f"{name:<32}{us / 1000:>14.1f}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "first_window_ms": first_window_ms,
+                "import_ms": total_import_ms,
+                "modules": {name: us / 1000 for name, us in modules},
+            }, f, ensure_ascii=False, indent=2)
+    return 0
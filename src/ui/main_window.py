@@ -1,91 +1,37 @@
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QPushButton, QTextEdit, QProgressBar, QLabel,
-                           QFileDialog, QComboBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                           QFileDialog, QComboBox, QCheckBox, QListWidget,
+                           QListWidgetItem)
+from PyQt5.QtCore import Qt, QObject, pyqtSignal
+from PyQt5.QtGui import QTextCursor
 import os
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
-import whisper
-from moviepy.editor import VideoFileClip
-import time
+from core.backends import available_backends
+from core.pipeline import VIDEO_EXTENSIONS
+from core.presets import PRESETS
+from core.remote import DAEMON_ENV, RemoteScheduler
+from core.scheduler import JobScheduler, STATUS_LABELS, DONE, FAILED, FINAL_STATUSES
+from core.subtitles import format_srt_block
 
-class SubtitleWorker(QThread):
-    progress = pyqtSignal(str)
-    finished = pyqtSignal(str)
-    
-    def __init__(self, video_path, model_size="medium"):
-        super().__init__()
-        self.video_path = video_path
-        self.model_size = model_size
-        
-    def run(self):
-        try:
-            # 提取音频
-            self.progress.emit("正在提取音频...")
-            video = VideoFileClip(self.video_path)
-            duration = video.duration
-            self.progress.emit(f"视频总长度: {int(duration)}秒")
-            
-            audio_path = "temp_audio.mp3"
-            # 提高音频质量
-            video.audio.write_audiofile(audio_path, fps=16000, bitrate="192k", verbose=False, logger=None)
-            
-            # 加载模型
-            self.progress.emit(f"正在加载{self.model_size}模型...")
-            model = whisper.load_model(self.model_size)
-            
-            # 识别音频
-            self.progress.emit("开始识别音频...")
-            
-            result = model.transcribe(
-                audio_path,
-                language="zh",  # 指定中文
-                task="transcribe",  # 转录任务
-                initial_prompt="这是一段中文音频。",  # 提示模型使用中文
-                best_of=5,  # 使用beam search提高准确率
-                verbose=True  # 启用详细输出
-            )
-            
-            # 格式化字幕
-            self.progress.emit("正在生成SRT格式字幕...")
-            srt_content = ""
-            total_segments = len(result["segments"])
-            
-            for i, segment in enumerate(result["segments"], 1):
-                start = self.format_timestamp(segment["start"])
-                end = self.format_timestamp(segment["end"])
-                text = segment["text"].strip()
-                srt_content += f"{i}\n{start} --> {end}\n{text}\n\n"
-                
-                # 显示每个片段的识别结果和进度
-                percentage = min(100, int(i / total_segments * 100))
-                progress_msg = f"正在处理: {percentage}% (片段 {i}/{total_segments})"
-                self.progress.emit(progress_msg)
-                print(f"[{start} --> {end}] {text}")
-            
-            # 清理临时文件
-            os.remove(audio_path)
-            
-            self.progress.emit("识别完成！")
-            self.finished.emit(srt_content)
-            
-        except Exception as e:
-            import traceback
-            error_msg = f"错误: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)  # 在控制台打印详细错误信息
-            self.finished.emit(f"错误: {str(e)}")
-    
-    def format_timestamp(self, seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        msecs = int((seconds - int(seconds)) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{msecs:03d}"
+class SchedulerBridge(QObject):
+    """把调度器在工作线程中的回调转发为Qt信号，由界面线程处理"""
+    job_event = pyqtSignal(object, str, object)
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("视频字幕提取器")
         self.setAcceptDrops(True)
+        self.bridge = SchedulerBridge()
+        self.bridge.job_event.connect(self.on_job_event)
+        # 设置了常驻识别服务且服务在运行时，任务交给服务处理，模型已在服务中加载
+        daemon_address = os.environ.get(DAEMON_ENV)
+        if daemon_address and RemoteScheduler.is_available(daemon_address):
+            self.scheduler = RemoteScheduler(daemon_address, on_event=self.bridge.job_event.emit)
+        else:
+            self.scheduler = JobScheduler(on_event=self.bridge.job_event.emit)
+        self.job_items = {}  # 任务ID -> 队列列表项
+        self.shown_segments = 0  # 当前任务已显示的片段数
         self.setup_ui()
         
     def setup_ui(self):
@@ -97,11 +43,39 @@ class MainWindow(QMainWindow):
         self.model_combo = QComboBox()
         self.model_combo.addItems(["base", "small", "medium", "large"])
         self.model_combo.setCurrentText("medium")  # 默认使用medium模型
+        # 选择模型后立即在后台预加载
+        self.model_combo.currentTextChanged.connect(self.prewarm_model)
         layout.addWidget(QLabel("选择模型 (越大越准确但越慢):"))
         layout.addWidget(self.model_combo)
+
+        # 创建级联识别选项：小模型先识别全部音频，只有低置信度的片段由上面选择的模型重新识别
+        self.draft_combo = QComboBox()
+        self.draft_combo.addItems(["不使用", "base", "small", "medium"])
+        layout.addWidget(QLabel("级联识别草稿模型 (先快速识别，低置信度片段再用所选模型):"))
+        layout.addWidget(self.draft_combo)
+
+        # 创建推理后端选择下拉框
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(available_backends())
+        self.backend_combo.currentTextChanged.connect(
+            lambda _: self.prewarm_model(self.model_combo.currentText()))
+        layout.addWidget(QLabel("推理后端:"))
+        layout.addWidget(self.backend_combo)
+
+        # 创建识别参数预设下拉框，第一项按模型使用默认预设（本机调优结果）
+        self.preset_combo = QComboBox()
+        self.preset_combo.addItem("自动 (按模型)", None)
+        for name, preset in PRESETS.items():
+            self.preset_combo.addItem(f"{preset['label']} ({name})", name)
+        layout.addWidget(QLabel("识别参数预设:"))
+        layout.addWidget(self.preset_combo)
+
+        # 创建VAD选项
+        self.vad_checkbox = QCheckBox("跳过静音和音乐片段 (VAD)")
+        layout.addWidget(self.vad_checkbox)
         
         # 创建拖放提示标签
-        self.drop_label = QLabel("将视频文件拖放到这里")
+        self.drop_label = QLabel("将视频文件拖放到这里（可一次拖入多个）")
         self.drop_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.drop_label.setStyleSheet("""
             QLabel {
@@ -112,35 +86,56 @@ class MainWindow(QMainWindow):
             }
         """)
         
+        # 创建任务队列列表
+        self.job_list = QListWidget()
+        self.job_list.currentItemChanged.connect(self.show_selected_job)
+        self.cancel_button = QPushButton("取消选中任务")
+        self.cancel_button.clicked.connect(self.cancel_selected_job)
+        
         # 创建进度条
         self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.hide()
         
         # 创建状态标签
         self.status_label = QLabel()
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        # 创建各阶段耗时标签
+        self.timing_label = QLabel()
+        self.timing_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.timing_label.setStyleSheet("color: #666;")
         
         # 创建文本显示区域
         self.text_edit = QTextEdit()
         self.text_edit.setReadOnly(True)
         
         # 创建按钮布局
-        button_layout = QVBoxLayout()
+        button_layout = QHBoxLayout()
         
         # 创建保存按钮
         self.save_button = QPushButton("保存字幕")
         self.save_button.clicked.connect(self.save_subtitle)
         self.save_button.hide()
+        button_layout.addWidget(self.cancel_button)
+        button_layout.addWidget(self.save_button)
         
         # 添加组件到布局
         layout.addWidget(self.drop_label)
+        layout.addWidget(QLabel("任务队列:"))
+        layout.addWidget(self.job_list)
         layout.addWidget(self.progress_bar)
         layout.addWidget(self.status_label)
+        layout.addWidget(self.timing_label)
         layout.addWidget(self.text_edit)
-        layout.addWidget(self.save_button)
+        layout.addLayout(button_layout)
         
         self.setMinimumSize(600, 400)
     
+    def prewarm_model(self, model_size):
+        if self.scheduler.prewarm(model_size, self.backend_combo.currentText()):
+            self.status_label.setText(f"正在后台预加载{model_size}模型...")
+
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             event.accept()
@@ -149,38 +144,110 @@ class MainWindow(QMainWindow):
             
     def dropEvent(self, event):
         files = event.mimeData().urls()
-        if files:
-            video_path = files[0].toLocalFile()
-            if video_path.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
+        video_paths = [url.toLocalFile() for url in files
+                       if url.toLocalFile().lower().endswith(VIDEO_EXTENSIONS)]
+        if video_paths:
+            for video_path in video_paths:
                 self.process_video(video_path)
-            else:
-                self.status_label.setText("请拖入有效的视频文件")
+            skipped = len(files) - len(video_paths)
+            message = f"已加入 {len(video_paths)} 个任务"
+            if skipped:
+                message += f"，忽略 {skipped} 个非视频文件"
+            self.status_label.setText(message)
+        elif files:
+            self.status_label.setText("请拖入有效的视频文件")
                 
     def process_video(self, video_path):
-        self.progress_bar.show()
-        self.status_label.setText("正在处理...")
         # 使用选择的模型大小
-        self.worker = SubtitleWorker(video_path, self.model_combo.currentText())
-        self.worker.progress.connect(self.update_status)
-        self.worker.finished.connect(self.on_finished)
-        self.worker.start()
-        
-    def update_status(self, message):
-        self.status_label.setText(message)
-        
-    def on_finished(self, result):
-        self.progress_bar.hide()
-        if result.startswith("错误"):
-            self.status_label.setText(result)
-        else:
-            self.text_edit.setText(result)
-            self.save_button.show()
+        draft_model = self.draft_combo.currentText() if self.draft_combo.currentIndex() > 0 else None
+        job = self.scheduler.submit(video_path, self.model_combo.currentText(),
+                                    use_vad=self.vad_checkbox.isChecked(),
+                                    backend=self.backend_combo.currentText(),
+                                    draft_model=draft_model,
+                                    preset=self.preset_combo.currentData())
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self.job_items[job.id] = item
+        self.job_list.addItem(item)
+        self.update_job_item(job)
+        if self.job_list.currentItem() is None:
+            self.job_list.setCurrentItem(item)
+
+    def selected_job(self):
+        item = self.job_list.currentItem()
+        if item is None:
+            return None
+        return self.scheduler.jobs.get(item.data(Qt.ItemDataRole.UserRole))
+
+    def update_job_item(self, job):
+        item = self.job_items.get(job.id)
+        if item is None:
+            return
+        text = f"{job.name} - {STATUS_LABELS[job.status]}"
+        if job.status not in FINAL_STATUSES and job.percent:
+            text += f" {job.percent}%"
+        if job.error:
+            text += f": {job.error}"
+        item.setText(text)
+
+    def on_job_event(self, job, event, payload):
+        self.update_job_item(job)
+        if job is not self.selected_job():
+            return
+        if event == "progress":
+            self.status_label.setText(payload)
+        elif event == "percent":
+            self.progress_bar.setValue(payload)
+        elif event == "segment":
+            index, segment = payload
+            # 切换任务时已显示的片段不再重复追加
+            if index > self.shown_segments:
+                self.shown_segments = index
+                self.append_segment(format_srt_block(index, segment))
+        elif event == "trace" and payload["type"] == "span":
+            self.timing_label.setText(job.tracer.format_summary())
+        elif event == "status" and payload in FINAL_STATUSES:
+            self.show_selected_job()
+
+    def show_selected_job(self, *args):
+        job = self.selected_job()
+        if job is None:
+            return
+        self.text_edit.setText(job.subtitles())
+        self.shown_segments = len(job.segments)
+        self.timing_label.setText(job.tracer.format_summary())
+        self.progress_bar.setValue(job.percent)
+        self.progress_bar.setVisible(job.status not in FINAL_STATUSES)
+        self.save_button.setVisible(job.status == DONE)
+        if job.status == DONE:
             self.status_label.setText("处理完成！")
+        elif job.status == FAILED:
+            self.status_label.setText(f"错误: {job.error}")
+        else:
+            self.status_label.setText(job.message or STATUS_LABELS[job.status])
+
+    def cancel_selected_job(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.cancel(job.id)
+        
+    def append_segment(self, block):
+        # 识别过程中逐条追加字幕
+        self.text_edit.moveCursor(QTextCursor.End)
+        self.text_edit.insertPlainText(block)
+        self.text_edit.moveCursor(QTextCursor.End)
+
+    def closeEvent(self, event):
+        self.scheduler.shutdown()
+        super().closeEvent(event)
             
     def save_subtitle(self):
+        job = self.selected_job()
+        if job is None:
+            return
         # 获取视频文件所在的目录作为默认保存路径
-        default_path = os.path.dirname(self.worker.video_path)
-        default_name = os.path.splitext(os.path.basename(self.worker.video_path))[0] + ".srt"
+        default_path = os.path.dirname(job.video_path)
+        default_name = os.path.splitext(os.path.basename(job.video_path))[0] + ".srt"
         default_save_path = os.path.join(default_path, default_name)
         
         file_path, _ = QFileDialog.getSaveFileName(
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 测试直接导入 src/ 下的模块（与 python src/main.py 运行时相同）和根目录下的打包工具
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, ROOT)
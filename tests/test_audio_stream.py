@@ -0,0 +1,144 @@
+"""AudioStream 的缓冲区不随音频时长增长"""
+import io
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from core.audio import AudioStream, SAMPLE_RATE
+from core.streaming import WINDOW_SECONDS, iter_segments
+
+# 采样点的值为其位置对该数取模，float32能精确表示，用于检查读出的音频是否正确
+PATTERN_PERIOD = 1 << 20
+# 识别两小时音频时允许新分配的内存（MB），一次性解码需要约460MB
+PEAK_ALLOCATION_MB = 32
+
+
+class SyntheticPCM(io.RawIOBase):
+    """按需生成PCM的替身ffmpeg输出，本身不保留已生成的音频"""
+
+    def __init__(self, total_samples):
+        self.total_samples = total_samples
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer) // 4, self.total_samples - self.position)
+        if count <= 0:
+            return 0
+        samples = np.arange(self.position, self.position + count) % PATTERN_PERIOD
+        memoryview(buffer)[:count * 4] = samples.astype(np.float32).tobytes()
+        self.position += count
+        return count * 4
+
+
+class SyntheticDecoder:
+    """替身ffmpeg进程"""
+
+    def __init__(self, total_samples):
+        self.stdout = SyntheticPCM(total_samples)
+        self.stderr = io.BytesIO()
+        self.returncode = 0
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+def open_synthetic(seconds):
+    stream = AudioStream("synthetic.wav", WINDOW_SECONDS)
+    stream.process = SyntheticDecoder(int(seconds * SAMPLE_RATE))
+    return stream
+
+
+def expected_samples(start, end):
+    return (np.arange(start, end) % PATTERN_PERIOD).astype(np.float32)
+
+
+class CheckingModel:
+    """检查每个窗口的音频是否为音频中对应位置的采样点，并记录缓冲区的使用情况"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.windows = 0
+        self.max_buffered = 0
+
+    def transcribe(self, audio, verbose=None, **decode_options):
+        # 窗口是缓冲区的视图，由其在缓冲区中的偏移得到在音频中的位置
+        assert np.shares_memory(audio, self.stream.buffer)
+        start = self.stream.start + (audio.ctypes.data - self.stream.buffer.ctypes.data) // 4
+        np.testing.assert_array_equal(audio, expected_samples(start, start + len(audio)))
+        self.windows += 1
+        self.max_buffered = max(self.max_buffered, self.stream.end - self.stream.start)
+        seconds = len(audio) / SAMPLE_RATE
+        return {"segments": [
+            {"start": 0.0, "end": seconds / 2, "text": "甲", "tokens": [1]},
+            {"start": seconds / 2, "end": seconds, "text": "乙", "tokens": [2]},
+        ]}
+
+
+def test_buffer_stays_bounded_over_long_feed():
+    seconds = 2 * 3600
+    stream = open_synthetic(seconds)
+    buffer = stream.buffer
+    model = CheckingModel(stream)
+
+    tracemalloc.start()
+    try:
+        processed = 0
+        segments = 0
+        for segment, processed in iter_segments(model, stream, {}):
+            segments += segment is not None
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        stream.close()
+
+    assert processed == seconds * SAMPLE_RATE
+    assert segments > 0
+    assert model.windows >= seconds / WINDOW_SECONDS
+    # 始终使用创建时分配的缓冲区，缓冲的音频不超过其容量
+    assert stream.buffer is buffer
+    assert stream.capacity <= (WINDOW_SECONDS + 60) * SAMPLE_RATE
+    assert model.max_buffered <= stream.capacity
+    # 识别过程中新分配的内存只与窗口和读取块的大小有关
+    assert peak < PEAK_ALLOCATION_MB * 1024 * 1024
+
+
+def test_release_keeps_unreleased_samples():
+    stream = open_synthetic(120)
+    try:
+        end = stream.fill(20 * SAMPLE_RATE)
+        assert end == 20 * SAMPLE_RATE
+        stream.release(15 * SAMPLE_RATE)
+        assert stream.start == 15 * SAMPLE_RATE
+        end = stream.fill(40 * SAMPLE_RATE)
+        np.testing.assert_array_equal(stream.view(15 * SAMPLE_RATE, end), expected_samples(15 * SAMPLE_RATE, end))
+    finally:
+        stream.close()
+
+
+def test_fill_beyond_capacity_is_rejected():
+    stream = open_synthetic(600)
+    try:
+        with pytest.raises(ValueError):
+            stream.fill(stream.capacity + SAMPLE_RATE)
+    finally:
+        stream.close()
+
+
+def test_end_of_audio():
+    stream = open_synthetic(10)
+    try:
+        end = stream.fill(WINDOW_SECONDS * SAMPLE_RATE)
+        assert end == 10 * SAMPLE_RATE
+        assert stream.at_end(end)
+    finally:
+        stream.close()
@@ -0,0 +1,36 @@
+"""自动调优的字错误率计算和预设选择"""
+from autotune import choose_preset, edit_distance, normalize_text
+
+
+def test_edit_distance():
+    assert edit_distance("", "") == 0
+    assert edit_distance("abc", "") == 3
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("今天天气好", "今天天气好") == 0
+    assert edit_distance("今天天气很好", "今天天气好") == 1
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("sitting", "kitten") == 3
+
+
+def test_normalize_text_ignores_spacing_punctuation_and_case():
+    assert normalize_text("Hello, World！ 你好。") == "helloworld你好"
+    assert normalize_text("ＡＢＣ１２３") == "abc123"
+
+
+def run(preset, cer, rtf):
+    return {"preset": preset, "cer": cer, "rtf": rtf}
+
+
+RUNS = [run("fast", 0.080, 0.10), run("balanced", 0.052, 0.25), run("accurate", 0.050, 0.60)]
+
+
+def test_fastest_preset_within_tolerance():
+    assert choose_preset(RUNS, tolerance=0.01) == "balanced"
+    assert choose_preset(RUNS, tolerance=0.05) == "fast"
+    assert choose_preset(RUNS, tolerance=0.0) == "accurate"
+
+
+def test_max_rtf_excludes_slow_presets():
+    assert choose_preset(RUNS, tolerance=0.0, max_rtf=0.3) == "balanced"
+    # 所有预设都超过上限时忽略该限制
+    assert choose_preset(RUNS, tolerance=0.0, max_rtf=0.01) == "accurate"
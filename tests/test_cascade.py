@@ -0,0 +1,102 @@
+"""级联识别的区间规划和替换"""
+import numpy as np
+import pytest
+
+from core.audio import SAMPLE_RATE
+from core.cascade import is_low_confidence, plan_spans, shift_segments, transcribe_cascade
+
+
+def contiguous(count, length=1.0):
+    return [{"start": i * length, "end": (i + 1) * length, "text": str(i)} for i in range(count)]
+
+
+def flags_at(count, indexes):
+    return [i in indexes for i in range(count)]
+
+
+def test_no_low_confidence_segments():
+    assert plan_spans(contiguous(5), flags_at(5, ())) == []
+
+
+def test_adjacent_flags_are_merged():
+    segments = contiguous(10)
+    assert plan_spans(segments, flags_at(10, {2, 3})) == [(2, 3)]
+    # 间隔不超过1秒的低置信度片段连同中间的片段合并
+    assert plan_spans(segments, flags_at(10, {2, 4})) == [(2, 4)]
+
+
+def test_short_span_grows_towards_the_nearer_neighbour():
+    segments = [
+        {"start": 0.0, "end": 1.0, "text": "a"},
+        {"start": 3.0, "end": 4.0, "text": "b"},
+        {"start": 4.2, "end": 5.0, "text": "c"},
+    ]
+    assert plan_spans(segments, [False, True, False]) == [(1, 2)]
+    # 一侧没有片段时向另一侧扩展
+    assert plan_spans(segments, [False, False, True]) == [(1, 2)]
+
+
+def test_span_without_neighbours_stays_short():
+    assert plan_spans(contiguous(1), [True]) == [(0, 0)]
+
+
+def test_spans_overlapping_after_growth_are_merged():
+    segments = contiguous(10)
+    # 两个区间分别向前扩展为 (0, 2) 和 (3, 5)，扩展后相邻，合并为一个区间
+    assert plan_spans(segments, flags_at(10, {2, 5}), merge_gap=1.0, min_span=3.0) == [(0, 5)]
+
+
+def test_is_low_confidence():
+    assert not is_low_confidence({"avg_logprob": -0.2, "compression_ratio": 1.5, "no_speech_prob": 0.1})
+    assert is_low_confidence({"avg_logprob": -0.9})
+    assert is_low_confidence({"compression_ratio": 3.0})
+    assert is_low_confidence({"no_speech_prob": 0.8})
+
+
+def test_shift_segments_clips_to_span():
+    shifted = shift_segments([{"start": 0.0, "end": 1.5, "text": "a"}, {"start": 1.8, "end": 3.0, "text": "b"},
+                              {"start": 2.5, "end": 3.0, "text": "c"}], offset=10.0, limit=12.0)
+    assert [(s["start"], s["end"]) for s in shifted] == [(10.0, 11.5), (11.8, 12.0)]
+
+
+class FakeModel:
+    def __init__(self, segments):
+        self.segments = segments
+        self.calls = []
+
+    def transcribe(self, audio, verbose=None, **options):
+        self.calls.append((len(audio) / SAMPLE_RATE, options))
+        segments = [dict(segment) for segment in self.segments]
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": "zh"}
+
+
+def test_low_confidence_span_is_redecoded():
+    draft = FakeModel([
+        {"id": 0, "start": 0.0, "end": 2.0, "text": "前文", "avg_logprob": -0.1},
+        {"id": 1, "start": 2.0, "end": 4.0, "text": "错字", "avg_logprob": -1.5},
+        {"id": 2, "start": 4.0, "end": 6.0, "text": "后文", "avg_logprob": -0.1},
+    ])
+    final = FakeModel([{"id": 0, "start": 0.0, "end": 2.0, "text": "正字"}])
+    audio = np.zeros(6 * SAMPLE_RATE, dtype=np.float32)
+    result, stats = transcribe_cascade(draft, lambda: final, audio, {"language": "zh"})
+
+    assert [s["text"] for s in result["segments"]] == ["前文", "正字", "后文"]
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [(0.0, 2.0), (2.0, 4.0), (4.0, 6.0)]
+    assert [s["id"] for s in result["segments"]] == [0, 1, 2]
+    assert result["text"] == "前文正字后文"
+    # 大模型只识别低置信度区间，已确定的上文作为提示词
+    assert final.calls == [(pytest.approx(2.0), {"language": "zh", "initial_prompt": "前文"})]
+    assert stats["spans"] == 1
+    assert stats["fraction"] == pytest.approx(1 / 3)
+
+
+def test_final_model_is_not_loaded_without_low_confidence_segments():
+    draft = FakeModel([{"start": 0.0, "end": 2.0, "text": "好", "avg_logprob": -0.1}])
+
+    def load_final_model():
+        raise AssertionError("不应加载大模型")
+
+    result, stats = transcribe_cascade(draft, load_final_model, np.zeros(2 * SAMPLE_RATE, dtype=np.float32), {})
+    assert result["text"] == "好"
+    assert stats["spans"] == 0
+    assert stats["speedup"] is None
@@ -0,0 +1,131 @@
+"""CheckpointJournal 的进度恢复"""
+import os
+import json
+
+import pytest
+
+from core.checkpoint import CheckpointJournal, JOURNAL_VERSION, journal_key
+
+OPTIONS = {"language": "zh", "best_of": 5}
+
+
+def segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"video")
+    return str(path)
+
+
+def write_windows(journal, video, windows):
+    journal.open(resume=False, video_path=video)
+    for seek, prompt, segments in windows:
+        journal.commit(seek, prompt, segments)
+    journal.close()
+
+
+WINDOWS = [
+    (480000, "第一句", [segment(0.0, 12.5, "第一句")]),
+    (960000, "第一句第二句", [segment(30.0, 41.0, "第二句")]),
+]
+
+
+def test_resume_from_last_committed_window(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, WINDOWS)
+
+    segments, seek, prompt = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path)).load()
+    assert seek == 960000
+    assert prompt == "第一句第二句"
+    assert [s["text"] for s in segments] == ["第一句", "第二句"]
+
+
+def test_truncated_last_line_is_ignored_and_cut(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, WINDOWS)
+    with open(journal.path, 'ab') as f:
+        # 进程在写入第三个窗口时被杀死
+        f.write('{"seek": 1440000, "prompt": "第一句第二句第三'.encode('utf-8'))
+
+    segments, seek, _ = journal.load()
+    assert seek == 960000
+    assert len(segments) == 2
+
+    # 继续写入时截掉写了一半的行，新记录接在最后一个完整记录之后
+    journal.open(resume=True)
+    journal.commit(1440000, "第三句", [segment(60.0, 70.0, "第三句")])
+    journal.close()
+    with open(journal.path, encoding='utf-8') as f:
+        lines = f.readlines()
+    assert len(lines) == 4
+    assert [json.loads(line).get("seek") for line in lines[1:]] == [480000, 960000, 1440000]
+    segments, seek, prompt = journal.load()
+    assert seek == 1440000
+    assert prompt == "第三句"
+    assert [s["text"] for s in segments] == ["第一句", "第二句", "第三句"]
+
+
+def test_corrupt_last_line_with_newline_is_ignored(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, WINDOWS)
+    with open(journal.path, 'ab') as f:
+        f.write(b'{"seek": 14400\n')
+    _, seek, _ = journal.load()
+    assert seek == 960000
+
+
+def test_header_only_has_no_progress(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, [])
+    assert journal.load() is None
+    # 没有可接续的记录时重新开始写入
+    journal.open(resume=True, video_path=video)
+    journal.close()
+    with open(journal.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+
+
+def test_other_version_is_not_resumed(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, WINDOWS)
+    with open(journal.path, encoding='utf-8') as f:
+        lines = f.readlines()
+    lines[0] = json.dumps({"version": JOURNAL_VERSION + 1}) + "\n"
+    with open(journal.path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    assert journal.load() is None
+
+
+def test_missing_journal(tmp_path, video):
+    assert CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path)).load() is None
+
+
+def test_key_changes_with_video_and_parameters(tmp_path, video):
+    key = journal_key(video, "base", OPTIONS)
+    assert journal_key(video, "base", dict(OPTIONS)) == key
+    assert journal_key(video, "small", OPTIONS) != key
+    assert journal_key(video, "base", dict(OPTIONS, beam_size=5)) != key
+    assert journal_key(video, "base", OPTIONS, extra={"vad": True}) != key
+
+    st = os.stat(video)
+    os.utime(video, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert journal_key(video, "base", OPTIONS) != key
+
+
+def test_progress_of_changed_video_is_not_used(tmp_path, video):
+    write_windows(CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path)), video, WINDOWS)
+    # 视频被替换为其他内容后，日志键不同，不会从旧的进度继续
+    with open(video, 'wb') as f:
+        f.write(b"another video")
+    assert CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path)).load() is None
+
+
+def test_remove(tmp_path, video):
+    journal = CheckpointJournal(journal_key(video, "base", OPTIONS), str(tmp_path))
+    write_windows(journal, video, WINDOWS)
+    journal.remove()
+    assert not os.path.exists(journal.path)
+    journal.remove()
@@ -0,0 +1,61 @@
+"""常驻识别服务的访问令牌和请求检查"""
+import os
+import stat
+import threading
+
+import pytest
+
+from core.backends import FasterWhisperBackend
+from core.daemon import DaemonServer, TranscriptionDaemon, create_token, read_token
+from core.remote import DaemonError, RemoteScheduler
+
+
+@pytest.fixture
+def server():
+    service = TranscriptionDaemon(transcribe_slots=1)
+    server = DaemonServer(service, "secret-token", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def test_requests_need_the_token(server, tmp_path, monkeypatch):
+    # 不读取本机真实的令牌文件
+    monkeypatch.setattr("core.remote.read_token", lambda: None)
+    assert RemoteScheduler(server, token="secret-token").request("GET", "/health")["status"] == "ok"
+    for token in (None, "wrong-token"):
+        client = RemoteScheduler(server, token=token)
+        with pytest.raises(DaemonError, match="令牌"):
+            client.request("GET", "/jobs")
+        with pytest.raises(DaemonError):
+            client.request("POST", "/jobs", {"video_path": str(tmp_path / "video.mp4")})
+        assert not RemoteScheduler.is_available(server)
+
+
+def test_token_file_is_private(tmp_path):
+    path = str(tmp_path / "daemon.token")
+    token = create_token(path)
+    assert read_token(path) == token
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    # 重新启动时生成新的令牌
+    assert create_token(path) != token
+    assert read_token(str(tmp_path / "missing.token")) is None
+
+
+@pytest.mark.parametrize("path, data", [
+    ("/prewarm", {"model_size": "base"}),
+    ("/jobs", {"video_path": "video.mp4", "model_size": "base"}),
+])
+def test_unknown_or_missing_backend_is_rejected(server, monkeypatch, path, data):
+    client = RemoteScheduler(server, token="secret-token")
+    with pytest.raises(DaemonError, match="未知的推理后端"):
+        client.request("POST", path, dict(data, backend="no-such-backend"))
+
+    monkeypatch.setattr(FasterWhisperBackend, "is_available", classmethod(lambda cls: False))
+    with pytest.raises(DaemonError, match="不可用"):
+        client.request("POST", path, dict(data, backend="faster-whisper"))
+    # 被拒绝的请求没有创建任务
+    assert client.request("GET", "/jobs") == []
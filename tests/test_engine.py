@@ -0,0 +1,52 @@
+"""并行转录的窗口拼接"""
+import pytest
+
+from core.audio import SAMPLE_RATE
+from core.engine import HOP_LENGTH, stitch_segments
+
+
+def window(start, end, own_start, own_end):
+    return tuple(int(seconds * SAMPLE_RATE) for seconds in (start, end, own_start, own_end))
+
+
+def seg(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_segments_are_shifted_and_kept_by_the_owning_window():
+    windows = [window(0, 20, 0, 15), window(10, 30, 15, 30)]
+    results = [
+        {"segments": [seg(0, 5, "甲"), seg(5, 12, "乙"), seg(12, 18, "丙")], "language": None},
+        # 丙的中点在15秒处，属于第二个窗口
+        {"segments": [seg(2, 8, "丙"), seg(8, 15, "丁")], "language": "zh"},
+    ]
+    result = stitch_segments(windows, results)
+    segments = result["segments"]
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+        (0, 5, "甲"), (5, 12, "乙"), (12, 18, "丙"), (18, 25, "丁")]
+    assert [s["id"] for s in segments] == [0, 1, 2, 3]
+    assert segments[2]["seek"] == 10 * SAMPLE_RATE // HOP_LENGTH
+    assert result["text"] == "甲乙丙丁"
+    assert result["language"] == "zh"
+
+
+def test_overlapping_duplicate_is_dropped():
+    windows = [window(0, 20, 0, 15), window(10, 30, 15, 30)]
+    results = [
+        {"segments": [seg(10, 14.8, "重复")]},
+        # 第二个窗口识别出同一句话，起点早于上一片段的终点
+        {"segments": [seg(4.6, 6, " 重复 "), seg(6, 9, "后文")]},
+    ]
+    segments = stitch_segments(windows, results)["segments"]
+    assert [s["text"] for s in segments] == ["重复", "后文"]
+    assert segments[0]["end"] == pytest.approx(14.8)
+
+
+def test_same_text_without_overlap_is_kept():
+    windows = [window(0, 20, 0, 15), window(10, 30, 15, 30)]
+    results = [{"segments": [seg(10, 12, "好")]}, {"segments": [seg(6, 7, "好")]}]
+    assert [s["start"] for s in stitch_segments(windows, results)["segments"]] == [10, 16]
+
+
+def test_empty():
+    assert stitch_segments([], []) == {"text": "", "segments": [], "language": None}
@@ -0,0 +1,88 @@
+"""持久化任务队列"""
+import json
+
+import pytest
+
+from core.job_queue import DONE, FAILED, PENDING, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue.json")
+
+
+def test_jobs_run_in_order_and_persist(tmp_path, queue_path):
+    queue = JobQueue(queue_path)
+    assert queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.srt"))
+    assert queue.add(str(tmp_path / "b.mp4"), str(tmp_path / "b.srt"))
+    # 同一视频只保留一个任务
+    assert not queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.srt"))
+
+    job = queue.next_pending()
+    assert job["video_path"].endswith("a.mp4")
+    queue.mark_done(job)
+    queue.mark_failed(queue.next_pending(), RuntimeError("解码失败"))
+    assert queue.next_pending() is None
+
+    reopened = JobQueue(queue_path)
+    assert reopened.counts() == {PENDING: 0, RUNNING: 0, DONE: 1, FAILED: 1}
+    assert reopened.jobs[1]["error"] == "解码失败"
+
+
+def test_running_job_is_requeued_after_crash(tmp_path, queue_path):
+    queue = JobQueue(queue_path)
+    queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.srt"))
+    queue.next_pending()
+    with open(queue_path, encoding='utf-8') as f:
+        assert json.load(f)["jobs"][0]["status"] == RUNNING
+    assert JobQueue(queue_path).next_pending()["video_path"].endswith("a.mp4")
+
+
+def test_retry_failed(tmp_path, queue_path):
+    queue = JobQueue(queue_path)
+    queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.srt"))
+    queue.mark_failed(queue.next_pending(), "错误")
+    queue.retry_failed()
+    job = queue.next_pending()
+    assert job is not None and job["error"] is None
+
+
+def test_finished_job_with_missing_output_is_requeued(tmp_path, queue_path):
+    output = tmp_path / "a.srt"
+    queue = JobQueue(queue_path)
+    queue.add(str(tmp_path / "a.mp4"), str(output))
+    queue.mark_done(queue.next_pending())
+
+    output.write_text("1\n", encoding='utf-8')
+    assert not queue.add(str(tmp_path / "a.mp4"), str(output))
+    output.unlink()
+    assert queue.add(str(tmp_path / "a.mp4"), str(output))
+    assert queue.counts()[PENDING] == 1
+
+
+def test_overwrite_or_new_output_path_requeues(tmp_path, queue_path):
+    output = tmp_path / "a.srt"
+    output.write_text("1\n", encoding='utf-8')
+    queue = JobQueue(queue_path)
+    queue.add(str(tmp_path / "a.mp4"), str(output))
+    queue.mark_done(queue.next_pending())
+
+    assert queue.add(str(tmp_path / "a.mp4"), str(output), overwrite=True)
+    queue.mark_done(queue.next_pending())
+
+    vtt = tmp_path / "a.vtt"
+    assert queue.add(str(tmp_path / "a.mp4"), str(vtt))
+    assert queue.next_pending()["output_path"] == str(vtt)
+
+
+def test_pending_job_only_updates_output_path(tmp_path, queue_path):
+    queue = JobQueue(queue_path)
+    queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.srt"))
+    assert not queue.add(str(tmp_path / "a.mp4"), str(tmp_path / "a.vtt"))
+    assert JobQueue(queue_path).jobs[0]["output_path"] == str(tmp_path / "a.vtt")
+
+
+def test_corrupt_queue_file_starts_empty(queue_path):
+    with open(queue_path, 'w', encoding='utf-8') as f:
+        f.write("{")
+    assert JobQueue(queue_path).jobs == []
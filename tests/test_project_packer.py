@@ -0,0 +1,101 @@
+"""打包工具的文件选择和快速复制"""
+import os
+
+from project_packer import ProjectPacker, compile_patterns, copy_file_fast
+
+
+def test_compile_patterns_matches_like_fnmatch():
+    pattern = compile_patterns(["*.py", "data/*.json", "README*"])
+    assert pattern.match(os.path.normcase("main.py"))
+    assert pattern.match(os.path.normcase("data/config.json"))
+    assert pattern.match(os.path.normcase("README.md"))
+    assert not pattern.match(os.path.normcase("main.pyc"))
+    assert not pattern.match(os.path.normcase("other/config.json"))
+
+
+def test_compile_patterns_empty():
+    assert compile_patterns([]) is None
+
+
+def make_packer(tmp_path, include, exclude):
+    return ProjectPacker(project_dir=str(tmp_path), config={"include_files": include, "exclude_files": exclude})
+
+
+def test_exclude_wins_over_include(tmp_path):
+    packer = make_packer(tmp_path, ["*.py", "*.json"], ["test_*", os.path.join("build", "*")])
+    assert packer.match_file("main.py", "main.py")
+    assert packer.match_file("config.json", os.path.join("src", "config.json"))
+    assert not packer.match_file("test_main.py", os.path.join("src", "test_main.py"))
+    assert not packer.match_file("out.py", os.path.join("build", "out.py"))
+    assert not packer.match_file("notes.txt", "notes.txt")
+
+
+def test_no_include_patterns_selects_nothing(tmp_path):
+    assert not make_packer(tmp_path, [], []).match_file("main.py", "main.py")
+
+
+def test_copy_file_fast(tmp_path):
+    src = tmp_path / "src.bin"
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    src.write_bytes(data)
+    os.chmod(src, 0o640)
+    dst = tmp_path / "dst.bin"
+    copy_file_fast(str(src), str(dst))
+    assert dst.read_bytes() == data
+    assert os.stat(dst).st_mtime_ns == os.stat(src).st_mtime_ns
+    if os.name == "posix":
+        assert os.stat(dst).st_mode == os.stat(src).st_mode
+
+
+def test_iter_project_files_skips_excluded_and_backup_dirs(tmp_path):
+    for rel_path in ("main.py", "src/app.py", "src/app.pyc", "build/gen.py", "project_backups/old/main.py",
+                     "notes.txt"):
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x", encoding='utf-8')
+    packer = make_packer(tmp_path, ["*.py"], ["*.pyc"])
+    rel_paths = sorted(rel_path for _, rel_path, _ in packer.iter_project_files())
+    assert rel_paths == sorted(["main.py", os.path.join("src", "app.py")])
+
+
+def make_env(tmp_path):
+    prefix = tmp_path / "env"
+    (prefix / "conda-meta").mkdir(parents=True)
+    (prefix / "conda-meta" / "numpy-1.26.4-py311_0.json").write_text("{}", encoding='utf-8')
+    (prefix / "conda-meta" / "history").write_text("", encoding='utf-8')
+    site_dir = prefix / "lib" / "python3.11" / "site-packages"
+    site_dir.mkdir(parents=True)
+    return str(prefix), site_dir
+
+
+def test_env_fingerprint_changes_after_pip_install(tmp_path):
+    prefix, site_dir = make_env(tmp_path)
+    before = ProjectPacker.env_fingerprint(prefix)
+    assert before == ProjectPacker.env_fingerprint(prefix)
+
+    # pip安装只写入site-packages，不改动conda-meta
+    dist_info = site_dir / "requests-2.31.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "INSTALLER").write_text("pip\n", encoding='utf-8')
+    installed = ProjectPacker.env_fingerprint(prefix)
+    assert installed != before
+
+    dist_info.joinpath("INSTALLER").unlink()
+    dist_info.rmdir()
+    assert ProjectPacker.env_fingerprint(prefix) != installed
+
+
+def test_env_fingerprint_without_conda_meta(tmp_path):
+    assert ProjectPacker.env_fingerprint(str(tmp_path / "missing")) is None
+
+
+def test_readme_mentions_verification_only_with_a_manifest(tmp_path):
+    def readme(**kwargs):
+        return ProjectPacker(project_dir=str(tmp_path), **kwargs).readme_content(["main.py"])
+
+    # 普通目录格式的备份没有 manifest.json，restore.py --verify-only 会失败
+    assert "--verify-only" not in readme(incremental=False, archive_format="dir", vendor=False)
+    assert "--verify-only" not in readme(incremental=False, archive_format="dir", vendor=True)
+    assert "--verify-only" in readme(incremental=True, archive_format="dir", vendor=False)
+    assert "--verify-only" in readme(incremental=False, archive_format="zip", vendor=False)
+    assert "--verify-only" in readme(incremental=True, archive_format="dir", vendor=True)
@@ -0,0 +1,75 @@
+"""逐窗口识别：窗口末尾被截断的片段由下一个窗口重新识别"""
+import numpy as np
+import pytest
+
+from core.audio import SAMPLE_RATE
+from core.streaming import WINDOW_SECONDS, iter_segments
+
+SENTENCE_SECONDS = 10
+
+
+class SentenceModel:
+    """每10秒（按整段音频的时间轴）一句话，窗口末尾的一句可能被截断
+
+    音频的采样值为其在整段音频中的秒数，由此得到窗口的起点。
+    """
+
+    def __init__(self):
+        self.windows = []
+
+    def transcribe(self, audio, verbose=None, initial_prompt=None, **options):
+        offset = float(audio[0])
+        length = len(audio) / SAMPLE_RATE
+        self.windows.append((round(offset, 3), initial_prompt))
+        segments = []
+        start = 0.0
+        while start < length - 1e-6:
+            sentence = int(round(offset + start)) // SENTENCE_SECONDS
+            end = min(length, (sentence + 1) * SENTENCE_SECONDS - offset)
+            segments.append({"start": start, "end": end, "text": f"第{sentence}句"})
+            start = end
+        return {"segments": segments}
+
+
+def timeline(seconds):
+    return (np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE).astype(np.float32)
+
+
+def collect(model, audio, **kwargs):
+    return [(round(segment["start"], 3), round(segment["end"], 3), segment["text"])
+            for segment, _ in iter_segments(model, audio, {}, **kwargs) if segment is not None]
+
+
+def test_cut_segment_is_redecoded_by_next_window():
+    model = SentenceModel()
+    segments = collect(model, timeline(95))
+    # 每句只出现一次，时间连续
+    assert [text for _, _, text in segments] == [f"第{i}句" for i in range(10)]
+    assert [start for start, _, _ in segments] == [i * 10 for i in range(10)]
+    assert segments[-1][1] == 95
+    # 每个窗口丢弃最后一句，下一个窗口从该句的起点开始
+    assert [offset for offset, _ in model.windows] == [0, 20, 40, 60, 80]
+
+
+def test_previous_text_is_the_next_prompt():
+    model = SentenceModel()
+    collect(model, timeline(60))
+    prompts = [prompt for _, prompt in model.windows]
+    assert prompts[0] is None
+    assert prompts[1] == "第0句第1句"
+
+
+def test_resume_from_window_boundary_matches_uninterrupted_run():
+    audio = timeline(95)
+    full = collect(SentenceModel(), audio)
+    boundaries = []
+    collect(SentenceModel(), audio, on_window=lambda seek, prompt: boundaries.append((seek, prompt)))
+    seek, prompt = boundaries[1]
+    resumed = collect(SentenceModel(), audio, start_sample=seek, prompt=prompt)
+    assert resumed == [segment for segment in full if segment[0] >= seek / SAMPLE_RATE]
+
+
+def test_final_window_keeps_its_last_segment():
+    segments = collect(SentenceModel(), timeline(WINDOW_SECONDS - 5))
+    assert [text for _, _, text in segments] == ["第0句", "第1句", "第2句"]
+    assert segments[-1][1] == pytest.approx(WINDOW_SECONDS - 5)
@@ -0,0 +1,66 @@
+"""字幕时间戳和各格式的输出"""
+import json
+
+import pytest
+
+from core.subtitles import format_srt_block, format_timestamp, render
+
+
+@pytest.mark.parametrize("seconds, expected", [
+    (0, "00:00:00,000"),
+    (0.02, "00:00:00,020"),
+    (1.001, "00:00:01,001"),
+    (59.999, "00:00:59,999"),
+    (3661.5, "01:01:01,500"),
+    # 截断小数部分时浮点误差会得到 ,989
+    (6137.99, "01:42:17,990"),
+    (36000.0, "10:00:00,000"),
+    # 超过100小时时小时数不截断
+    (360000.25, "100:00:00,250"),
+])
+def test_format_timestamp(seconds, expected):
+    assert format_timestamp(seconds) == expected
+
+
+def test_format_timestamp_rounds_to_nearest_millisecond():
+    assert format_timestamp(1.2344) == "00:00:01,234"
+    assert format_timestamp(1.2346) == "00:00:01,235"
+    assert format_timestamp(59.9996) == "00:01:00,000"
+
+
+def test_vtt_decimal_marker():
+    assert format_timestamp(6137.99, '.') == "01:42:17.990"
+
+
+SEGMENTS = [
+    {"start": 0.0, "end": 2.5, "text": " 第一句 "},
+    {"start": 2.5, "end": 6137.99, "text": "第二句\t结束"},
+]
+
+
+def test_srt():
+    assert format_srt_block(1, SEGMENTS[0]) == "1\n00:00:00,000 --> 00:00:02,500\n第一句\n\n"
+    assert render(SEGMENTS, "srt") == ("1\n00:00:00,000 --> 00:00:02,500\n第一句\n\n"
+                                       "2\n00:00:02,500 --> 01:42:17,990\n第二句\t结束\n\n")
+
+
+def test_vtt():
+    assert render(SEGMENTS[:1], "vtt") == "WEBVTT\n\n00:00:00.000 --> 00:00:02.500\n第一句\n\n"
+
+
+def test_tsv():
+    assert render(SEGMENTS, "tsv") == "start\tend\ttext\n0\t2500\t第一句\n2500\t6137990\t第二句 结束\n"
+
+
+def test_json():
+    items = json.loads(render(SEGMENTS, "json"))
+    assert items == [
+        {"id": 1, "start": 0.0, "end": 2.5, "text": "第一句"},
+        {"id": 2, "start": 2.5, "end": 6137.99, "text": "第二句\t结束"},
+    ]
+    assert json.loads(render([], "json")) == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        render(SEGMENTS, "ass")
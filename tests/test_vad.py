@@ -0,0 +1,39 @@
+"""VAD压缩后的时间戳映射回原始时间轴"""
+import pytest
+
+from core.audio import SAMPLE_RATE
+from core.vad import SpeechMap
+
+# 原始音频中 1-3秒 和 5-6秒 为语音，压缩后分别位于 0-2秒 和 2-3秒
+REGIONS = [(1 * SAMPLE_RATE, 3 * SAMPLE_RATE), (5 * SAMPLE_RATE, 6 * SAMPLE_RATE)]
+
+
+def test_remap_result():
+    speech_map = SpeechMap(REGIONS)
+    result = speech_map.remap_result({"segments": [
+        {"start": 0.5, "end": 1.5, "text": "a"},
+        {"start": 2.2, "end": 2.8, "text": "b"},
+    ]})
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [
+        (pytest.approx(1.5), pytest.approx(2.5)), (pytest.approx(5.2), pytest.approx(5.8))]
+    assert [s["text"] for s in result["segments"]] == ["a", "b"]
+
+
+def test_segment_ending_at_region_boundary_stays_in_its_region():
+    speech_map = SpeechMap(REGIONS)
+    segment = speech_map.remap_segment({"start": 0.0, "end": 2.0})
+    # 结束于第一个区间的末尾（原始3秒），而不是跳到第二个区间的起点（原始5秒）
+    assert segment["start"] == pytest.approx(1.0)
+    assert segment["end"] == pytest.approx(3.0)
+
+
+def test_segment_starting_at_region_boundary():
+    segment = SpeechMap(REGIONS).remap_segment({"start": 2.0, "end": 3.0})
+    assert segment["start"] == pytest.approx(5.0)
+    assert segment["end"] == pytest.approx(6.0)
+
+
+def test_to_original_before_and_after_regions():
+    speech_map = SpeechMap(REGIONS)
+    assert speech_map.to_original(0.0) == pytest.approx(1.0)
+    assert speech_map.to_original(3.0) == pytest.approx(6.0)